@@ -1,8 +1,10 @@
 from fastapi import APIRouter
 from app.api.routers import ai_router
 from app.api.routers import place_router
+from app.api.routers import metrics_router
 
 api_router = APIRouter()
 
 api_router.include_router(ai_router.router)
-api_router.include_router(place_router.router)
\ No newline at end of file
+api_router.include_router(place_router.router)
+api_router.include_router(metrics_router.router)
\ No newline at end of file
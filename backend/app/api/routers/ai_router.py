@@ -1,286 +1,302 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas.ai_schema import ChatRequest, ChatResponse, ExtractedEntities
-from app.schemas.place_schema import POIRequest, PointOfInterest
-from app.api.routers.place_router import find_points_of_interest, geocode_place
+from fastapi import APIRouter, Depends, HTTPException
+from app.schemas.ai_schema import ChatMessage, ChatRequest, ChatResponse, ConversationState, ExtractedEntities
+from app.schemas.place_schema import POI_MAX_RADIUS_M, POIRequest
+from app.api.routers.place_router import adaptive_search_points_of_interest, geocode_place, DEFAULT_POI_LIMIT
 from app.schemas.place_schema import GeocodeRequest
-from app.util.load_env import load_env_variable
+from app.services.upstream_service import UpstreamClients, get_upstream_clients
+from app.services.poi_ranking import rank_matches
+from app.services.warmer import hot_area_warmer
+from app.services.poi_service import POIRecord
+from app.services.query_parser import parse_vietnamese_query, CURRENT_LOCATION_RE, ACCEPT_ANY_RE
+from app.services.conversation_store import conversation_store
+from app.services.entity_cache import Extraction, entity_cache
+from app.services.entity_extractor import ENTITY_LABELS, entity_extractor
+from app.services.gazetteer import lookup_place
+from app.util.timing import StageTimer
+from app.util.json_response import FastJSONResponse
+import asyncio
 import httpx
-import re
-import os
-from typing import List, Optional
+import logging
+import uuid
+from typing import Awaitable, List, Optional, Tuple, TypeVar
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
-# Load HuggingFace token
-try:
-    HF_TOKEN = load_env_variable("HF_TOKEN")
-except:
-    HF_TOKEN = os.getenv("HF_TOKEN", "")
+logger = logging.getLogger(__name__)
 
-# Updated HuggingFace API endpoint (using new router endpoint)
-HF_API_URL = "https://router.huggingface.co/models/urchade/gliner_small-v2.1"
+T = TypeVar("T")
 
 
-async def extract_entities_with_gliner(text: str) -> dict:
+async def extract_entities_with_gliner(text: str, client: httpx.AsyncClient) -> Optional[list]:
     """
-    Extract entities from text using Gliner model from HuggingFace
+    Extract entities from text using the local Gliner model, or the HuggingFace API.
+    None if the extraction failed.
     """
-    headers = {"Authorization": f"Bearer {HF_TOKEN}"}
-    
-    # Define entity labels we want to extract
-    payload = {
-        "inputs": text,
-        "parameters": {
-            "labels": ["location", "place", "distance", "radius", "food", "service", "amenity"]
-        }
-    }
-    
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(HF_API_URL, headers=headers, json=payload)
-            
-            if response.status_code == 503:
-                # Model is loading, wait and retry
-                await client.post(HF_API_URL, headers=headers, json=payload)
-                import asyncio
-                await asyncio.sleep(2)
-                response = await client.post(HF_API_URL, headers=headers, json=payload)
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Gliner API error: {response.status_code} - {response.text}")
-                return []
-    except Exception as e:
-        print(f"Error calling Gliner API: {e}")
-        return []
+    return await entity_extractor.extract(text, client)
 
 
-def parse_vietnamese_query(text: str, gliner_entities: list) -> dict:
+async def extract_and_parse(message: str, client: httpx.AsyncClient) -> Extraction:
     """
-    Parse Vietnamese query to extract location, radius, and search terms
+    Gliner entities of a message and the slots parsed with them. The result is
+    cached, and concurrent requests with the same message share one extraction.
     """
-    result = {
-        "location_name": None,
-        "radius_km": None,
-        "query": None
-    }
-    
-    # Extract radius from text (support both km and m)
-    radius_patterns = [
-        (r'(\d+)\s*m(?:et)?(?:er)?(?!\s*k)', 0.001),  # meters to km (500m -> 0.5km)
-        (r'(\d+)\s*km', 1),  # kilometers
-        (r'trong\s+(?:khoảng\s+)?(\d+)\s*m(?:et)?(?:er)?(?!\s*k)', 0.001),  # trong khoảng 500m
-        (r'trong\s+(?:khoảng\s+)?(\d+)\s*km', 1),  # trong khoảng 5km
-        (r'bán\s+kính\s+(\d+)\s*m(?:et)?(?:er)?(?!\s*k)', 0.001),  # bán kính 500m
-        (r'bán\s+kính\s+(\d+)\s*km', 1),  # bán kính 5km
-        (r'khoảng\s+(\d+)\s*m(?:et)?(?:er)?(?!\s*k)', 0.001),  # khoảng 500m
-        (r'khoảng\s+(\d+)\s*km', 1),  # khoảng 5km
-        (r'(\d+)\s*ki[lô]?[oô]?met', 1)  # kilometer
-    ]
-    
-    for pattern, multiplier in radius_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            result["radius_km"] = float(match.group(1)) * multiplier
-            break
-    
-    # Extract location from text
-    location_patterns = [
-        r'(?:ở|tại|gần)\s+([^,]+?)(?:\s*,|\s+tìm|\s+có)',
-        r'(?:đang|hiện)\s+ở\s+([^,]+?)(?:\s*,|\s+tìm)',
-    ]
-    
-    for pattern in location_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            location = match.group(1).strip()
-            # Clean up proximity words from location name
-            location = re.sub(r'^(quanh|gần|xung quanh|ở)\s+', '', location, flags=re.IGNORECASE)
-            location = location.strip()
-            # Filter out proximity phrases that are not actual locations
-            if location and location.lower() not in ['gần đó', 'gần đây', 'xung quanh', 'quanh đây', 'ở gần', 'đây', 'đó', 'quanh', 'gần', 'ở']:
-                result["location_name"] = location
-            break
-    
-    # Use Gliner entities if available
-    if gliner_entities:
-        for entity in gliner_entities:
-            if isinstance(entity, dict):
-                label = entity.get("entity_group") or entity.get("label", "")
-                word = entity.get("word", "")
-                
-                if label in ["location", "place"] and not result["location_name"]:
-                    result["location_name"] = word
-                elif label in ["food", "service", "amenity"] and not result["query"]:
-                    result["query"] = word
-    
-    # Extract query/search term (what user is looking for)
-    # Remove location and radius parts to get the search term
-    search_text = text
-    if result["location_name"]:
-        search_text = search_text.replace(result["location_name"], "")
-    if result["radius_km"]:
-        search_text = re.sub(r'\d+\s*km', '', search_text, flags=re.IGNORECASE)
-    
-    # Extract search terms
-    search_patterns = [
-        r'tìm\s+(?:quán|chỗ|nơi|địa điểm|tiệm)?\s*([^,\.\?]+)',
-        r'(?:muốn|cần|có)\s+([^,\.\?]+)',
-        r'([^,\.\?]+?)\s+(?:gần|trong|quanh)',
-    ]
-    
-    for pattern in search_patterns:
-        match = re.search(pattern, search_text, re.IGNORECASE)
-        if match and not result["query"]:
-            query = match.group(1).strip()
-            # Clean up common words and proximity indicators (from both start and end)
-            query = re.sub(r'^(quán|chỗ|nơi|tiệm|địa điểm|ở|tại|gần|ăn|uống|dịch vụ)\s+', '', query, flags=re.IGNORECASE)
-            # Remove proximity words from the end - match with optional space or required space
-            query = re.sub(r'\s*(gần đây|gần đó|ở đây|ở gần|quanh đây|xung quanh)\s*$', '', query, flags=re.IGNORECASE)
-            query = re.sub(r'\s+(gần|ở|trong|quanh|tại)\s*$', '', query, flags=re.IGNORECASE)
-            query = query.strip()
-            
-            # Check if query is actually a current location phrase (should not be treated as search query)
-            current_location_phrases = [
-                'hiện tại', 'địa chỉ hiện', 'vị trí hiện', 'đang ở đây', 
-                'chỗ này', 'chỗ mình', 'của mình', 'địa chỉ của mình',
-                'nơi này', 'nơi mình', 'chỗ tôi', 'ở đây'
-            ]
-            is_location_phrase = any(phrase in query.lower() for phrase in current_location_phrases)
-            
-            # Only set query if it's not empty, not just proximity words, and not a location phrase
-            if query and not is_location_phrase and query.lower() not in ['gần đây', 'gần đó', 'gần', 'ở đây', 'ở gần', 'ở', 'trong', 'quanh', 'xung quanh', 'tại', 'quanh đây']:
-                result["query"] = query
+    async def extract() -> Optional[Extraction]:
+        entities = await extract_entities_with_gliner(message, client)
+        if entities is None:
+            return None
+        # Entities only fill slots the patterns missed; without any this is the regex parse
+        return entities, parse_vietnamese_query(message, entities)
+
+    result = await entity_cache.load(message, ENTITY_LABELS, extract)
+    return result if result is not None else ([], parse_vietnamese_query(message, []))
+
+
+def state_from_history(history: List[ChatMessage]) -> ConversationState:
+    """
+    Resolve the slots of a conversation from its message history, newest message first
+    """
+    state = ConversationState()
+    for msg in reversed(history):
+        if msg.role != "user":
+            continue
+        prev_parsed = parse_vietnamese_query(msg.content, [])
+        if state.radius_km is None:
+            state.radius_km = prev_parsed["radius_km"]
+        if state.query is None:
+            state.query = prev_parsed["query"]
+        if state.location_name is None:
+            state.location_name = prev_parsed["location_name"]
+        if state.radius_km is not None and state.query is not None and state.location_name is not None:
             break
-    
-    return result
+    return state
+
+
+# Where the coordinates of a turn come from: ("known", (lat, lng)), ("geocode", name),
+# ("current", (lat, lng)) for the user's position, or ("missing", field)
+LocationPlan = Tuple[str, object]
+
+# How often speculative work was used or thrown away, for /ai/chat/stats
+pipeline_stats = {
+    "speculative_geocodes": 0,
+    "speculative_geocodes_cancelled": 0,
+    "speculative_searches": 0,
+    "speculative_searches_cancelled": 0,
+}
+
+
+def merge_conversation_state(parsed: dict, state: Optional[ConversationState]) -> Tuple[dict, Optional[Tuple[float, float]]]:
+    """
+    Fill the slots the message did not provide from earlier turns.
+    Also returns the coordinates of the location name if an earlier turn geocoded it.
+    """
+    parsed = dict(parsed)
+    known = None
+    if state is not None:
+        if parsed["radius_km"] is None:
+            parsed["radius_km"] = state.radius_km
+        if parsed["query"] is None:
+            parsed["query"] = state.query
+        if parsed["location_name"] is None and state.location_name is not None:
+            parsed["location_name"] = state.location_name
+            if state.lat is not None and state.lng is not None:
+                known = (state.lat, state.lng)
+    return parsed, known
+
+
+def plan_location(parsed: dict, known: Optional[Tuple[float, float]], message: str, request: ChatRequest) -> LocationPlan:
+    if parsed["location_name"]:
+        # Well-known places need no geocoding round trip
+        known = known or lookup_place(parsed["location_name"])
+        return ("known", known) if known is not None else ("geocode", parsed["location_name"])
+
+    # No location name extracted, check if we should use current location
+    has_current = bool(request.current_lat and request.current_lng)
+    if has_current:
+        # Either the message asks for the current location, or it is the default
+        return "current", (request.current_lat, request.current_lng)
+    if CURRENT_LOCATION_RE.search(message) is not None:
+        return "missing", "current_location"
+    return "missing", "location"
+
+
+async def geocode_location(place_name: str, clients: UpstreamClients) -> Tuple[float, float]:
+    location = await geocode_place(GeocodeRequest(place_name=place_name), clients)
+    return location.lat, location.lng
+
+
+async def search_near(
+    coordinates: Awaitable[Tuple[float, float]],
+    radius_km: float,
+    query: Optional[str],
+    clients: UpstreamClients
+) -> List[POIRecord]:
+    """
+    Nearest POIs matching the query, as soon as the coordinates are known.
+    The search only grows as far as it takes to find them.
+    """
+    lat, lng = await coordinates
+    radius_m = min(max(int(radius_km * 1000), 1), POI_MAX_RADIUS_M)
+    hot_area_warmer.record(lat, lng, radius_m)
+    poi_request = POIRequest(
+        lat=lat,
+        lng=lng,
+        radius_m=radius_m,
+        query=query,
+        adaptive=True
+    )
+    matches, _ = await adaptive_search_points_of_interest(poi_request, clients, k=DEFAULT_POI_LIMIT)
+    return rank_matches(matches, lat, lng, k=DEFAULT_POI_LIMIT)
+
+
+async def _resolved(value: T) -> T:
+    return value
+
+
+def _discard(task: Optional[asyncio.Task]):
+    # Cancel speculative work, or consume its error if it already failed
+    if task is None:
+        return
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()
+
+
+def _respond(timer: StageTimer, response: ChatResponse, search_results: Optional[List[POIRecord]] = None) -> FastJSONResponse:
+    # Serialized here rather than by FastAPI, so it is timed as a stage. The POI
+    # records go straight to orjson instead of through the response model.
+    with timer.stage("serialize"):
+        content = response.model_dump(mode="json")
+        if search_results is not None:
+            content["search_results"] = search_results
+        return FastJSONResponse(content)
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat_with_bot(request: ChatRequest):
+async def chat_with_bot(
+    request: ChatRequest,
+    clients: UpstreamClients = Depends(get_upstream_clients)
+):
     """
-    Chatbot endpoint that extracts location, radius, and query from user message
+    Chatbot endpoint that extracts location, radius, and query from user message.
+
+    Gliner is the slowest stage, so everything the regex parse alone can decide
+    runs while it is in flight: the location is geocoded and the POI search
+    starts speculatively. If the Gliner entities change the location, radius or
+    query, the stale work is cancelled and redone.
     """
+    timer = StageTimer(route="chat")
+    gliner_task = geocode_task = search_task = None
     try:
         message = request.message.strip()
         
-        # Extract entities using Gliner
-        gliner_entities = await extract_entities_with_gliner(message)
+        # Repeated phrasings are parsed from the entity cache, without calling Gliner
+        cached = entity_cache.get(message, ENTITY_LABELS)
+        if cached is None:
+            # Extract entities using Gliner, in the background
+            gliner_task = asyncio.create_task(timer.timed("gliner", extract_and_parse(message, clients.huggingface)))
         
-        # Parse the current query
-        parsed = parse_vietnamese_query(message, gliner_entities)
+        # Parse the current query without the entities first
+        with timer.stage("parse"):
+            regex_parsed = parse_vietnamese_query(message, []) if cached is None else cached[1]
         
-        # Check conversation history ONLY if current message doesn't provide the value
-        # This allows new queries/locations to override old ones
-        historical_lat, historical_lng = None, None
+        # Slots resolved in earlier turns; the current message overrides any it provides
+        conversation_id = request.conversation_id or uuid.uuid4().hex
+        with timer.stage("conversation"):
+            state = await conversation_store.get(request.conversation_id) if request.conversation_id else None
+            if state is None and request.conversation_history:
+                # A lost or expired stored conversation is rebuilt from the history
+                state = state_from_history(request.conversation_history)
         
-        if request.conversation_history:
-            # Only look for radius from history if current message doesn't have it
-            if parsed["radius_km"] is None:
-                for msg in reversed(request.conversation_history):
-                    if msg.role == "user":
-                        prev_parsed = parse_vietnamese_query(msg.content, [])
-                        if prev_parsed["radius_km"] is not None:
-                            parsed["radius_km"] = prev_parsed["radius_km"]
-                            break
-            
-            # Only look for query from history if current message doesn't have it
-            if parsed["query"] is None:
-                for msg in reversed(request.conversation_history):
-                    if msg.role == "user":
-                        prev_parsed = parse_vietnamese_query(msg.content, [])
-                        if prev_parsed["query"] is not None:
-                            parsed["query"] = prev_parsed["query"]
-                            break
-            
-            # Only look for location from history if current message doesn't have it
-            # Also try to get lat/lng from the assistant's previous response
-            if parsed["location_name"] is None:
-                for i in range(len(request.conversation_history) - 1, -1, -1):
-                    msg = request.conversation_history[i]
-                    if msg.role == "user":
-                        prev_parsed = parse_vietnamese_query(msg.content, [])
-                        if prev_parsed["location_name"] is not None:
-                            parsed["location_name"] = prev_parsed["location_name"]
-                            # Check if the next message (assistant's response) has lat/lng
-                            if i + 1 < len(request.conversation_history):
-                                # Look for lat/lng in the assistant's metadata if available
-                                # For now, we'll geocode it again below
-                                pass
-                            break
+        # Speculative geocoding and POI search for the regex-only slots
+        early, early_known = merge_conversation_state(regex_parsed, state)
+        early_plan = plan_location(early, early_known, message, request)
+        if early_plan[0] == "geocode":
+            pipeline_stats["speculative_geocodes"] += 1
+            geocode_task = asyncio.create_task(timer.timed("geocode", geocode_location(early_plan[1], clients)))
+        if early_plan[0] != "missing" and early["radius_km"]:
+            pipeline_stats["speculative_searches"] += 1
+            # Shielded: cancelling the search must not cancel the geocode it waits on
+            coordinates = asyncio.shield(geocode_task) if geocode_task is not None else _resolved(early_plan[1])
+            search_task = asyncio.create_task(
+                timer.timed("poi_search", search_near(coordinates, early["radius_km"], early["query"], clients))
+            )
         
-        # DEBUG: Print parsed values
-        print(f"\n=== DEBUG PARSED VALUES ===")
-        print(f"Location: {parsed['location_name']}")
-        print(f"Radius: {parsed['radius_km']} km")
-        print(f"Query: {parsed['query']}")
-        print(f"===========================\n")
+        # The slots parsed again with the entities
+        _, parsed = cached if cached is not None else await gliner_task
+        message_location = parsed["location_name"]
+        parsed, known = merge_conversation_state(parsed, state)
+        plan = plan_location(parsed, known, message, request)
+        
+        if plan != early_plan:
+            if geocode_task is not None:
+                pipeline_stats["speculative_geocodes_cancelled"] += 1
+            _discard(geocode_task)
+            geocode_task = None
+        if search_task is not None and (
+            plan != early_plan or parsed["radius_km"] != early["radius_km"] or parsed["query"] != early["query"]
+        ):
+            pipeline_stats["speculative_searches_cancelled"] += 1
+            _discard(search_task)
+            search_task = None
+        
+        logger.debug(
+            "Parsed chat message",
+            extra={"location": parsed["location_name"], "radius_km": parsed["radius_km"], "query": parsed["query"]}
+        )
         
         # Determine what's missing
         missing_fields = []
         lat, lng = None, None
+        geocoded = known
         
-        # Try to geocode location if provided
-        if parsed["location_name"]:
+        if plan[0] == "known":
+            lat, lng = geocoded = plan[1]
+        elif plan[0] == "geocode":
+            if geocode_task is None:
+                geocode_task = asyncio.create_task(timer.timed("geocode", geocode_location(plan[1], clients)))
             try:
-                geocode_req = GeocodeRequest(place_name=parsed["location_name"])
-                location = await geocode_place(geocode_req)
-                lat = location.lat
-                lng = location.lng
-            except:
+                lat, lng = geocoded = await geocode_task
+            except Exception:
+                # The speculative search was waiting on the failed geocode
+                _discard(search_task)
+                search_task = None
                 # If geocoding fails but we have current location, use it as fallback
                 if request.current_lat and request.current_lng:
                     lat = request.current_lat
                     lng = request.current_lng
                 else:
                     missing_fields.append("location")
+        elif plan[0] == "current":
+            lat, lng = plan[1]
+            parsed["location_name"] = "vị trí hiện tại"
         else:
-            # No location name extracted, check if we should use current location
-            # First check if message indicates "current location"
-            current_location_patterns = [
-                r'hiện tại',
-                r'đang ở đây',
-                r'vị trí hiện tại',
-                r'chỗ này',
-                r'chỗ mình',
-                r'địa chỉ hiện tại',
-                r'của mình',
-                r'địa chỉ của mình',
-                r'nơi này',
-                r'nơi mình đang',
-                r'chỗ tôi',
-                r'ở đây',
-            ]
-            
-            uses_current_location = any(re.search(pattern, message, re.IGNORECASE) for pattern in current_location_patterns)
-            
-            if uses_current_location:
-                if request.current_lat and request.current_lng:
-                    lat = request.current_lat
-                    lng = request.current_lng
-                    parsed["location_name"] = "vị trí hiện tại"
-                else:
-                    missing_fields.append("current_location")
-            # If we have current location available, use it as default
-            elif request.current_lat and request.current_lng:
-                lat = request.current_lat
-                lng = request.current_lng
-                parsed["location_name"] = "vị trí hiện tại"
-            else:
-                missing_fields.append("location")
+            missing_fields.append(plan[1])
         
         if parsed["radius_km"] is None:
             missing_fields.append("radius")
         
-        # DEBUG: Print final values before search
-        print(f"\n=== DEBUG FINAL VALUES ===")
-        print(f"Lat: {lat}, Lng: {lng}")
-        print(f"Radius: {parsed['radius_km']} km")
-        print(f"Query: {parsed['query']}")
-        print(f"Missing fields: {missing_fields}")
-        print(f"==========================\n")
+        logger.debug(
+            "Resolved chat slots",
+            extra={
+                "lat": lat,
+                "lng": lng,
+                "radius_km": parsed["radius_km"],
+                "query": parsed["query"],
+                "missing_fields": missing_fields,
+            }
+        )
         
+        # Remember the slots for the next turn. A fallback to the current position
+        # is not stored, so the next turn falls back to the position it is sent.
+        location_name = message_location or (state.location_name if state is not None else None)
+        await conversation_store.set(conversation_id, ConversationState(
+            location_name=location_name,
+            lat=geocoded[0] if location_name and geocoded else None,
+            lng=geocoded[1] if location_name and geocoded else None,
+            radius_km=parsed["radius_km"],
+            query=parsed["query"],
+        ))
         # Build response
         extracted = ExtractedEntities(
             location_name=parsed["location_name"],
@@ -294,17 +310,14 @@ async def chat_with_bot(request: ChatRequest):
         # If we have all needed info, search for POIs
         if lat and lng and parsed["radius_km"]:
             try:
-                poi_request = POIRequest(
-                    lat=lat,
-                    lng=lng,
-                    radius_m=int(parsed["radius_km"] * 1000),
-                    query=parsed["query"]
-                )
-                pois = await find_points_of_interest(poi_request)
+                if search_task is None:
+                    search_task = asyncio.create_task(
+                        timer.timed("poi_search", search_near(_resolved((lat, lng)), parsed["radius_km"], parsed["query"], clients))
+                    )
+                pois = await search_task
                 
                 # Format response message
                 if pois:
-                    poi_list = [{"name": poi.name, "type": poi.type, "lat": poi.lat, "lng": poi.lng, "description": poi.description} for poi in pois]
                     response_msg = f"Mình đã tìm thấy {len(pois)} địa điểm"
                     if parsed["query"]:
                         response_msg += f" về '{parsed['query']}'"
@@ -312,27 +325,32 @@ async def chat_with_bot(request: ChatRequest):
                         response_msg += f" gần {parsed['location_name']}"
                     response_msg += f" trong bán kính {parsed['radius_km']}km!"
                     
-                    return ChatResponse(
+                    return _respond(timer, ChatResponse(
                         message=response_msg,
                         extracted_entities=extracted,
                         needs_clarification=False,
-                        search_results=poi_list
-                    )
+                        conversation_id=conversation_id,
+                        timings=timer.summary() if request.debug else None
+                    ), search_results=pois)
                 else:
-                    return ChatResponse(
+                    return _respond(timer, ChatResponse(
                         message="Xin lỗi, mình không tìm thấy địa điểm nào phù hợp với yêu cầu của bạn.",
                         extracted_entities=extracted,
                         needs_clarification=False,
-                        search_results=[]
-                    )
+                        search_results=[],
+                        conversation_id=conversation_id,
+                        timings=timer.summary() if request.debug else None
+                    ))
             except HTTPException as e:
                 if e.status_code == 404:
-                    return ChatResponse(
+                    return _respond(timer, ChatResponse(
                         message="Xin lỗi, mình không tìm thấy địa điểm nào phù hợp với yêu cầu của bạn.",
                         extracted_entities=extracted,
                         needs_clarification=False,
-                        search_results=[]
-                    )
+                        search_results=[],
+                        conversation_id=conversation_id,
+                        timings=timer.summary() if request.debug else None
+                    ))
                 raise
         
         # Ask for missing information
@@ -347,16 +365,7 @@ async def chat_with_bot(request: ChatRequest):
                 clarification_msg += f" để tìm {parsed['query']}"
         
         # Check if user explicitly said "anything is fine" or similar
-        anything_fine_patterns = [
-            r'cái nào cũng được',
-            r'gì cũng được',
-            r'tất cả',
-            r'bất kỳ',
-            r'không có yêu cầu',
-            r'không yêu cầu gì'
-        ]
-        
-        user_accepts_any = any(re.search(pattern, message, re.IGNORECASE) for pattern in anything_fine_patterns)
+        user_accepts_any = ACCEPT_ANY_RE.search(message) is not None
         
         if not parsed["query"] and not clarification_msg:
             if user_accepts_any:
@@ -366,15 +375,35 @@ async def chat_with_bot(request: ChatRequest):
                 # Ask for query specification
                 clarification_msg = "Bạn có yêu cầu gì về địa điểm không hay cái nào cũng được?"
         
-        return ChatResponse(
+        return _respond(timer, ChatResponse(
             message=clarification_msg,
             extracted_entities=extracted,
             needs_clarification=True,
-            search_results=None
-        )
+            search_results=None,
+            conversation_id=conversation_id,
+            timings=timer.summary() if request.debug else None
+        ))
     
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error in chatbot: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logger.exception("Error in chatbot")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        # Nothing started for this turn outlives it
+        for task in (gliner_task, geocode_task, search_task):
+            _discard(task)
+
+
+@router.get("/chat/stats")
+async def chat_stats():
+    """
+    Conversation store, entity extraction, entity cache and pipeline statistics
+    """
+    return {
+        "conversations": conversation_store.stats(),
+        "entities": entity_extractor.stats(),
+        "entity_cache": entity_cache.stats(),
+        "pipeline": pipeline_stats,
+    }
+
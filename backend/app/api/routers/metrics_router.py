@@ -0,0 +1,79 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.api.routers.place_router import nominatim_limiter, nominatim_flight
+from app.services.conversation_store import conversation_store
+from app.services.entity_cache import entity_cache
+from app.services.entity_extractor import entity_extractor
+from app.services.gazetteer import get_gazetteer
+from app.services.geocode_cache import geocode_cache
+from app.services.overpass_client import overpass_client
+from app.services.response_cache import response_cache
+from app.services.tile_cache import poi_tile_cache
+from app.services.warmer import hot_area_warmer
+from app.util.metrics import CallbackMetric, render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+def _cache_hit_rates():
+    gazetteer = get_gazetteer()
+    yield {"cache": "geocode"}, geocode_cache.stats()["hit_rate"]
+    yield {"cache": "poi_tiles"}, poi_tile_cache.stats()["hit_rate"]
+    yield {"cache": "responses"}, response_cache.stats()["hit_rate"]
+    yield {"cache": "conversations"}, conversation_store.stats()["hit_rate"]
+    yield {"cache": "entities"}, entity_cache.stats()["hit_rate"]
+    if gazetteer is not None:
+        yield {"cache": "gazetteer"}, gazetteer.stats()["hit_rate"]
+
+
+def _overpass_counts():
+    stats = overpass_client.stats()
+    for event in ("queries", "hedges", "hedge_wins", "failovers", "exhausted", "stopped_early"):
+        yield {"event": event}, stats[event]
+
+
+def _overpass_circuits():
+    for endpoint in overpass_client.stats()["endpoints"]:
+        yield {"endpoint": endpoint["url"], "state": endpoint["state"]}, 1
+
+
+def _entity_calls():
+    stats = entity_extractor.stats()
+    for backend in ("local", "remote"):
+        yield {"backend": backend}, stats[f"{backend}_calls"]
+
+
+# Numbers the caches and clients already keep, read when /metrics is scraped
+CallbackMetric("app_cache_hit_ratio", "Hit rate of each cache since startup", _cache_hit_rates, labelnames=("cache",))
+CallbackMetric(
+    "app_overpass_events_total", "Overpass queries, hedges and failovers", _overpass_counts,
+    type="counter", labelnames=("event",)
+)
+CallbackMetric(
+    "app_overpass_circuit_state", "Circuit breaker state of each Overpass endpoint", _overpass_circuits,
+    labelnames=("endpoint", "state")
+)
+CallbackMetric(
+    "app_nominatim_queue_depth", "Geocodes waiting for the Nominatim rate limit",
+    lambda: [({}, nominatim_limiter.stats()["queue_depth"])]
+)
+CallbackMetric(
+    "app_nominatim_coalesced_total", "Geocodes that joined an identical request in flight",
+    lambda: [({}, nominatim_flight.stats()["coalesced"])], type="counter"
+)
+CallbackMetric(
+    "app_warm_coverage", "Share of the hot area tiles that are cached and valid",
+    lambda: [({}, hot_area_warmer.stats()["coverage"])]
+)
+CallbackMetric(
+    "app_entity_extractions_total", "Gliner entity extractions by backend", _entity_calls,
+    type="counter", labelnames=("backend",)
+)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics: per-stage latency histograms, upstream status codes and cache hit rates
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -1,13 +1,41 @@
-from fastapi import APIRouter, HTTPException
-from app.schemas import Location, PointOfInterest, GeocodeRequest, POIRequest
-from app.util.load_env import load_env_variable
-import httpx
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from app.schemas import Location, PointOfInterest, GeocodeRequest, GeocodeBatchRequest, GeocodeBatchItem, POIRequest, POIBatchRequest, POIBatchResult
+from app.util.load_env import load_env_variable, load_env_setting
+from app.util.text import normalize_place_name
+from app.util.metrics import stage
+from app.util.geo import snap_to_grid
+from app.util.json_response import FastJSONResponse, dumps
+from app.services.poi_service import build_overpass_bbox_query, build_overpass_ring_query, resolve_category, POIDeduper, POIRecord
+from app.services.poi_collector import CollectedPOIs, POICollector
+from app.services.text_index import SCORE_STRONG_MATCH, match_pois
+from app.services.upstream_service import UpstreamClients, get_upstream_clients
+from app.services.geocode_cache import geocode_cache, NOT_FOUND
+from app.services.gazetteer import get_gazetteer, lookup_place
+from app.services.rate_limiter import TokenBucket, SingleFlight
+from app.services.tile_cache import POITileCache, TRUNCATED, poi_tile_cache
+from app.services.poi_index import get_local_poi_index
+from app.services.poi_ranking import rank_matches
+from app.services.overpass_client import overpass_client
+from app.services.response_cache import CachedRoute, response_cache
+from app.services.warmer import hot_area_warmer
 import asyncio
+import base64
+import hashlib
+import httpx
+import json
+import logging
+import math
 import os
-from typing import List
+import secrets
+import time
+from pydantic import ValidationError
+from typing import Annotated, AsyncIterator, Dict, List, Optional, Tuple
 
 router = APIRouter(prefix="/place", tags=["place"])
 
+logger = logging.getLogger(__name__)
+
 # Load environment variables
 try:
     EMAIL = load_env_variable("EMAIL")
@@ -15,70 +43,145 @@ except:
     EMAIL = os.getenv("EMAIL", "your-email@example.com")
 
 # Constants
-NOMINATIM_BASE = "https://nominatim.openstreetmap.org"
-OVERPASS_BASE = "https://overpass.kumi.systems/api/interpreter"
+# Overridable to point at a local Nominatim or the benchmark stand-in
+NOMINATIM_BASE = load_env_setting("NOMINATIM_URL", "https://nominatim.openstreetmap.org")
 USER_AGENT = f"Vietnam-Explorer/1.0 (contact: {EMAIL})"
 
-# Amenity types to search for POIs
-AMENITY_TYPES = [
-    "bank", "restaurant", "cafe", "hotel", "museum", "park",
-    "library", "hospital", "pharmacy", "supermarket", "shop",
-    "cinema", "temple", "church", "school"
-]
+# Nominatim allows at most 1 request per second for the whole application
+nominatim_limiter = TokenBucket(rate=load_env_setting("NOMINATIM_RATE", 1.0, float))
+nominatim_flight = SingleFlight()
+
+# Serve POI searches from the spatial tile cache instead of one Overpass query per search
+POI_TILE_CACHE_ENABLED = load_env_setting("POI_TILE_CACHE", True, bool)
+
+# "local" answers POI searches from the offline index, falling back to Overpass
+# when the index is missing or does not cover the search area
+POI_BACKEND = load_env_setting("POI_BACKEND", "overpass")
+
+# Batch geocoding lookups allowed in the Nominatim queue at once
+GEOCODE_BATCH_CONCURRENCY = load_env_setting("GEOCODE_BATCH_CONCURRENCY", 2, int)
+
+# Number of POIs returned per page when the request does not set a limit
+DEFAULT_POI_LIMIT = 5
+
+# How long browsers, proxies and the response cache may reuse a response, in seconds
+POI_RESPONSE_MAX_AGE = load_env_setting("POI_RESPONSE_MAX_AGE", 300, int)
+GEOCODE_RESPONSE_MAX_AGE = load_env_setting("GEOCODE_RESPONSE_MAX_AGE", 24 * 3600, int)
+
+# POST /place/warm needs this token in X-Warm-Token; without one set, only clients
+# on this host may start a run (set a token when a proxy on this host forwards requests)
+WARMER_TOKEN = load_env_setting("WARMER_TOKEN", "")
+# Manual warm-up runs start at most this often, in seconds
+WARMER_MANUAL_INTERVAL = load_env_setting("WARMER_MANUAL_INTERVAL", 60.0, float)
+
+# Adaptive searches start at this radius and grow by this factor up to radius_m
+POI_ADAPTIVE_START_M = load_env_setting("POI_ADAPTIVE_START_M", 500, int)
+POI_ADAPTIVE_GROWTH = load_env_setting("POI_ADAPTIVE_GROWTH", 2.0, float)
+
+
+async def _fetch_coordinates(place_name: str, clients: UpstreamClients) -> Tuple[float, float]:
+    """
+    Look up a place name on Nominatim and cache the result
+    """
+    # Respect the Nominatim usage policy; only waits when another request just went out
+    await nominatim_limiter.acquire()
+
+    params = {
+        "q": f"{place_name}, Vietnam",
+        "format": "jsonv2",
+        "limit": "1",
+        "addressdetails": "1"
+    }
+    
+    with stage("geocode", "nominatim"):
+        response = await clients.nominatim.get(
+            f"{NOMINATIM_BASE}/search",
+            params=params,
+            headers={
+                "User-Agent": USER_AGENT,
+                "Accept": "application/json",
+                "Accept-Language": "en"
+            }
+        )
+    
+    if response.status_code == 0 or response.status_code == 503 or response.status_code == 504:
+        raise HTTPException(
+            status_code=503,
+            detail="Unable to connect to the server. Please check your internet connection."
+        )
+    
+    response.raise_for_status()
+    data = response.json()
+    
+    if not data or len(data) == 0:
+        await geocode_cache.set_not_found(place_name)
+        raise HTTPException(
+            status_code=404,
+            detail="Không tìm thấy kết quả"
+        )
+    
+    item = data[0]
+    logger.debug(
+        "Geocoded with Nominatim",
+        extra={"place_name": place_name, "lat": item["lat"], "lng": item["lon"], "display_name": item["display_name"]}
+    )
+    
+    lat, lng = float(item["lat"]), float(item["lon"])
+    await geocode_cache.set(place_name, lat, lng)
+    return lat, lng
+
+
+def _near_known_place(place_name: str) -> Location:
+    """
+    Location of the well-known place closest in spelling to a name Nominatim
+    does not know, e.g. a typo like "ben thnah"; 404 if there is none
+    """
+    with stage("geocode", "gazetteer"):
+        known = lookup_place(place_name, fuzzy=True)
+    if known is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Không tìm thấy kết quả"
+        )
+    return Location(name=place_name, lat=known[0], lng=known[1])
 
 
 @router.post("/geocode", response_model=Location)
-async def geocode_place(request: GeocodeRequest):
+async def geocode_place(
+    request: GeocodeRequest,
+    clients: UpstreamClients = Depends(get_upstream_clients)
+):
     """
-    Geocode a place name to coordinates using Nominatim API
+    Geocode a place name to coordinates using the local gazetteer, or Nominatim API.
+    Names Nominatim does not know may still be near spellings of gazetteer places.
     """
     try:
-        # Add delay to respect Nominatim usage policy
-        await asyncio.sleep(1)
-        
-        params = {
-            "q": f"{request.place_name}, Vietnam",
-            "format": "jsonv2",
-            "limit": "1",
-            "addressdetails": "1"
-        }
-        
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.get(
-                f"{NOMINATIM_BASE}/search",
-                params=params,
-                headers={
-                    "User-Agent": USER_AGENT,
-                    "Accept": "application/json",
-                    "Accept-Language": "en"
-                }
-            )
-            
-            if response.status_code == 0 or response.status_code == 503 or response.status_code == 504:
-                raise HTTPException(
-                    status_code=503,
-                    detail="Unable to connect to the server. Please check your internet connection."
-                )
-            
-            response.raise_for_status()
-            data = response.json()
-            
-            if not data or len(data) == 0:
-                raise HTTPException(
-                    status_code=404,
-                    detail="Không tìm thấy kết quả"
-                )
-            
-            item = data[0]
-            print(f"Query: {request.place_name}")
-            print(f"Lat/Lon: {item['lat']}, {item['lon']}")
-            print(f"Display name: {item['display_name']}")
-            
-            return Location(
-                name=request.place_name,
-                lat=float(item["lat"]),
-                lng=float(item["lon"])
+        # Well-known places are resolved in-process without a network request
+        with stage("geocode", "gazetteer"):
+            known = lookup_place(request.place_name)
+        if known is not None:
+            return Location(name=request.place_name, lat=known[0], lng=known[1])
+
+        # Serve repeated names from the cache, including names we know Nominatim can't find
+        with stage("geocode", "cache"):
+            cached = await geocode_cache.get(request.place_name)
+        if cached == NOT_FOUND:
+            return _near_known_place(request.place_name)
+        if cached is not None:
+            lat, lng = cached
+            return Location(name=request.place_name, lat=lat, lng=lng)
+
+        # Concurrent lookups of the same name share one Nominatim request
+        try:
+            lat, lng = await nominatim_flight.do(
+                normalize_place_name(request.place_name),
+                lambda: _fetch_coordinates(request.place_name, clients)
             )
+        except HTTPException as e:
+            if e.status_code != 404:
+                raise
+            return _near_known_place(request.place_name)
+        return Location(name=request.place_name, lat=lat, lng=lng)
     
     except httpx.TimeoutException:
         raise HTTPException(
@@ -93,120 +196,625 @@ async def geocode_place(request: GeocodeRequest):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Geocoding error: {e}")
+        logger.exception("Geocoding error", extra={"place_name": request.place_name})
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/geocode", response_model=Location)
+async def geocode_place_query(
+    request: Annotated[GeocodeRequest, Query()],
+    clients: UpstreamClients = Depends(get_upstream_clients)
+):
+    """
+    Same as POST /place/geocode with the place name in the query string, so
+    browsers can cache the response
+    """
+    return await geocode_place(request, clients)
+
+
+async def _geocode_batch_result(place_name: str, clients: UpstreamClients) -> Tuple[int, Optional[Location], Optional[str]]:
+    try:
+        location = await geocode_place(GeocodeRequest(place_name=place_name), clients)
+        return 200, location, None
+    except HTTPException as e:
+        return e.status_code, None, e.detail
+
+
+@router.post("/geocode/batch")
+async def geocode_places(
+    request: GeocodeBatchRequest,
+    clients: UpstreamClients = Depends(get_upstream_clients)
+):
+    """
+    Geocode many place names, streaming one newline-delimited JSON result per name.
+    Names equal after normalization are looked up once. Cached names are answered
+    first; the rest go through the shared Nominatim rate limit a few at a time,
+    so interactive geocoding is not stuck behind a whole batch.
+    """
+    def line(index: int, status: int, location: Optional[Location], detail: Optional[str]) -> bytes:
+        item = GeocodeBatchItem(
+            index=index,
+            place_name=request.place_names[index],
+            status=status,
+            location=location.model_copy(update={"name": request.place_names[index]}) if location else None,
+            detail=detail,
+        )
+        return (item.model_dump_json(exclude_none=True) + "\n").encode("utf-8")
+
+    async def resolve(indices: List[int], semaphore: asyncio.Semaphore):
+        async with semaphore:
+            return indices, await _geocode_batch_result(request.place_names[indices[0]], clients)
+
+    async def generate() -> AsyncIterator[bytes]:
+        # Input positions of every distinct normalized name
+        groups: Dict[str, List[int]] = {}
+        for i, place_name in enumerate(request.place_names):
+            key = normalize_place_name(place_name)
+            if not key:
+                yield line(i, 400, None, "Empty place name")
+                continue
+            groups.setdefault(key, []).append(i)
+
+        misses = []
+        for indices in groups.values():
+            place_name = request.place_names[indices[0]]
+            cached = lookup_place(place_name) or await geocode_cache.get(place_name)
+            if cached == NOT_FOUND:
+                # Names Nominatim does not know may be typos of well-known places
+                cached = lookup_place(place_name, fuzzy=True) or NOT_FOUND
+            if cached is None:
+                misses.append(indices)
+                continue
+            for i in indices:
+                if cached == NOT_FOUND:
+                    yield line(i, 404, None, "Không tìm thấy kết quả")
+                else:
+                    yield line(i, 200, Location(name=place_name, lat=cached[0], lng=cached[1]), None)
+
+        semaphore = asyncio.Semaphore(GEOCODE_BATCH_CONCURRENCY)
+        tasks = [asyncio.create_task(resolve(indices, semaphore)) for indices in misses]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                indices, (status, location, detail) = await next_result
+                for i in indices:
+                    yield line(i, status, location, detail)
+        except Exception as e:
+            # Headers are already sent, so report the failure as the last line
+            logger.exception("Error in batch geocoding")
+            yield (json.dumps({"error": "Failed to geocode the remaining names"}) + "\n").encode("utf-8")
+        finally:
+            # The client went away or we failed: drop the lookups still queued
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+@router.get("/geocode/stats")
+async def geocode_stats():
+    """
+    Gazetteer and cache hit/miss counters and Nominatim queue statistics
+    """
+    gazetteer = get_gazetteer()
+    return {
+        "gazetteer": gazetteer.stats() if gazetteer is not None else None,
+        "cache": geocode_cache.stats(),
+        "rate_limiter": nominatim_limiter.stats(),
+        "coalescing": nominatim_flight.stats(),
+    }
+
+
+async def _fetch_overpass_pois(overpass_query: str, clients: UpstreamClients) -> Optional[CollectedPOIs]:
+    """
+    Run an Overpass query on the best mirror, returning None if the request failed.
+    Elements become deduplicated POIs while the response downloads.
+    """
+    with stage("poi", "overpass_fetch"):
+        return await overpass_client.query(
+            clients.overpass,
+            overpass_query,
+            headers={"User-Agent": USER_AGENT},
+            sink=lambda: POICollector(overpass_client.max_elements)
+        )
+
+
+async def _fetch_bbox_pois(bbox: Tuple[float, float, float, float], clients: UpstreamClients) -> Optional[List[POIRecord]]:
+    collected = await _fetch_overpass_pois(build_overpass_bbox_query(*bbox), clients)
+    if collected is None:
+        return None
+    # Tiles are cached as complete, so the tile cache fetches a cut-short box in parts
+    return TRUNCATED if collected.truncated else collected.pois
+
+
+@router.get("/poi/stats")
+async def poi_stats():
+    """
+    Tile cache, response cache and Overpass mirror statistics for POI searches
+    """
+    return {
+        "tile_cache": poi_tile_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "overpass": overpass_client.stats(),
+    }
+
+
+def _search_key(request: POIRequest) -> str:
+    # Ties a cursor to the search it was issued for. Cached pages are shared by
+    # searches in the same response cache cell, so their cursors must be too.
+    grid = response_cache.grid_deg
+    raw = f"{snap_to_grid(request.lat, grid)}|{snap_to_grid(request.lng, grid)}|{request.radius_m}|{request.query or ''}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def _encode_cursor(request: POIRequest, offset: int) -> str:
+    raw = json.dumps({"k": _search_key(request), "o": offset})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(request: POIRequest) -> int:
+    if not request.cursor:
+        return 0
+    try:
+        data = json.loads(base64.urlsafe_b64decode(request.cursor.encode("ascii")))
+        offset = int(data["o"])
+        valid = data["k"] == _search_key(request) and offset >= 0
+    except (ValueError, KeyError, TypeError):
+        valid = False
+    if not valid:
+        raise HTTPException(status_code=400, detail="Invalid cursor for this search")
+    return offset
+
+
+def _search_tile_cache(request: POIRequest, tile_cache: Optional[POITileCache]) -> Optional[POITileCache]:
+    """
+    The tile cache a remote search goes through, or None for a direct Overpass query
+    """
+    if tile_cache is None and POI_TILE_CACHE_ENABLED:
+        tile_cache = poi_tile_cache
+    if tile_cache is not None and tile_cache.tileable(request.lat, request.lng, request.radius_m):
+        return tile_cache
+    return None
+
+
+async def _iter_poi_batches(
+    request: POIRequest,
+    clients: UpstreamClients,
+    tile_cache: Optional[POITileCache] = None,
+    inner_m: int = 0
+) -> AsyncIterator[List[POIRecord]]:
+    """
+    Yield candidate POIs in batches as soon as each source produces them.
+    `tile_cache` overrides the shared tile cache, e.g. with one prefilled for a batch.
+    With `inner_m`, a direct Overpass search only asks for the ring outside that
+    radius; cached tiles and the local index return the whole circle regardless.
+    """
+    if _served_locally(request):
+        yield get_local_poi_index().search(
+            request.lat, request.lng, request.radius_m, resolve_category(request.query)
+        )
+        return
+
+    tile_cache = _search_tile_cache(request, tile_cache)
+    if tile_cache is not None:
+        # Cached tiles are served directly; only missing tiles go to Overpass
+        async for batch in tile_cache.iter_search(
+            request.lat, request.lng, request.radius_m,
+            lambda bbox: _fetch_bbox_pois(bbox, clients)
+        ):
+            yield batch
+    else:
+        # One union query covers every category, so a search is a single round trip
+        overpass_query = build_overpass_ring_query(
+            request.lat, request.lng, inner_m, request.radius_m, request.query
+        )
+        collected = await _fetch_overpass_pois(overpass_query, clients)
+        yield collected.pois if collected is not None else []
+
+
+async def _iter_matching_pois(
+    request: POIRequest,
+    clients: UpstreamClients,
+    tile_cache: Optional[POITileCache] = None,
+    inner_m: int = 0,
+    deduper: Optional[POIDeduper] = None
+) -> AsyncIterator[List[Tuple[POIRecord, float]]]:
+    """
+    Batches of (POI, match score) for POIs matching the search term,
+    deduplicated across batches, and across searches sharing `deduper`
+    """
+    category = resolve_category(request.query)
+    deduper = deduper or POIDeduper()
+    if request.query and not _served_locally(request):
+        search_cache = _search_tile_cache(request, tile_cache)
+        if search_cache is not None:
+            # Each tile is matched through the text index kept with it
+            async for tiles in search_cache.iter_tiles(
+                request.lat, request.lng, request.radius_m,
+                lambda bbox: _fetch_bbox_pois(bbox, clients)
+            ):
+                with stage("poi", "dedup_filter"):
+                    matches = [
+                        (poi, score)
+                        for poi, score in search_cache.match_tiles(
+                            tiles, request.lat, request.lng, request.radius_m, request.query, category
+                        )
+                        if deduper.add(poi)
+                    ]
+                yield matches
+            return
+
+    async for batch in _iter_poi_batches(request, clients, tile_cache, inner_m):
+        with stage("poi", "dedup_filter"):
+            matches = [
+                (poi, score) for poi, score in match_pois(batch, request.query, category)
+                if deduper.add(poi)
+            ]
+        yield matches
+
+
+async def search_points_of_interest(
+    request: POIRequest,
+    clients: UpstreamClients,
+    tile_cache: Optional[POITileCache] = None
+) -> List[Tuple[POIRecord, float]]:
+    """
+    Every POI matching the request with its match score, deduplicated but not ranked
+    """
+    matches: List[Tuple[POIRecord, float]] = []
+    async for batch in _iter_matching_pois(request, clients, tile_cache):
+        matches.extend(batch)
+    return matches
+
+
+def _ring_radii(radius_m: int) -> List[int]:
+    """
+    Radii of an adaptive search: from the start radius, growing geometrically to radius_m
+    """
+    radii = []
+    radius = min(POI_ADAPTIVE_START_M, radius_m)
+    while radius < radius_m:
+        radii.append(radius)
+        radius = max(int(radius * POI_ADAPTIVE_GROWTH), radius + 1)
+    radii.append(radius_m)
+    return radii
+
+
+async def _iter_ring_matches(
+    request: POIRequest,
+    clients: UpstreamClients,
+    tile_cache: Optional[POITileCache] = None
+) -> AsyncIterator[Tuple[int, List[Tuple[POIRecord, float]]]]:
+    """
+    (radius, matches) for each ring of an adaptive search, inner rings first.
+    Each ring only adds the POIs it found beyond the rings before it.
+    """
+    deduper = POIDeduper()
+    inner_m = 0
+    for radius in _ring_radii(request.radius_m):
+        ring = request.model_copy(update={"radius_m": radius})
+        matches: List[Tuple[POIRecord, float]] = []
+        async for batch in _iter_matching_pois(ring, clients, tile_cache, inner_m=inner_m, deduper=deduper):
+            matches.extend(batch)
+        yield radius, matches
+        inner_m = radius
+
+
+async def adaptive_search_points_of_interest(
+    request: POIRequest,
+    clients: UpstreamClients,
+    k: int,
+    tile_cache: Optional[POITileCache] = None
+) -> Tuple[List[Tuple[POIRecord, float]], int]:
+    """
+    Search rings of growing radius until k POIs match the name or category
+    strongly, or radius_m is reached. Returns every match (weak ones included)
+    with the radius searched.
+
+    Every POI within the returned radius is found, so without a query the k
+    nearest are exact; with one, only a description or fuzzy match may lose
+    to a better match farther out.
+    """
+    matches: List[Tuple[POIRecord, float]] = []
+    strong = 0
+    radius = 0
+    async for radius, ring_matches in _iter_ring_matches(request, clients, tile_cache):
+        matches.extend(ring_matches)
+        # Weak matches are kept but do not end the search
+        strong += sum(score >= SCORE_STRONG_MATCH for _, score in ring_matches)
+        if strong >= k:
+            break
+    logger.debug("Adaptive POI search", extra={"radius_m": radius, "matches": len(matches), "strong": strong})
+    return matches, radius
+
+
+async def _search_page(
+    request: POIRequest,
+    clients: UpstreamClients,
+    offset: int,
+    limit: int,
+    tile_cache: Optional[POITileCache] = None
+) -> Tuple[List[Tuple[POIRecord, float]], int, bool]:
+    """
+    Matches for the page at `offset`, the radius searched, and whether a next page may exist
+    """
+    hot_area_warmer.record(request.lat, request.lng, request.radius_m)
+    if request.adaptive:
+        matches, radius = await adaptive_search_points_of_interest(request, clients, offset + limit, tile_cache)
+        # An adaptive search stopped early may have more POIs beyond its radius
+        return matches, radius, offset + limit < len(matches) or radius < request.radius_m
+    matches = await search_points_of_interest(request, clients, tile_cache)
+    return matches, request.radius_m, offset + limit < len(matches)
+
+
 @router.post("/poi", response_model=List[PointOfInterest])
-async def find_points_of_interest(request: POIRequest):
+async def find_points_of_interest(
+    request: POIRequest,
+    clients: UpstreamClients = Depends(get_upstream_clients)
+):
     """
-    Fetch points of interest using Overpass API
+    Fetch points of interest using Overpass API.
+    Results are paginated: pass the X-Next-Cursor response header as `cursor`
+    to get the next `limit` POIs. X-Search-Radius is the radius searched, which
+    an `adaptive` search keeps as small as the page allows.
     """
     try:
-        pois = []
-        
-        # Create a single client with proper configuration for all requests
-        async with httpx.AsyncClient(
-            timeout=30.0,
-            follow_redirects=True,
-            verify=False  # Disable SSL verification if needed
-        ) as client:
-            # Query different amenity types to get diverse POIs
-            for amenity_type in AMENITY_TYPES:
-                overpass_query = f"""
-                    [out:json][timeout:30];
-                    nwr(around:{request.radius_m},{request.lat},{request.lng})["amenity"];
-                    out center;
-"""
-                
-                try:
-                    response = await client.post(
-                        OVERPASS_BASE,
-                        content=f"data={overpass_query}",
-                        headers={
-                            "Content-Type": "application/x-www-form-urlencoded",
-                            "User-Agent": USER_AGENT
-                        }
-                    )
-                    
-                    if response.status_code != 200:
-                        continue
-                    
-                    data = response.json()
-                    
-                    if data.get("elements") and len(data["elements"]) > 0:
-                        for element in data["elements"]:
-                            tags = element.get("tags", {})
-                            name = (
-                                tags.get("name") or
-                                tags.get("operator") or
-                                tags.get("brand") or
-                                tags.get("amenity") or
-                                amenity_type
-                            )
-                            
-                            # Get coordinates
-                            if "center" in element:
-                                lat = element["center"]["lat"]
-                                lng = element["center"]["lon"]
-                            else:
-                                lat = element.get("lat")
-                                lng = element.get("lon")
-                            
-                            if lat is None or lng is None:
-                                continue
-                            
-                            description = (
-                                tags.get("addr:full") or
-                                tags.get("addr:street") or
-                                tags.get("addr:housename") or
-                                tags.get("description") or
-                                tags.get("website") or
-                                tags.get("phone") or
-                                f"A {amenity_type} in the area"
-                            )
-                            
-                            # Check for duplicates
-                            is_duplicate = any(
-                                abs(p.lat - lat) < 0.001 and abs(p.lng - lng) < 0.001
-                                for p in pois
-                            )
-                            
-                            if not is_duplicate and name and name != amenity_type:
-                                pois.append(PointOfInterest(
-                                    name=name,
-                                    lat=lat,
-                                    lng=lng,
-                                    description=description,
-                                    type=amenity_type.capitalize()
-                                ))
-                
-                except (httpx.ConnectError, httpx.TimeoutException, httpx.NetworkError) as e:
-                    print(f"Failed to fetch {amenity_type}: {e}")
-                    continue
-                except Exception as e:
-                    print(f"Failed to fetch {amenity_type}: {e}")
-                    continue
-        
-        if request.query:
-            pois = [poi for poi in pois if request.query.lower() in poi.name.lower() or (poi.description and request.query.lower() in poi.description.lower())]
+        offset = _decode_cursor(request)
+        limit = request.limit or DEFAULT_POI_LIMIT
+
+        matches, radius, has_next = await _search_page(request, clients, offset, limit)
 
         # Raise error if no POIs found
-        if len(pois) == 0:
+        if len(matches) == 0:
             raise HTTPException(
                 status_code=404,
                 detail="No points of interest found in this area"
             )
 
-        print(f"Found POIs: {len(pois)}")
-        return pois[:5]
-                
+        logger.debug("Found POIs", extra={"matches": len(matches)})
+        headers = {"X-Search-Radius": str(radius)}
+        if has_next:
+            headers["X-Next-Cursor"] = _encode_cursor(request, offset + limit)
+
+        # Best matches first, nearest first among equally good matches
+        with stage("poi", "rank"):
+            pois = rank_matches(matches, request.lat, request.lng, k=offset + limit)[offset:]
+        # The records are serialized once, by orjson, without building response models
+        with stage("poi", "serialize"):
+            return FastJSONResponse(pois, headers=headers)
+
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error fetching POIs: {e}")
+        logger.exception("Error fetching POIs")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch points of interest: {str(e)}"
+        )
+
+
+@router.get("/poi", response_model=List[PointOfInterest])
+async def find_points_of_interest_query(
+    request: Annotated[POIRequest, Query()],
+    clients: UpstreamClients = Depends(get_upstream_clients)
+):
+    """
+    Same as POST /place/poi with the search in the query string, so browsers
+    can cache the response
+    """
+    return await find_points_of_interest(request, clients)
+
+
+def _served_locally(request: POIRequest) -> bool:
+    if POI_BACKEND != "local":
+        return False
+    index = get_local_poi_index()
+    return index is not None and index.covers(request.lat, request.lng)
+
+
+async def _poi_batch_result(
+    index: int,
+    request: POIRequest,
+    clients: UpstreamClients,
+    tile_cache: POITileCache
+) -> POIBatchResult:
+    try:
+        offset = _decode_cursor(request)
+        limit = request.limit or DEFAULT_POI_LIMIT
+        matches, radius, has_next = await _search_page(request, clients, offset, limit, tile_cache)
+        if len(matches) == 0:
+            return POIBatchResult(index=index, status=404, detail="No points of interest found in this area", radius_m=radius)
+        return POIBatchResult(
+            index=index,
+            status=200,
+            pois=rank_matches(matches, request.lat, request.lng, k=offset + limit)[offset:],
+            next_cursor=_encode_cursor(request, offset + limit) if has_next else None,
+            radius_m=radius,
+        )
+    except HTTPException as e:
+        return POIBatchResult(index=index, status=e.status_code, detail=e.detail)
+
+
+@router.post("/poi/batch", response_model=List[POIBatchResult])
+async def find_points_of_interest_batch(
+    request: POIBatchRequest,
+    clients: UpstreamClients = Depends(get_upstream_clients)
+):
+    """
+    Run many POI searches (e.g. every stop of a route) with shared upstream work.
+    The areas of all searches are merged into as few Overpass bbox fetches as
+    possible, then each search is answered from them with its own circle filter,
+    query and page. Results come back per search, in request order.
+    """
+    try:
+        # Without the shared tile cache, a throwaway one still merges the fetches
+        tile_cache = poi_tile_cache if POI_TILE_CACHE_ENABLED else POITileCache(ttl_seconds=300, max_pois=10_000_000)
+        # Adaptive searches fetch their rings as they go, not their whole circle up front
+        remote = [
+            r for r in request.requests
+            if not _served_locally(r) and not r.adaptive and tile_cache.tileable(r.lat, r.lng, r.radius_m)
+        ]
+        if remote:
+            fetches = await tile_cache.prefetch(
+                [(r.lat, r.lng, r.radius_m) for r in remote],
+                lambda bbox: _fetch_bbox_pois(bbox, clients)
+            )
+            logger.debug("Batch POI search", extra={"searches": len(request.requests), "fetches": fetches})
+
+        return await asyncio.gather(*(
+            _poi_batch_result(i, poi_request, clients, tile_cache)
+            for i, poi_request in enumerate(request.requests)
+        ))
+
+    except Exception as e:
+        logger.exception("Error fetching POIs")
         raise HTTPException(
             status_code=500,
             detail=f"Failed to fetch points of interest: {str(e)}"
         )
 
+
+@router.post("/poi/stream")
+async def stream_points_of_interest(
+    request: POIRequest,
+    clients: UpstreamClients = Depends(get_upstream_clients)
+):
+    """
+    Stream matching POIs as newline-delimited JSON while they are found.
+    Cached areas are sent first (nearest first within each batch), then the rest;
+    an `adaptive` search sends ring by ring instead, so it ends at the ring that
+    fills `limit`. `limit` caps the number of POIs; without it every match is sent.
+    """
+    async def batches() -> AsyncIterator[List[Tuple[POIRecord, float]]]:
+        if request.adaptive:
+            async for _, matches in _iter_ring_matches(request, clients):
+                yield matches
+        else:
+            async for matches in _iter_matching_pois(request, clients):
+                yield matches
+
+    async def generate() -> AsyncIterator[bytes]:
+        hot_area_warmer.record(request.lat, request.lng, request.radius_m)
+        sent = 0
+        try:
+            async for batch in batches():
+                remaining = (request.limit - sent) if request.limit else len(batch)
+                for poi in rank_matches(batch, request.lat, request.lng, k=remaining):
+                    yield dumps(poi) + b"\n"
+                    sent += 1
+                if request.limit and sent >= request.limit:
+                    break
+        except Exception as e:
+            # Headers are already sent, so report the failure as the last line
+            logger.exception("Error streaming POIs")
+            yield (json.dumps({"error": "Failed to fetch points of interest"}) + "\n").encode("utf-8")
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+async def _resolve_hot_place(place_name: str, clients: UpstreamClients, refresh_within: float) -> Tuple[float, float]:
+    """
+    geocode_place for the warmer, except that a cached Nominatim answer
+    expiring within `refresh_within` seconds is looked up again
+    """
+    if lookup_place(place_name) is None:
+        expires_at = await geocode_cache.expires_at(place_name)
+        if expires_at is not None and expires_at - time.time() < refresh_within:
+            return await nominatim_flight.do(
+                normalize_place_name(place_name),
+                lambda: _fetch_coordinates(place_name, clients)
+            )
+    location = await geocode_place(GeocodeRequest(place_name=place_name), clients)
+    return location.lat, location.lng
+
+
+async def warm_hot_areas(clients: UpstreamClients) -> dict:
+    """
+    One warm-up run of the hot areas into the tile cache searches read from
+    """
+    return await hot_area_warmer.run_once(
+        lambda place_name, refresh_within: _resolve_hot_place(place_name, clients, refresh_within),
+        lambda bbox: _fetch_bbox_pois(bbox, clients)
+    )
+
+
+def _check_warm_access(request: Request, token: Optional[str]):
+    """
+    Reject warm-up runs from other clients than the operator, or started too soon after the last run
+    """
+    if WARMER_TOKEN:
+        allowed = token is not None and secrets.compare_digest(token, WARMER_TOKEN)
+    else:
+        allowed = request.client is not None and request.client.host in ("127.0.0.1", "::1")
+    if not allowed:
+        raise HTTPException(status_code=403, detail="Not allowed to start a warm-up run")
+
+    last_run = hot_area_warmer.last_run
+    if last_run is not None:
+        wait = last_run["finished_at"] + WARMER_MANUAL_INTERVAL - time.time()
+        if wait > 0:
+            raise HTTPException(
+                status_code=429,
+                detail="A warm-up run finished recently",
+                headers={"Retry-After": str(math.ceil(wait))}
+            )
+
+
+@router.post("/warm")
+async def warm_points_of_interest(
+    request: Request,
+    x_warm_token: Annotated[Optional[str], Header()] = None,
+    clients: UpstreamClients = Depends(get_upstream_clients)
+):
+    """
+    Warm the hot areas now instead of waiting for the next scheduled run,
+    returning the report of the run. Only missing or expiring tiles are fetched.
+    Needs X-Warm-Token when WARMER_TOKEN is set, and runs at most once per
+    WARMER_MANUAL_INTERVAL seconds.
+    """
+    _check_warm_access(request, x_warm_token)
+    if not POI_TILE_CACHE_ENABLED:
+        raise HTTPException(status_code=409, detail="The POI tile cache is disabled")
+    return await warm_hot_areas(clients)
+
+
+@router.get("/warm/stats")
+async def warm_stats():
+    """
+    Warm coverage of the hot areas and the report of the last run
+    """
+    return hot_area_warmer.stats()
+
+
+def _poi_cache_key(params: dict) -> Optional[str]:
+    try:
+        request = POIRequest.model_validate(params)
+    except ValidationError:
+        # Left to the endpoint, which answers with the validation error
+        return None
+    grid = response_cache.grid_deg
+    return "|".join(map(str, (
+        snap_to_grid(request.lat, grid),
+        snap_to_grid(request.lng, grid),
+        request.radius_m,
+        (request.query or "").strip(),
+        request.limit or DEFAULT_POI_LIMIT,
+        request.cursor or "",
+        request.adaptive,
+    )))
+
+
+def _geocode_cache_key(params: dict) -> Optional[str]:
+    try:
+        request = GeocodeRequest.model_validate(params)
+    except ValidationError:
+        return None
+    # The response echoes the name as it was sent, so it is not normalized here
+    return request.place_name
+
+
+# Endpoints answered by the response cache middleware; nearby POI searches
+# share a cached page, so distances may be off by up to half a grid cell
+CACHED_ROUTES = [
+    CachedRoute(f"{router.prefix}/poi", _poi_cache_key, POI_RESPONSE_MAX_AGE),
+    CachedRoute(f"{router.prefix}/geocode", _geocode_cache_key, GEOCODE_RESPONSE_MAX_AGE),
+]
@@ -1,8 +1,69 @@
+from app.util.log import setup_logging, shutdown_logging
+from app.util.metrics import MetricsMiddleware
+
+# Before anything else logs: every record goes through the background writer
+setup_logging()
+
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.api import api_router
+from app.services.upstream_service import UpstreamClients
+from app.services.geocode_cache import geocode_cache
+from app.services.conversation_store import conversation_store
+from app.services.entity_extractor import entity_extractor
+from app.services.poi_index import get_local_poi_index
+from app.services.gazetteer import get_gazetteer
+from app.services.response_cache import ResponseCacheMiddleware, response_cache
+from app.services.warmer import hot_area_warmer
+from app.api.routers.place_router import POI_BACKEND, POI_TILE_CACHE_ENABLED, CACHED_ROUTES, warm_hot_areas
+import asyncio
+import contextlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Restarts the log writer if an earlier lifespan in this process stopped it
+    setup_logging()
+    # Shared connection pools for Nominatim, Overpass and HuggingFace
+    app.state.upstream_clients = UpstreamClients()
+    try:
+        await asyncio.to_thread(geocode_cache.purge_expired)
+    except Exception as e:
+        logger.warning("Could not purge geocode cache", extra={"error": str(e)})
+    if POI_BACKEND == "local":
+        # Memory-map the offline POI index up front instead of on the first search
+        get_local_poi_index()
+    # Build the place name trie before the first geocode
+    get_gazetteer()
+    # Load the Gliner model once, before the first chat message
+    await asyncio.to_thread(entity_extractor.load)
+    warmer_task = None
+    if hot_area_warmer.enabled and POI_TILE_CACHE_ENABLED:
+        # Keeps the tiles of hot areas cached, starting right away
+        warmer_task = asyncio.create_task(hot_area_warmer.run_forever(lambda: warm_hot_areas(app.state.upstream_clients)))
+    try:
+        yield
+    finally:
+        if warmer_task is not None:
+            warmer_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await warmer_task
+        await entity_extractor.aclose()
+        await app.state.upstream_clients.aclose()
+        geocode_cache.close()
+        conversation_store.close()
+        shutdown_logging()
+
+
+app = FastAPI(lifespan=lifespan)
 
-app = FastAPI()
+# Repeated POI and geocode requests are answered before reaching the router;
+# added first so CORS headers are still applied to cached responses
+app.add_middleware(ResponseCacheMiddleware, cache=response_cache, routes=CACHED_ROUTES)
 
 # Configure CORS to allow frontend to call backend
 app.add_middleware(
@@ -11,7 +72,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Search-Radius", "ETag"],  # lets the browser read the POI pagination headers and validator
 )
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(api_router)
 
@@ -1,2 +1,2 @@
-from .place_schema import Location, PointOfInterest, GeocodeRequest, POIRequest
-from .ai_schema import ChatMessage, ChatRequest, ExtractedEntities, ChatResponse
\ No newline at end of file
+from .place_schema import Location, PointOfInterest, GeocodeRequest, GeocodeBatchRequest, GeocodeBatchItem, POIRequest, POIBatchRequest, POIBatchResult
+from .ai_schema import ChatMessage, ChatRequest, ExtractedEntities, ChatResponse, ConversationState
\ No newline at end of file
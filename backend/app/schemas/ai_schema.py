@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from app.schemas.place_schema import PointOfInterest
+from pydantic import BaseModel, Field
+from typing import Dict, Optional, List
 
 
 class ChatMessage(BaseModel):
@@ -11,9 +12,14 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     """Request schema for chatbot"""
     message: str
+    # Server-side conversation to continue; the history is the fallback when the
+    # server no longer has it (restart, expiry, another worker)
+    conversation_id: Optional[str] = None
     conversation_history: Optional[List[ChatMessage]] = []
-    current_lat: Optional[float] = None
-    current_lng: Optional[float] = None
+    current_lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    current_lng: Optional[float] = Field(default=None, ge=-180, le=180)
+    # Return per-stage timings with the response
+    debug: bool = False
 
 
 class ExtractedEntities(BaseModel):
@@ -31,4 +37,16 @@ class ChatResponse(BaseModel):
     message: str
     extracted_entities: Optional[ExtractedEntities] = None
     needs_clarification: bool = False
-    search_results: Optional[List[dict]] = None
+    search_results: Optional[List[PointOfInterest]] = None
+    conversation_id: Optional[str] = None
+    # Milliseconds per pipeline stage, only in debug mode
+    timings: Optional[Dict[str, float]] = None
+
+
+class ConversationState(BaseModel):
+    """Slots resolved so far in a conversation, carried over to the next turn"""
+    location_name: Optional[str] = None
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    radius_km: Optional[float] = None
+    query: Optional[str] = None
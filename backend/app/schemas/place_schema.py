@@ -1,5 +1,8 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional
+
+# Largest POI search radius, in metres
+POI_MAX_RADIUS_M = 50_000
 
 
 class Location(BaseModel):
@@ -11,8 +14,12 @@ class Location(BaseModel):
 
 class PointOfInterest(Location):
     """Schema for Point of Interest extending Location"""
+    # Also validated from the POIRecord objects the services pass around
+    model_config = ConfigDict(from_attributes=True)
+
     description: str
     type: str
+    distance_m: Optional[float] = None  # distance from the search center, in metres
 
 
 class GeocodeRequest(BaseModel):
@@ -20,9 +27,41 @@ class GeocodeRequest(BaseModel):
     place_name: str
 
 
+class GeocodeBatchRequest(BaseModel):
+    """Request schema for geocoding many place names at once"""
+    place_names: List[str] = Field(min_length=1, max_length=1000)
+
+
+class GeocodeBatchItem(BaseModel):
+    """One streamed result of a batch geocoding request"""
+    index: int  # position of the name in the request
+    place_name: str
+    status: int  # HTTP status the single-name endpoint would have returned
+    location: Optional[Location] = None
+    detail: Optional[str] = None
+
+
 class POIRequest(BaseModel):
     """Request schema for finding POIs"""
-    lat: float
-    lng: float
-    radius_m: Optional[int] = 10000
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
+    radius_m: int = Field(default=10000, gt=0, le=POI_MAX_RADIUS_M)
     query: Optional[str] = None
+    limit: Optional[int] = Field(default=None, ge=1, le=200)  # page size, 5 if not set
+    cursor: Optional[str] = None  # X-Next-Cursor header of the previous page
+    adaptive: bool = False  # grow the radius in rings up to radius_m until the page is filled
+
+
+class POIBatchRequest(BaseModel):
+    """Request schema for POI searches around many centers at once"""
+    requests: List[POIRequest] = Field(min_length=1, max_length=100)
+
+
+class POIBatchResult(BaseModel):
+    """Result of one search of a batch POI request"""
+    index: int  # position of the search in the request
+    status: int  # HTTP status /place/poi would have returned
+    pois: List[PointOfInterest] = []
+    next_cursor: Optional[str] = None  # cursor for the next page on /place/poi
+    radius_m: Optional[int] = None  # radius actually searched, smaller than requested if adaptive
+    detail: Optional[str] = None
@@ -0,0 +1,212 @@
+from app.schemas.ai_schema import ConversationState
+from app.util.load_env import load_env_setting
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+
+DEFAULT_STORE_PATH = Path(__file__).resolve().parents[2] / "cache" / "conversations.sqlite3"
+
+# The SQLite store trims expired and least recently used rows every this many writes
+TRIM_EVERY_WRITES = 100
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryConversationStore:
+    """
+    In-process conversation store with LRU eviction and a sliding TTL.
+
+    Every access renews a conversation's expiry, so only idle conversations
+    expire. Conversations are lost on restart and not shared between workers.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # conversation id -> (expires_at, state)
+        self._entries: "OrderedDict[str, Tuple[float, ConversationState]]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, conversation_id: str) -> Optional[ConversationState]:
+        entry = self._entries.get(conversation_id)
+        if entry is None or entry[0] <= time.time():
+            self._entries.pop(conversation_id, None)
+            self.misses += 1
+            return None
+        self.hits += 1
+        await self.set(conversation_id, entry[1])
+        return entry[1].model_copy()
+
+    async def set(self, conversation_id: str, state: ConversationState):
+        self._entries[conversation_id] = (time.time() + self.ttl_seconds, state.model_copy())
+        self._entries.move_to_end(conversation_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, conversation_id: str):
+        self._entries.pop(conversation_id, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "memory",
+            "conversations": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        self._entries.clear()
+
+
+class SQLiteConversationStore:
+    """
+    Conversation store in a local SQLite database, with LRU eviction and a sliding TTL.
+
+    Conversations survive restarts and are shared by every uvicorn worker on the
+    machine. Expired and least recently used rows are trimmed in batches.
+    """
+
+    def __init__(self, path: Path, max_entries: int = 100_000, ttl_seconds: float = 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._writes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            # The expiry is renewed on every access, so it also orders rows by last use
+            db.execute("CREATE INDEX IF NOT EXISTS conversations_expires_at ON conversations (expires_at)")
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _get(self, conversation_id: str) -> Optional[str]:
+        now = time.time()
+        with self._db_lock:
+            db = self._connect()
+            row = db.execute(
+                "SELECT state FROM conversations WHERE id = ? AND expires_at > ?", (conversation_id, now)
+            ).fetchone()
+            if row is not None:
+                db.execute(
+                    "UPDATE conversations SET expires_at = ? WHERE id = ?", (now + self.ttl_seconds, conversation_id)
+                )
+                db.commit()
+        return row[0] if row else None
+
+    def _set(self, conversation_id: str, state: str):
+        now = time.time()
+        with self._db_lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO conversations (id, state, expires_at) VALUES (?, ?, ?)",
+                (conversation_id, state, now + self.ttl_seconds),
+            )
+            self._writes += 1
+            if self._writes % TRIM_EVERY_WRITES == 0:
+                db.execute("DELETE FROM conversations WHERE expires_at <= ?", (now,))
+                db.execute(
+                    "DELETE FROM conversations WHERE id IN "
+                    "(SELECT id FROM conversations ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            db.commit()
+
+    def _delete(self, conversation_id: str):
+        with self._db_lock:
+            db = self._connect()
+            db.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+            db.commit()
+
+    async def get(self, conversation_id: str) -> Optional[ConversationState]:
+        try:
+            state = await asyncio.to_thread(self._get, conversation_id)
+        except sqlite3.Error as e:
+            logger.error("Conversation store read error", extra={"error": str(e)})
+            state = None
+        if state is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return ConversationState.model_validate_json(state)
+
+    async def set(self, conversation_id: str, state: ConversationState):
+        try:
+            await asyncio.to_thread(self._set, conversation_id, state.model_dump_json())
+        except sqlite3.Error as e:
+            logger.error("Conversation store write error", extra={"error": str(e)})
+
+    async def delete(self, conversation_id: str):
+        try:
+            await asyncio.to_thread(self._delete, conversation_id)
+        except sqlite3.Error as e:
+            logger.error("Conversation store write error", extra={"error": str(e)})
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": "sqlite",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def conversation_store_from_env():
+    """
+    Build the store selected by CONVERSATION_STORE ("memory" or "sqlite")
+    """
+    backend = load_env_setting("CONVERSATION_STORE", "memory").lower()
+    ttl_seconds = load_env_setting("CONVERSATION_TTL", 3600.0, float)
+    if backend == "sqlite":
+        return SQLiteConversationStore(
+            path=Path(load_env_setting("CONVERSATION_STORE_PATH", str(DEFAULT_STORE_PATH))),
+            max_entries=load_env_setting("CONVERSATION_MAX_ENTRIES", 100_000, int),
+            ttl_seconds=ttl_seconds,
+        )
+    if backend != "memory":
+        logger.warning("Unknown conversation store, using memory", extra={"backend": backend})
+    return MemoryConversationStore(
+        max_entries=load_env_setting("CONVERSATION_MAX_ENTRIES", 10_000, int),
+        ttl_seconds=ttl_seconds,
+    )
+
+
+# Process-wide store used by chat_with_bot
+conversation_store = conversation_store_from_env()
@@ -0,0 +1,107 @@
+from app.services.rate_limiter import SingleFlight
+from app.util.load_env import load_env_setting
+from app.util.text import normalize_message
+from collections import OrderedDict
+from typing import Awaitable, Callable, Iterable, Optional, Tuple
+import time
+
+# Gliner spans and the slots parsed from them
+Extraction = Tuple[list, dict]
+
+EntityKey = Tuple[str, Tuple[str, ...]]
+
+
+class EntityCache:
+    """
+    LRU cache of entity extractions keyed by normalized message and label set.
+
+    Chat users send the same phrasings over and over, so a hit skips the Gliner
+    round trip and the parse with its entities. Concurrent misses for the same
+    message share one extraction. Failed extractions are not cached.
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: float = 6 * 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (expires_at, (spans, parsed slots))
+        self._entries: "OrderedDict[EntityKey, Tuple[float, Extraction]]" = OrderedDict()
+        self._flight = SingleFlight()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "EntityCache":
+        return cls(
+            max_entries=load_env_setting("ENTITY_CACHE_ENTRIES", 2048, int),
+            ttl_seconds=load_env_setting("ENTITY_CACHE_TTL", 6 * 3600.0, float),
+        )
+
+    @staticmethod
+    def key(message: str, labels: Iterable[str]) -> EntityKey:
+        return normalize_message(message), tuple(sorted(labels))
+
+    def get(self, message: str, labels: Iterable[str]) -> Optional[Extraction]:
+        """
+        Cached (spans, parsed slots) of a message, or None
+        """
+        key = self.key(message, labels)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.time():
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        spans, parsed = entry[1]
+        # Callers fill in the slots of their copy from the conversation
+        return spans, dict(parsed)
+
+    def set(self, message: str, labels: Iterable[str], spans: list, parsed: dict):
+        if self.max_entries <= 0:
+            return
+        key = self.key(message, labels)
+        self._entries[key] = (time.time() + self.ttl_seconds, (spans, dict(parsed)))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def load(
+        self,
+        message: str,
+        labels: Iterable[str],
+        extract: Callable[[], Awaitable[Optional[Extraction]]],
+    ) -> Optional[Extraction]:
+        """
+        Run the extraction of a message that missed the cache, unless the same
+        message is already being extracted, and cache the result.
+        extract returns None if it failed.
+        """
+        labels = tuple(labels)
+
+        async def extract_and_store() -> Optional[Extraction]:
+            result = await extract()
+            if result is not None:
+                self.set(message, labels, *result)
+            return result
+
+        result = await self._flight.do(self.key(message, labels), extract_and_store)
+        return (result[0], dict(result[1])) if result is not None else None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        flight = self._flight.stats()
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "coalesced": flight["coalesced"],
+            "evictions": self.evictions,
+        }
+
+
+# Process-wide entity cache used by chat_with_bot
+entity_cache = EntityCache.from_env()
@@ -0,0 +1,285 @@
+from app.util.load_env import load_env_setting, load_env_variable
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+import argparse
+import asyncio
+import httpx
+import logging
+import os
+
+GLINER_MODEL = "urchade/gliner_small-v2.1"
+HF_API_URL = load_env_setting("HF_API_URL", f"https://router.huggingface.co/models/{GLINER_MODEL}")
+
+# Default location of the model downloaded by `python -m app.services.entity_extractor download`
+DEFAULT_MODEL_DIR = Path(__file__).resolve().parents[2] / "models" / "gliner_small-v2.1"
+
+# Entity labels we want to extract
+ENTITY_LABELS = ["location", "place", "distance", "radius", "food", "service", "amenity"]
+
+logger = logging.getLogger(__name__)
+
+# Load HuggingFace token
+try:
+    HF_TOKEN = load_env_variable("HF_TOKEN")
+except:
+    HF_TOKEN = os.getenv("HF_TOKEN", "")
+
+
+class MicroBatcher:
+    """
+    Collect concurrent calls into batches for a function that processes a list at once.
+
+    The first queued item waits at most `max_wait` seconds for others to join its
+    batch. Batches run one at a time in a worker thread, so a CPU bound model is
+    never run concurrently with itself and the event loop stays free.
+    """
+
+    def __init__(self, fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 16, max_wait: float = 0.01):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+
+    def _ensure_worker(self):
+        # The queue and worker belong to the loop they were created on
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        self._ensure_worker()
+        future = self._loop.create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Skip callers that gave up while waiting
+        return [(item, future) for item, future in batch if not future.done()]
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            self.max_batch_seen = max(self.max_batch_seen, len(batch))
+            try:
+                results = await asyncio.to_thread(self.fn, [item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "average_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_seen,
+        }
+
+    async def aclose(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+
+class LocalGliner:
+    """
+    GLiNER model loaded from a local directory and run on the CPU
+    """
+
+    def __init__(self, path: Path, onnx: bool = False, threshold: float = 0.5):
+        # Optional dependency: pip install "backend[gliner]"
+        from gliner import GLiNER
+
+        kwargs = {"load_onnx_model": True, "load_tokenizer": True} if onnx else {}
+        self.model = GLiNER.from_pretrained(str(path), local_files_only=True, map_location="cpu", **kwargs)
+        self.threshold = threshold
+
+    def predict(self, texts: List[str]) -> List[List[dict]]:
+        # `run` replaced `batch_predict_entities` in newer gliner releases
+        predict = getattr(self.model, "run", None) or self.model.batch_predict_entities
+        batches = predict(texts, ENTITY_LABELS, threshold=self.threshold)
+        # Same shape as the HuggingFace inference API
+        return [
+            [
+                {
+                    "entity_group": entity["label"],
+                    "word": entity["text"],
+                    "score": entity["score"],
+                    "start": entity["start"],
+                    "end": entity["end"],
+                }
+                for entity in entities
+            ]
+            for entities in batches
+        ]
+
+
+async def extract_entities_remote(text: str, client: httpx.AsyncClient) -> Optional[list]:
+    """
+    Extract entities from text using Gliner model from HuggingFace, None if the call failed
+    """
+    headers = {"Authorization": f"Bearer {HF_TOKEN}"}
+    payload = {
+        "inputs": text,
+        "parameters": {
+            "labels": ENTITY_LABELS
+        }
+    }
+
+    try:
+        response = await client.post(HF_API_URL, headers=headers, json=payload)
+
+        if response.status_code == 503:
+            # Model is loading, wait and retry
+            await asyncio.sleep(2)
+            response = await client.post(HF_API_URL, headers=headers, json=payload)
+
+        if response.status_code == 200:
+            return response.json()
+        else:
+            logger.warning("Gliner API error", extra={"status": response.status_code, "body": response.text[:200]})
+            return None
+    except Exception as e:
+        logger.warning("Error calling Gliner API", extra={"error": repr(e)})
+        return None
+
+
+class EntityExtractor:
+    """
+    GLiNER entity extraction, in-process when a local model is available.
+
+    GLINER_BACKEND selects "local", "remote" (HuggingFace inference API) or "auto"
+    (local if the model loads, remote otherwise). Local inference batches
+    concurrent chat requests into one forward pass. If it fails, the remote API is
+    used unless GLINER_REMOTE_FALLBACK is disabled.
+    """
+
+    def __init__(
+        self,
+        backend: str = "auto",
+        model_path: Path = DEFAULT_MODEL_DIR,
+        onnx: bool = False,
+        threshold: float = 0.5,
+        max_batch_size: int = 16,
+        max_wait: float = 0.01,
+        remote_fallback: bool = True,
+    ):
+        self.backend = backend
+        self.model_path = model_path
+        self.onnx = onnx
+        self.threshold = threshold
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.remote_fallback = remote_fallback
+        self._local: Optional[LocalGliner] = None
+        self._batcher: Optional[MicroBatcher] = None
+
+        self.local_calls = 0
+        self.remote_calls = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_env(cls) -> "EntityExtractor":
+        return cls(
+            backend=load_env_setting("GLINER_BACKEND", "auto").lower(),
+            model_path=Path(load_env_setting("GLINER_MODEL_PATH", str(DEFAULT_MODEL_DIR))),
+            onnx=load_env_setting("GLINER_ONNX", False, bool),
+            threshold=load_env_setting("GLINER_THRESHOLD", 0.5, float),
+            max_batch_size=load_env_setting("GLINER_MAX_BATCH_SIZE", 16, int),
+            max_wait=load_env_setting("GLINER_MAX_WAIT_MS", 10.0, float) / 1000,
+            remote_fallback=load_env_setting("GLINER_REMOTE_FALLBACK", True, bool),
+        )
+
+    def load(self):
+        """
+        Load the local model once; a no-op for the remote backend
+        """
+        if self.backend == "remote" or self._local is not None:
+            return
+        try:
+            self._local = LocalGliner(self.model_path, onnx=self.onnx, threshold=self.threshold)
+        except ImportError:
+            logger.warning("The 'gliner' package is not installed, using the HuggingFace API for entities")
+            return
+        except Exception as e:
+            logger.warning("Could not load the Gliner model", extra={"path": str(self.model_path), "error": str(e)})
+            return
+        self._batcher = MicroBatcher(self._local.predict, self.max_batch_size, self.max_wait)
+        logger.info("Loaded Gliner model", extra={"path": str(self.model_path)})
+
+    async def extract(self, text: str, client: httpx.AsyncClient) -> Optional[list]:
+        """
+        Entities of text, or None if no backend could extract them
+        """
+        if self._batcher is not None:
+            try:
+                entities = await self._batcher.submit(text)
+                self.local_calls += 1
+                return entities
+            except Exception as e:
+                logger.error("Local Gliner error", extra={"error": repr(e)})
+                if not self.remote_fallback:
+                    return None
+                self.fallbacks += 1
+        elif self.backend == "local" and not self.remote_fallback:
+            return None
+
+        self.remote_calls += 1
+        return await extract_entities_remote(text, client)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "local" if self._batcher is not None else "remote",
+            "local_calls": self.local_calls,
+            "remote_calls": self.remote_calls,
+            "fallbacks": self.fallbacks,
+            "batching": self._batcher.stats() if self._batcher is not None else None,
+        }
+
+    async def aclose(self):
+        if self._batcher is not None:
+            await self._batcher.aclose()
+
+
+# Process-wide extractor used by chat_with_bot
+entity_extractor = EntityExtractor.from_env()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gliner model tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    download = subparsers.add_parser("download", help="Download the model for local inference")
+    download.add_argument("--output", type=Path, default=DEFAULT_MODEL_DIR, help="Model directory")
+    args = parser.parse_args()
+
+    if args.command == "download":
+        from huggingface_hub import snapshot_download
+
+        snapshot_download(GLINER_MODEL, local_dir=str(args.output), token=HF_TOKEN or None)
+        print(f"Downloaded {GLINER_MODEL} into {args.output}")
@@ -0,0 +1,295 @@
+from app.services.poi_index import _iter_overpass_json, _iter_pbf
+from app.util.geo import haversine_m
+from app.util.load_env import load_env_setting
+from app.util.text import normalize_place_name
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import json
+import logging
+import re
+
+# Bundled gazetteer, regenerated by `python -m app.services.gazetteer build`
+DEFAULT_GAZETTEER_PATH = Path(__file__).resolve().parents[2] / "data" / "gazetteer.json"
+
+GAZETTEER_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+# Preferred place when a fuzzy match is a tie, higher first
+KIND_RANK = {"city": 5, "province": 5, "district": 4, "town": 4, "university": 3, "landmark": 3, "suburb": 2, "village": 1}
+
+# OSM tags a place is read from when building the gazetteer: tag -> {value: kind}
+OSM_PLACE_KINDS = {
+    "place": {"city": "city", "province": "province", "state": "province", "town": "town",
+              "district": "district", "borough": "district", "suburb": "suburb", "quarter": "suburb"},
+    "amenity": {"university": "university", "college": "university"},
+    "tourism": {"attraction": "landmark", "museum": "landmark", "zoo": "landmark", "theme_park": "landmark"},
+    "historic": {"monument": "landmark", "memorial": "landmark", "castle": "landmark"},
+    "aeroway": {"aerodrome": "landmark"},
+}
+
+# OSM name tags that become names or aliases of a place
+OSM_NAME_TAGS = ["name", "name:vi", "name:en", "official_name", "short_name", "alt_name", "old_name"]
+
+# Names shared by places further apart than this are ambiguous and left to Nominatim
+AMBIGUOUS_DISTANCE_M = 5000
+
+_NON_WORD = re.compile(r"[^\w]+")
+_DIGITS = re.compile(r"\d+")
+
+
+def gazetteer_key(name: str) -> str:
+    """
+    Lookup key of a name: normalized like the geocode cache, punctuation as spaces,
+    so "Q.5", "Quận 5" and "quan  5, Vietnam" all become "q 5" or "quan 5"
+    """
+    return _NON_WORD.sub(" ", normalize_place_name(name)).strip()
+
+
+class _Node:
+    __slots__ = ("children", "place")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        # Index of the place this key names, or None inside a longer key
+        self.place: Optional[int] = None
+
+
+class Gazetteer:
+    """
+    In-process place name lookup backed by a prefix trie over folded names and aliases.
+
+    Exact keys resolve with a dict lookup. Fuzzy lookups match keys of 5+ characters
+    against the trie with a bounded edit distance (1, or 2 from 11 characters), so
+    typos like "ben thnah" still resolve; numbers have to match exactly so "Quận 5"
+    never becomes "Quận 6". A near spelling is often another real place ("Hải An"
+    is not "Hội An"), so fuzzy lookups are meant for names Nominatim does not know.
+    """
+
+    def __init__(self, places: List[dict]):
+        self.places = places
+        self._exact: Dict[str, int] = {}
+        self._root = _Node()
+        for i, place in enumerate(places):
+            for name in [place["name"], *place.get("aliases", [])]:
+                key = gazetteer_key(name)
+                if key and key not in self._exact:
+                    self._exact[key] = i
+                    self._insert(key, i)
+
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.fuzzy_misses = 0
+
+    @classmethod
+    def load(cls, path: Path) -> "Gazetteer":
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("version") != GAZETTEER_VERSION:
+            raise ValueError(f"Unsupported gazetteer version: {data.get('version')}")
+        return cls(data["places"])
+
+    def _insert(self, key: str, place: int):
+        node = self._root
+        for ch in key:
+            node = node.children.setdefault(ch, _Node())
+        node.place = place
+
+    def _fuzzy(self, key: str, max_distance: int) -> List[Tuple[int, int]]:
+        """
+        (distance, place) of every key within max_distance edits (a swap of two
+        neighbouring letters counts as one), by an edit distance walk over the trie
+        that prunes branches which can no longer match. Typos are rare in the first
+        letter, so only keys starting with the same letter are walked.
+        """
+        start = self._root.children.get(key[0])
+        if start is None:
+            return []
+        found: List[Tuple[int, int]] = []
+        first_row = list(range(len(key) + 1))
+        # (node, its letter, the previous letter, the rows of the two levels above)
+        stack = [(start, key[0], "", first_row, None)]
+        while stack:
+            node, ch, prev_ch, previous, before = stack.pop()
+            row = [previous[0] + 1]
+            for i in range(1, len(key) + 1):
+                cost = min(row[i - 1] + 1, previous[i] + 1, previous[i - 1] + (key[i - 1] != ch))
+                if before is not None and i > 1 and key[i - 1] == prev_ch and key[i - 2] == ch:
+                    cost = min(cost, before[i - 2] + 1)
+                row.append(cost)
+            if node.place is not None and row[-1] <= max_distance:
+                found.append((row[-1], node.place))
+            if min(row) <= max_distance:
+                stack.extend((child, next_ch, ch, row, previous) for next_ch, child in node.children.items())
+        return found
+
+    def lookup(self, name: str, fuzzy: bool = False) -> Optional[dict]:
+        """
+        The place a name refers to, or None if it is unknown or ambiguous.
+        With `fuzzy`, the closest spelling of a known name within the edit distance.
+        """
+        key = gazetteer_key(name)
+        if not fuzzy:
+            place = self._exact.get(key)
+            if place is None:
+                self.misses += 1
+                return None
+            self.exact_hits += 1
+            return self.places[place]
+
+        if len(key) >= 5:
+            digits = _DIGITS.findall(key)
+            candidates = sorted(
+                (distance, -KIND_RANK.get(self.places[i].get("kind"), 0), i)
+                for distance, i in self._fuzzy(key, 1 if len(key) <= 10 else 2)
+                if _DIGITS.findall(gazetteer_key(self.places[i]["name"])) == digits
+            )
+            # A tie between two different places means we can't tell which one was meant
+            if candidates and (len(candidates) == 1 or candidates[0][:2] != candidates[1][:2]
+                               or candidates[0][2] == candidates[1][2]):
+                self.fuzzy_hits += 1
+                return self.places[candidates[0][2]]
+
+        self.fuzzy_misses += 1
+        return None
+
+    def stats(self) -> dict:
+        # Fuzzy lookups follow exact misses, so they are not counted as lookups again
+        lookups = self.exact_hits + self.misses
+        return {
+            "places": len(self.places),
+            "names": len(self._exact),
+            "exact_hits": self.exact_hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+            "fuzzy_misses": self.fuzzy_misses,
+            "hit_rate": (self.exact_hits + self.fuzzy_hits) / lookups if lookups else 0.0,
+        }
+
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_loaded = False
+
+
+def get_gazetteer() -> Optional[Gazetteer]:
+    """
+    Load the gazetteer once per process; None if it is disabled or missing
+    """
+    global _gazetteer, _gazetteer_loaded
+    if not _gazetteer_loaded:
+        _gazetteer_loaded = True
+        if not load_env_setting("GAZETTEER", True, bool):
+            return None
+        path = Path(load_env_setting("GAZETTEER_PATH", str(DEFAULT_GAZETTEER_PATH)))
+        try:
+            _gazetteer = Gazetteer.load(path)
+            logger.info("Loaded gazetteer", extra={"places": len(_gazetteer.places), "path": str(path)})
+        except FileNotFoundError:
+            logger.warning("Gazetteer not found, geocoding every place with Nominatim", extra={"path": str(path)})
+        except (ValueError, KeyError) as e:
+            logger.warning("Could not load gazetteer", extra={"path": str(path), "error": str(e)})
+    return _gazetteer
+
+
+def lookup_place(name: str, fuzzy: bool = False) -> Optional[Tuple[float, float]]:
+    """
+    Coordinates of a well-known place name, without any network request.
+    `fuzzy` also accepts near spellings, for names Nominatim could not find.
+    """
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        return None
+    place = gazetteer.lookup(name, fuzzy)
+    return (place["lat"], place["lng"]) if place is not None else None
+
+
+def _place_kind(tags: dict) -> Optional[str]:
+    if not tags.get("name"):
+        return None
+    for key, kinds in OSM_PLACE_KINDS.items():
+        kind = kinds.get(tags.get(key))
+        if kind is not None:
+            return kind
+    # Provinces and districts are often only mapped as boundaries
+    if tags.get("boundary") == "administrative":
+        return {"4": "province", "6": "district"}.get(tags.get("admin_level"))
+    return None
+
+
+def _element_places(elements: Iterator[dict]) -> Iterator[dict]:
+    for element in elements:
+        tags = element.get("tags", {})
+        kind = _place_kind(tags)
+        center = element if "lat" in element else element.get("center")
+        if kind is None or center is None:
+            continue
+        names = []
+        for tag in OSM_NAME_TAGS:
+            # alt_name and old_name may hold several names separated by ";"
+            names.extend(name.strip() for name in tags.get(tag, "").split(";") if name.strip())
+        yield {
+            "name": names[0],
+            "aliases": list(dict.fromkeys(names[1:])),
+            "lat": round(float(center["lat"]), 6),
+            "lng": round(float(center["lon"]), 6),
+            "kind": kind,
+        }
+
+
+def build_gazetteer(input_path: Path, output_path: Path) -> int:
+    """
+    Build the gazetteer from a .pbf extract or an Overpass JSON dump (`out center`).
+    Hand-written entries of the existing file ("manual": true) are kept.
+    """
+    elements = (
+        _iter_pbf(input_path, keep=_place_kind) if input_path.suffix == ".pbf"
+        else _iter_overpass_json(input_path)
+    )
+
+    manual: List[dict] = []
+    if output_path.exists():
+        manual = [place for place in json.loads(output_path.read_text(encoding="utf-8"))["places"] if place.get("manual")]
+
+    # Hand-written entries win, then the most important place with a name
+    places = manual + sorted(_element_places(elements), key=lambda place: -KIND_RANK[place["kind"]])
+    owners: Dict[str, int] = {}
+    ambiguous = set()
+    for i, place in enumerate(places):
+        for name in [place["name"], *place["aliases"]]:
+            key = gazetteer_key(name)
+            owner = owners.setdefault(key, i)
+            other = places[owner]
+            if (owner != i and not other.get("manual") and KIND_RANK[other["kind"]] == KIND_RANK[place["kind"]]
+                    and haversine_m(other["lat"], other["lng"], place["lat"], place["lng"]) > AMBIGUOUS_DISTANCE_M):
+                ambiguous.add(key)
+
+    kept = []
+    for i, place in enumerate(places):
+        names = [
+            name for name in [place["name"], *place["aliases"]]
+            if owners[gazetteer_key(name)] == i and gazetteer_key(name) not in ambiguous
+        ]
+        if names:
+            kept.append({**place, "name": names[0], "aliases": names[1:]})
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(json.dumps({
+        "version": GAZETTEER_VERSION,
+        "source": input_path.name,
+        "places": kept,
+    }, ensure_ascii=False, indent=1), encoding="utf-8")
+    return len(kept)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gazetteer tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Build the gazetteer from an OSM extract")
+    build.add_argument("input", type=Path, help="Vietnam .osm.pbf extract or Overpass JSON dump")
+    build.add_argument("--output", type=Path, default=DEFAULT_GAZETTEER_PATH, help="Gazetteer file")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_gazetteer(args.input, args.output)
+        print(f"Wrote {count} places into {args.output}")
@@ -0,0 +1,202 @@
+from app.util.load_env import load_env_setting
+from app.util.text import normalize_place_name
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+
+# Default location of the on-disk cache, shared by every worker process
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parents[2] / "cache"
+
+# Marker stored for place names Nominatim could not find
+NOT_FOUND = "not_found"
+
+logger = logging.getLogger(__name__)
+
+
+class GeocodeCache:
+    """
+    Two-tier geocoding cache keyed by normalized place name.
+
+    A small in-memory LRU answers hot names without any I/O. Misses fall through to
+    a SQLite database that survives restarts and is shared by all uvicorn workers.
+    Names Nominatim could not find are cached too, with a shorter TTL.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_memory_entries: int = 1024,
+        ttl_seconds: float = 30 * 24 * 3600,
+        negative_ttl_seconds: float = 24 * 3600,
+    ):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+
+        # key -> (expires_at, (lat, lng) or NOT_FOUND)
+        self._memory: "OrderedDict[str, Tuple[float, object]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "GeocodeCache":
+        return cls(
+            path=Path(load_env_setting("GEOCODE_CACHE_PATH", str(DEFAULT_CACHE_DIR / "geocode.sqlite3"))),
+            max_memory_entries=load_env_setting("GEOCODE_CACHE_MEMORY_ENTRIES", 1024, int),
+            ttl_seconds=load_env_setting("GEOCODE_CACHE_TTL", 30 * 24 * 3600.0, float),
+            negative_ttl_seconds=load_env_setting("GEOCODE_CACHE_NEGATIVE_TTL", 24 * 3600.0, float),
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened lazily so importing the module has no side effects
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+            # WAL lets several workers read while one writes
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS geocode (
+                    key TEXT PRIMARY KEY,
+                    lat REAL,
+                    lng REAL,
+                    found INTEGER NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _remember(self, key: str, expires_at: float, value: object):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, object]]:
+        with self._db_lock:
+            row = self._connect().execute(
+                "SELECT lat, lng, found, expires_at FROM geocode WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        lat, lng, found, expires_at = row
+        return expires_at, ((lat, lng) if found else NOT_FOUND)
+
+    def _disk_set(self, key: str, expires_at: float, value: object):
+        found = value != NOT_FOUND
+        lat, lng = value if found else (None, None)
+        with self._db_lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO geocode (key, lat, lng, found, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, lat, lng, int(found), expires_at),
+            )
+            db.commit()
+
+    async def get(self, place_name: str) -> Optional[object]:
+        """
+        Return (lat, lng), NOT_FOUND for a cached miss, or None if the name is not cached
+        """
+        key = normalize_place_name(place_name)
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None and entry[0] > now:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            if entry[1] == NOT_FOUND:
+                self.negative_hits += 1
+            return entry[1]
+
+        try:
+            entry = await asyncio.to_thread(self._disk_get, key)
+        except sqlite3.Error as e:
+            logger.error("Geocode cache read error", extra={"error": str(e)})
+            entry = None
+
+        if entry is None or entry[0] <= now:
+            self._memory.pop(key, None)
+            self.misses += 1
+            return None
+
+        self._remember(key, *entry)
+        self.disk_hits += 1
+        if entry[1] == NOT_FOUND:
+            self.negative_hits += 1
+        return entry[1]
+
+    async def expires_at(self, place_name: str) -> Optional[float]:
+        """
+        When the cached entry of a name expires, or None if the name is not cached
+        """
+        key = normalize_place_name(place_name)
+        entry = self._memory.get(key)
+        if entry is None:
+            try:
+                entry = await asyncio.to_thread(self._disk_get, key)
+            except sqlite3.Error as e:
+                logger.error("Geocode cache read error", extra={"error": str(e)})
+                return None
+        if entry is None or entry[0] <= time.time():
+            return None
+        return entry[0]
+
+    async def set(self, place_name: str, lat: float, lng: float):
+        await self._store(normalize_place_name(place_name), (lat, lng), self.ttl_seconds)
+
+    async def set_not_found(self, place_name: str):
+        await self._store(normalize_place_name(place_name), NOT_FOUND, self.negative_ttl_seconds)
+
+    async def _store(self, key: str, value: object, ttl: float):
+        expires_at = time.time() + ttl
+        self._remember(key, expires_at, value)
+        try:
+            await asyncio.to_thread(self._disk_set, key, expires_at, value)
+        except sqlite3.Error as e:
+            logger.error("Geocode cache write error", extra={"error": str(e)})
+
+    def purge_expired(self):
+        """
+        Delete expired rows from the database
+        """
+        with self._db_lock:
+            db = self._connect()
+            db.execute("DELETE FROM geocode WHERE expires_at <= ?", (time.time(),))
+            db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# Process-wide cache used by geocode_place
+geocode_cache = GeocodeCache.from_env()
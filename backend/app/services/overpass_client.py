@@ -0,0 +1,497 @@
+from app.util.load_env import load_env_setting
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Protocol
+import asyncio
+import codecs
+import httpx
+import json
+import logging
+import re
+import time
+
+# Public Overpass instances, tried in this order until latency data says otherwise
+DEFAULT_OVERPASS_ENDPOINTS = [
+    "https://overpass.kumi.systems/api/interpreter",
+    "https://overpass-api.de/api/interpreter",
+    "https://overpass.private.coffee/api/interpreter",
+]
+
+# Assumed latency of an endpoint we have no samples for yet, in seconds
+PRIOR_LATENCY = 1.0
+
+# Outcomes older than this no longer count towards an endpoint's error rate, so a
+# mirror that failed a while ago is tried again
+ERROR_WINDOW_SECONDS = 300.0
+
+# Returned by an attempt when Overpass rejected the query itself, so other mirrors would too
+_BAD_QUERY = object()
+
+_ELEMENTS_KEY = re.compile(r'"elements"\s*:\s*\[')
+
+logger = logging.getLogger(__name__)
+
+
+class EndpointHealth:
+    """
+    Latency and error statistics of one Overpass endpoint, with a circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and the
+    endpoint gets no traffic for `cooldown` seconds. Then a single probe request
+    is let through, claimed with `claim` before it is sent so concurrent queries
+    cannot probe together: a success closes the circuit, a failure opens it again
+    with twice the cooldown.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        window: int = 50,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        max_cooldown: float = 600.0,
+    ):
+        self.url = url
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        # Latencies of successful requests, and (time, 1 if failed) of recent requests
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.ewma: Optional[float] = None
+        self.consecutive_failures = 0
+        self.cooldown = cooldown
+        self.open_until = 0.0
+        self.in_flight = 0
+        # A half-open probe has been claimed and has not finished yet
+        self.probing = False
+
+        self.requests = 0
+        self.failures = 0
+
+    def state(self, now: float) -> str:
+        if now < self.open_until:
+            return "open"
+        if self.consecutive_failures >= self.failure_threshold:
+            return "half_open"
+        return "closed"
+
+    def available(self, now: float) -> bool:
+        state = self.state(now)
+        # A half-open circuit lets one probe through at a time
+        return state == "closed" or (state == "half_open" and not self.probing)
+
+    def claim(self, now: float) -> bool:
+        """
+        Take the endpoint for a request about to be sent; a half-open one only if
+        no probe is out, and the request becomes the probe until `release`
+        """
+        state = self.state(now)
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return state == "closed"
+
+    def release(self, probe: bool):
+        if probe:
+            self.probing = False
+
+    def record_success(self, latency: float):
+        self.requests += 1
+        self.latencies.append(latency)
+        self.outcomes.append((time.monotonic(), 0))
+        self._update_ewma(latency)
+        self.consecutive_failures = 0
+        self.cooldown = self.base_cooldown
+
+    def record_failure(self):
+        self.requests += 1
+        self.failures += 1
+        self.outcomes.append((time.monotonic(), 1))
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= self.failure_threshold:
+            self.open_until = time.monotonic() + self.cooldown
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+
+    def record_abandoned(self, elapsed: float):
+        """
+        A request cancelled because a hedge answered first took at least `elapsed`
+        """
+        self._update_ewma(elapsed)
+
+    def _update_ewma(self, latency: float):
+        self.ewma = latency if self.ewma is None else 0.8 * self.ewma + 0.2 * latency
+
+    def error_rate(self) -> float:
+        since = time.monotonic() - ERROR_WINDOW_SECONDS
+        recent = [failed for at, failed in self.outcomes if at >= since]
+        return sum(recent) / len(recent) if recent else 0.0
+
+    def p95(self) -> Optional[float]:
+        # Too few samples make a meaningless percentile
+        if len(self.latencies) < 5:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def score(self) -> float:
+        """
+        Expected cost of sending a query here; lower is better
+        """
+        latency = self.ewma if self.ewma is not None else PRIOR_LATENCY
+        return latency * (1 + 4 * self.error_rate()) * (1 + 0.5 * self.in_flight)
+
+    def stats(self, now: float) -> dict:
+        p95 = self.p95()
+        return {
+            "url": self.url,
+            "state": self.state(now),
+            "requests": self.requests,
+            "failures": self.failures,
+            "error_rate": self.error_rate(),
+            "ewma_ms": round(self.ewma * 1000, 1) if self.ewma is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "in_flight": self.in_flight,
+        }
+
+
+class OverpassJSONParser:
+    """
+    Incremental parser of an Overpass JSON response.
+
+    Bytes are fed as they arrive and every complete element of the "elements"
+    array comes out right away, so the body is never held in memory as a whole.
+    The small members around the array ("version", "remark", ...) are kept.
+    """
+
+    def __init__(self):
+        self._decode = codecs.getincrementaldecoder("utf-8")().decode
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._in_elements = False
+        # Text before and after the elements array; the tail is None until the array ends
+        self._head = ""
+        self._tail: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> List[dict]:
+        """
+        The elements completed by this chunk
+        """
+        self._buffer += self._decode(chunk)
+        if self._tail is not None:
+            self._tail += self._buffer
+            self._buffer = ""
+            return []
+        if not self._in_elements:
+            match = _ELEMENTS_KEY.search(self._buffer)
+            if match is None:
+                return []
+            self._head = self._buffer[:match.start()]
+            self._buffer = self._buffer[match.end():]
+            self._in_elements = True
+
+        elements = []
+        buffer = self._buffer
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                break
+            if buffer[pos] == "]":
+                self._tail = buffer[pos + 1:]
+                pos = len(buffer)
+                break
+            try:
+                element, pos = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The element continues in the next chunk
+                break
+            elements.append(element)
+        self._buffer = buffer[pos:]
+        return elements
+
+    def close(self) -> dict:
+        """
+        The members outside the elements array, once the whole body was fed.
+        Raises ValueError if the body was cut off or is not Overpass JSON.
+        """
+        self._buffer += self._decode(b"", final=True)
+        if not self._in_elements:
+            # No elements array at all, e.g. an error object
+            members = json.loads(self._buffer)
+        elif self._tail is None:
+            raise ValueError("Overpass response ended inside the elements array")
+        else:
+            head = self._head.rstrip().removesuffix(",")
+            tail = (self._tail + self._buffer).lstrip()
+            if head.endswith("{"):
+                tail = tail.removeprefix(",")
+            members = json.loads(head + tail)
+        if not isinstance(members, dict):
+            raise ValueError("Not an Overpass JSON response")
+        return members
+
+
+class ElementSink(Protocol):
+    """
+    Receives the elements of one Overpass response while it is parsed
+    """
+
+    def add(self, element: dict) -> bool:
+        """
+        Take one element; False once no more are needed, which stops the download
+        """
+
+    def result(self) -> Any:
+        ...
+
+
+class ElementList:
+    """
+    Sink keeping the elements themselves, at most `max_elements` of them
+    """
+
+    def __init__(self, max_elements: int):
+        self.max_elements = max_elements
+        self.elements: List[dict] = []
+
+    def add(self, element: dict) -> bool:
+        self.elements.append(element)
+        return len(self.elements) < self.max_elements
+
+    def result(self) -> List[dict]:
+        return self.elements
+
+
+class OverpassClient:
+    """
+    Overpass queries spread over several mirrors.
+
+    Each query goes to the endpoint with the best latency and error record. If it
+    has not answered after that endpoint's p95 latency, a hedged duplicate is sent
+    to the next best endpoint and the first good answer wins. Errors fail over to
+    the next endpoint at once, and endpoints that keep failing are skipped by
+    their circuit breaker until they recover.
+    """
+
+    def __init__(
+        self,
+        endpoints: List[str],
+        hedge: bool = True,
+        hedge_delay: float = 3.0,
+        hedge_min_delay: float = 0.5,
+        hedge_max_delay: float = 10.0,
+        max_attempts: int = 3,
+        failure_threshold: int = 3,
+        cooldown: float = 30.0,
+        max_elements: int = 50_000,
+    ):
+        self.endpoints = endpoints
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.max_attempts = max_attempts
+        # Elements read from one response at most, which bounds the memory a query can take
+        self.max_elements = max_elements
+        self._health: Dict[str, EndpointHealth] = {
+            url: EndpointHealth(url, failure_threshold=failure_threshold, cooldown=cooldown)
+            for url in endpoints
+        }
+
+        self.queries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self.exhausted = 0
+        self.stopped_early = 0
+
+    @classmethod
+    def from_env(cls) -> "OverpassClient":
+        configured = load_env_setting("OVERPASS_ENDPOINTS", "")
+        endpoints = [url.strip() for url in configured.split(",") if url.strip()] or DEFAULT_OVERPASS_ENDPOINTS
+        return cls(
+            endpoints=endpoints,
+            hedge=load_env_setting("OVERPASS_HEDGE", True, bool),
+            hedge_delay=load_env_setting("OVERPASS_HEDGE_DELAY", 3.0, float),
+            hedge_min_delay=load_env_setting("OVERPASS_HEDGE_MIN_DELAY", 0.5, float),
+            hedge_max_delay=load_env_setting("OVERPASS_HEDGE_MAX_DELAY", 10.0, float),
+            max_attempts=load_env_setting("OVERPASS_MAX_ATTEMPTS", 3, int),
+            failure_threshold=load_env_setting("OVERPASS_FAILURE_THRESHOLD", 3, int),
+            cooldown=load_env_setting("OVERPASS_COOLDOWN", 30.0, float),
+            max_elements=load_env_setting("OVERPASS_ELEMENT_BUDGET", 50_000, int),
+        )
+
+    def ranked_endpoints(self) -> List[EndpointHealth]:
+        """
+        Endpoints that may take traffic, best first; ties keep the configured order
+        """
+        now = time.monotonic()
+        available = [
+            (health.score(), i, health)
+            for i, health in enumerate(self._health.values())
+            if health.available(now)
+        ]
+        return [health for _, _, health in sorted(available, key=lambda item: item[:2])]
+
+    def _hedge_after(self, health: EndpointHealth) -> float:
+        p95 = health.p95()
+        delay = p95 if p95 is not None else self.hedge_delay
+        return min(max(delay, self.hedge_min_delay), self.hedge_max_delay)
+
+    async def _read_elements(self, response: httpx.Response, sink: ElementSink) -> Optional[dict]:
+        """
+        Parse the body into the sink as it downloads. Returns the members around
+        the elements, or None if the sink stopped the download early.
+        """
+        parser = OverpassJSONParser()
+        async for chunk in response.aiter_bytes():
+            for element in parser.feed(chunk):
+                if not sink.add(element):
+                    self.stopped_early += 1
+                    return None
+        return parser.close()
+
+    async def _attempt(
+        self,
+        client: httpx.AsyncClient,
+        health: EndpointHealth,
+        overpass_query: str,
+        headers: Optional[dict],
+        new_sink: Callable[[], ElementSink],
+        probe: bool = False,
+    ):
+        health.in_flight += 1
+        start = time.monotonic()
+        try:
+            # Leaving the block early closes the connection, so the rest is never downloaded
+            async with client.stream("POST", health.url, data={"data": overpass_query}, headers=headers) as response:
+                if response.status_code == 200:
+                    sink = new_sink()
+                    members = await self._read_elements(response, sink)
+                    # Overpass answers 200 with partial data when the query hit its own timeout
+                    remark = members.get("remark", "") if members is not None else ""
+                    if "runtime error" in remark:
+                        logger.warning("Overpass runtime error", extra={"endpoint": health.url, "remark": remark})
+                        health.record_failure()
+                        return None
+                    health.record_success(time.monotonic() - start)
+                    return sink.result()
+                if response.status_code == 400:
+                    health.record_success(time.monotonic() - start)
+                    body = (await response.aread())[:200].decode("utf-8", "replace")
+                    logger.warning("Overpass rejected the query", extra={"endpoint": health.url, "body": body})
+                    return _BAD_QUERY
+            logger.warning("Overpass error", extra={"endpoint": health.url, "status": response.status_code})
+        except asyncio.CancelledError:
+            # Lost a hedged race: it was slow, not broken
+            health.record_abandoned(time.monotonic() - start)
+            raise
+        except (httpx.HTTPError, ValueError) as e:
+            # Network errors, but also bodies that fail to decompress or parse
+            logger.warning("Overpass request failed", extra={"endpoint": health.url, "error": repr(e)})
+        finally:
+            health.in_flight -= 1
+            health.release(probe)
+        # Reached only when the request failed
+        health.record_failure()
+        return None
+
+    async def query(
+        self,
+        client: httpx.AsyncClient,
+        overpass_query: str,
+        headers: Optional[dict] = None,
+        sink: Optional[Callable[[], ElementSink]] = None,
+    ) -> Optional[Any]:
+        """
+        Run an Overpass query, returning its elements or None if every attempt failed.
+
+        The response is parsed while it downloads. `sink` makes the sink that
+        receives the elements of an attempt, and whose result is returned; by
+        default the elements themselves, at most `max_elements` of them.
+        """
+        new_sink = sink or (lambda: ElementList(self.max_elements))
+        self.queries += 1
+        candidates = self.ranked_endpoints()[:self.max_attempts]
+
+        pending = set()
+        hedged = set()
+        # Candidates tried so far, and the endpoint of the latest attempt
+        launched = 0
+        latest: Optional[EndpointHealth] = None
+
+        def launch() -> Optional[asyncio.Task]:
+            """
+            Send the query to the next candidate that can still be claimed, since a
+            half-open one may have been taken by another query's probe meanwhile
+            """
+            nonlocal launched, latest
+            now = time.monotonic()
+            while launched < len(candidates):
+                health = candidates[launched]
+                launched += 1
+                probe = health.state(now) == "half_open"
+                if health.claim(now):
+                    task = asyncio.create_task(
+                        self._attempt(client, health, overpass_query, headers, new_sink, probe)
+                    )
+                    pending.add(task)
+                    latest = health
+                    return task
+            return None
+
+        if launch() is None:
+            self.exhausted += 1
+            logger.error("Every Overpass endpoint is failing, skipping the query")
+            return None
+
+        try:
+            while pending:
+                can_hedge = self.hedge and launched < len(candidates)
+                timeout = self._hedge_after(latest) if can_hedge else None
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Still waiting after the p95 latency: send a hedged duplicate
+                    task = launch()
+                    if task is not None:
+                        self.hedges += 1
+                        hedged.add(task)
+                    continue
+
+                for task in done:
+                    result = task.result()
+                    if result is _BAD_QUERY:
+                        return None
+                    if result is not None:
+                        if task in hedged:
+                            self.hedge_wins += 1
+                        return result
+
+                # Every finished attempt failed; fail over right away if nothing else is running
+                if not pending and launch() is not None:
+                    self.failovers += 1
+            self.exhausted += 1
+            return None
+        finally:
+            # The losers of a hedged race are not needed any more
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "queries": self.queries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers,
+            "exhausted": self.exhausted,
+            "stopped_early": self.stopped_early,
+            "endpoints": [health.stats(now) for health in self._health.values()],
+        }
+
+
+# Process-wide client used for every Overpass query
+overpass_client = OverpassClient.from_env()
@@ -0,0 +1,43 @@
+from app.services.poi_service import POIDeduper, POIRecord, element_to_poi
+from dataclasses import dataclass
+from typing import List
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CollectedPOIs:
+    pois: List[POIRecord]
+    truncated: bool = False  # the element budget cut the response short
+
+
+class POICollector:
+    """
+    Overpass element sink turning elements into deduplicated POIs while the
+    response downloads, so the elements are never kept in memory.
+
+    Stops the download once the response goes past `max_elements` elements;
+    the POIs so far are the result, marked as truncated.
+    """
+
+    def __init__(self, max_elements: int):
+        self.max_elements = max_elements
+        self.pois: List[POIRecord] = []
+        self.elements = 0
+        self.truncated = False
+        self._deduper = POIDeduper()
+
+    def add(self, element: dict) -> bool:
+        self.elements += 1
+        if self.elements > self.max_elements:
+            logger.warning("Overpass response truncated", extra={"elements": self.max_elements, "pois": len(self.pois)})
+            self.truncated = True
+            return False
+        poi = element_to_poi(element)
+        if poi is not None and self._deduper.add(poi):
+            self.pois.append(poi)
+        return True
+
+    def result(self) -> CollectedPOIs:
+        return CollectedPOIs(self.pois, self.truncated)
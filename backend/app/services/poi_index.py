@@ -0,0 +1,244 @@
+from app.services.poi_service import AMENITY_TYPES, POIRecord, classify_element, element_to_poi
+from app.util.geo import EARTH_RADIUS_M, circle_bbox
+from app.util.load_env import load_env_setting
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+import argparse
+import json
+import logging
+import math
+import numpy as np
+
+# Default location of the index built by `python -m app.services.poi_index build`
+DEFAULT_INDEX_DIR = Path(__file__).resolve().parents[2] / "data" / "poi_index"
+
+INDEX_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+# Grid cell size of the index in degrees, and the stride between grid rows in cell ids
+CELL_SIZE_DEG = 0.01
+ROW_STRIDE = 1 << 20
+
+
+def _cell_ids(lat: np.ndarray, lng: np.ndarray, cell_size: float) -> np.ndarray:
+    rows = np.floor((lat + 90.0) / cell_size).astype(np.int64)
+    cols = np.floor((lng + 180.0) / cell_size).astype(np.int64)
+    return rows * ROW_STRIDE + cols
+
+
+class LocalPOIIndex:
+    """
+    Read-only POI index built from an OSM extract.
+
+    POIs are stored as column arrays sorted by grid cell, so a radius query is one
+    binary search per grid row followed by a vectorized distance check. Every array
+    is memory-mapped: opening the index is instant and the pages are shared by all
+    worker processes through the OS page cache.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported POI index version: {meta.get('version')}")
+
+        self.cell_size = meta["cell_size_deg"]
+        self.categories: List[str] = meta["categories"]
+        # (south, west, north, east) covered by the extract
+        self.coverage = tuple(meta["coverage"])
+        self.count = meta["count"]
+
+        self.cells = np.load(path / "cells.npy", mmap_mode="r")
+        self.lat = np.load(path / "lat.npy", mmap_mode="r")
+        self.lng = np.load(path / "lng.npy", mmap_mode="r")
+        self.category = np.load(path / "category.npy", mmap_mode="r")
+        self.name_offsets = np.load(path / "name_offsets.npy", mmap_mode="r")
+        self.description_offsets = np.load(path / "description_offsets.npy", mmap_mode="r")
+        self.strings = np.memmap(path / "strings.bin", dtype=np.uint8, mode="r")
+
+    def covers(self, lat: float, lng: float) -> bool:
+        south, west, north, east = self.coverage
+        return south <= lat <= north and west <= lng <= east
+
+    def _string(self, offsets: np.ndarray, i: int) -> str:
+        return self.strings[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+    def _candidates(self, lat: float, lng: float, radius_m: float) -> np.ndarray:
+        south, west, north, east = circle_bbox(lat, lng, radius_m)
+        first_row = math.floor((south + 90.0) / self.cell_size)
+        last_row = math.floor((north + 90.0) / self.cell_size)
+        first_col = math.floor((west + 180.0) / self.cell_size)
+        last_col = math.floor((east + 180.0) / self.cell_size)
+
+        # Cells of one grid row are contiguous in the sorted cell array
+        row_starts = np.arange(first_row, last_row + 1, dtype=np.int64) * ROW_STRIDE
+        starts = np.searchsorted(self.cells, row_starts + first_col, side="left")
+        ends = np.searchsorted(self.cells, row_starts + last_col, side="right")
+        ranges = [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        if not ranges:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(ranges)
+
+    def search(
+        self,
+        lat: float,
+        lng: float,
+        radius_m: float,
+        category: Optional[str] = None,
+    ) -> List[POIRecord]:
+        """
+        POIs within radius_m of (lat, lng), optionally restricted to one category
+        """
+        idx = self._candidates(lat, lng, radius_m)
+        if category is not None:
+            if category not in self.categories:
+                return []
+            idx = idx[self.category[idx] == self.categories.index(category)]
+        if idx.size == 0:
+            return []
+
+        # Vectorized haversine over the candidates
+        phi1 = math.radians(lat)
+        phi2 = np.radians(self.lat[idx])
+        dphi = phi2 - phi1
+        dlmb = np.radians(self.lng[idx] - lng)
+        a = np.sin(dphi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+        distance = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+        idx = idx[distance <= radius_m]
+
+        return [
+            POIRecord(
+                self._string(self.name_offsets, i),
+                float(self.lat[i]),
+                float(self.lng[i]),
+                self._string(self.description_offsets, i),
+                self.categories[self.category[i]].capitalize()
+            )
+            for i in idx.tolist()
+        ]
+
+
+_local_index: Optional[LocalPOIIndex] = None
+_local_index_loaded = False
+
+
+def get_local_poi_index() -> Optional[LocalPOIIndex]:
+    """
+    Open the local index once per process; None if it has not been built
+    """
+    global _local_index, _local_index_loaded
+    if not _local_index_loaded:
+        _local_index_loaded = True
+        path = Path(load_env_setting("POI_INDEX_PATH", str(DEFAULT_INDEX_DIR)))
+        try:
+            _local_index = LocalPOIIndex(path)
+            logger.info("Loaded local POI index", extra={"pois": _local_index.count, "path": str(path)})
+        except FileNotFoundError:
+            logger.warning("Local POI index not found, using Overpass", extra={"path": str(path)})
+        except (ValueError, KeyError) as e:
+            logger.warning("Could not load local POI index", extra={"path": str(path), "error": str(e)})
+    return _local_index
+
+
+def _iter_overpass_json(path: Path) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    yield from data.get("elements", [])
+
+
+def _iter_pbf(path: Path, keep: Callable[[dict], object] = classify_element) -> Iterator[dict]:
+    try:
+        import osmium
+    except ImportError:
+        raise SystemExit("Reading .pbf extracts needs the optional 'osmium' package (pip install osmium).")
+
+    elements: List[dict] = []
+
+    class Handler(osmium.SimpleHandler):
+        # Only keep elements we can use, extracts hold millions of other tagged objects
+        def node(self, n):
+            if keep(n.tags) and n.location.valid():
+                elements.append({"lat": n.location.lat, "lon": n.location.lon, "tags": dict(n.tags)})
+
+        def way(self, w):
+            if not keep(w.tags):
+                return
+            # Use the average of the way's nodes as its center, like Overpass `out center`
+            points = [(node.lat, node.lon) for node in w.nodes if node.location.valid()]
+            if points:
+                elements.append({
+                    "center": {
+                        "lat": sum(p[0] for p in points) / len(points),
+                        "lon": sum(p[1] for p in points) / len(points),
+                    },
+                    "tags": dict(w.tags),
+                })
+
+    Handler().apply_file(str(path), locations=True)
+    yield from elements
+
+
+def build_index(input_path: Path, output_dir: Path, cell_size: float = CELL_SIZE_DEG) -> int:
+    """
+    Build a local POI index from a .pbf extract or an Overpass JSON dump
+    """
+    elements = _iter_pbf(input_path) if input_path.suffix == ".pbf" else _iter_overpass_json(input_path)
+
+    categories = sorted(set(AMENITY_TYPES))
+    lats, lngs, codes, names, descriptions = [], [], [], [], []
+    for element in elements:
+        poi = element_to_poi(element)
+        if poi is None:
+            continue
+        lats.append(poi.lat)
+        lngs.append(poi.lng)
+        codes.append(categories.index(poi.type.lower()))
+        names.append(poi.name.encode("utf-8"))
+        descriptions.append(poi.description.encode("utf-8"))
+
+    if not lats:
+        raise SystemExit(f"No POIs found in {input_path}")
+
+    lat = np.asarray(lats, dtype=np.float64)
+    lng = np.asarray(lngs, dtype=np.float64)
+    cells = _cell_ids(lat, lng, cell_size)
+    order = np.argsort(cells, kind="stable")
+
+    # Strings are stored back to back, with offsets[i]:offsets[i + 1] giving POI i
+    blobs = [names[i] for i in order] + [descriptions[i] for i in order]
+    lengths = np.fromiter((len(b) for b in blobs), dtype=np.int64, count=len(blobs))
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    count = len(order)
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    np.save(output_dir / "cells.npy", cells[order])
+    np.save(output_dir / "lat.npy", lat[order])
+    np.save(output_dir / "lng.npy", lng[order])
+    np.save(output_dir / "category.npy", np.asarray(codes, dtype=np.uint8)[order])
+    np.save(output_dir / "name_offsets.npy", offsets[:count + 1])
+    np.save(output_dir / "description_offsets.npy", offsets[count:])
+    (output_dir / "strings.bin").write_bytes(b"".join(blobs))
+    (output_dir / "meta.json").write_text(json.dumps({
+        "version": INDEX_VERSION,
+        "cell_size_deg": cell_size,
+        "categories": categories,
+        "coverage": [float(lat.min()), float(lng.min()), float(lat.max()), float(lng.max())],
+        "count": count,
+        "source": input_path.name,
+    }, indent=2), encoding="utf-8")
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local POI index tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Build the index from an OSM extract")
+    build.add_argument("input", type=Path, help="Vietnam .osm.pbf extract or Overpass JSON dump")
+    build.add_argument("--output", type=Path, default=DEFAULT_INDEX_DIR, help="Index directory")
+    build.add_argument("--cell-size", type=float, default=CELL_SIZE_DEG, help="Grid cell size in degrees")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_index(args.input, args.output, args.cell_size)
+        print(f"Indexed {count} POIs into {args.output}")
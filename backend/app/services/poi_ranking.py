@@ -0,0 +1,83 @@
+from app.services.poi_service import POIRecord
+from app.util.geo import EARTH_RADIUS_M
+from dataclasses import replace
+from typing import List, Optional, Sequence, Tuple
+import math
+import numpy as np
+
+# Match scores are compared in steps of this size, so near-equal fuzzy scores
+# count as a tie and the nearer POI wins
+SCORE_LEVEL_STEP = 0.05
+
+
+def distances_m(pois: Sequence[POIRecord], lat: float, lng: float) -> np.ndarray:
+    """
+    Haversine distance in metres from (lat, lng) to every POI, in one vectorized pass
+    """
+    lats = np.fromiter((poi.lat for poi in pois), dtype=np.float64, count=len(pois))
+    lngs = np.fromiter((poi.lng for poi in pois), dtype=np.float64, count=len(pois))
+    phi1 = math.radians(lat)
+    phi2 = np.radians(lats)
+    dlmb = np.radians(lngs - lng)
+    a = np.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def top_k_order(keys: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k smallest keys in ascending order, using a partial sort
+    """
+    if k <= 0 or keys.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < keys.size:
+        candidates = np.argpartition(keys, k - 1)[:k]
+    else:
+        candidates = np.arange(keys.size)
+    return candidates[np.argsort(keys[candidates], kind="stable")]
+
+
+def rank_pois(
+    pois: List[POIRecord],
+    lat: float,
+    lng: float,
+    k: int,
+    scores: Optional[np.ndarray] = None,
+) -> List[POIRecord]:
+    """
+    Return the k best POIs with their distance filled in.
+
+    Without scores the nearest POIs come first; with scores (higher is better) the
+    POIs are ordered by score level (steps of SCORE_LEVEL_STEP), ties broken by distance.
+    """
+    if not pois:
+        return []
+
+    distance = distances_m(pois, lat, lng)
+    if scores is None:
+        order = top_k_order(distance, k)
+    else:
+        levels = np.rint(np.asarray(scores, dtype=np.float64) / SCORE_LEVEL_STEP)
+        # Last key first: best score level, then nearest
+        order = np.lexsort((distance, -levels))[:max(k, 0)]
+
+    # Copy, since the POIs may be shared with the tile cache or other requests
+    return [
+        replace(pois[i], distance_m=round(float(distance[i]), 1))
+        for i in order.tolist()
+    ]
+
+
+def rank_matches(
+    matches: List[Tuple[POIRecord, float]],
+    lat: float,
+    lng: float,
+    k: int,
+) -> List[POIRecord]:
+    """
+    Rank (POI, match score) pairs: best matches first, nearest first among equal scores
+    """
+    if not matches:
+        return []
+    pois = [poi for poi, _ in matches]
+    scores = np.fromiter((score for _, score in matches), dtype=np.float64, count=len(matches))
+    return rank_pois(pois, lat, lng, k, scores=scores)
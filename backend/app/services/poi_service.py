@@ -0,0 +1,305 @@
+from app.util.text import diacritic_variants, normalize_place_name
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+import math
+import re
+
+# POI categories we support, in the order they are matched against an element's tags.
+# Each entry is (category, OSM key, OSM values). Most categories are amenities, but
+# hotels/museums live under tourism, parks under leisure and shops under shop.
+POI_CATEGORY_TAGS: List[Tuple[str, str, List[str]]] = [
+    ("bank", "amenity", ["bank"]),
+    ("restaurant", "amenity", ["restaurant", "fast_food", "food_court"]),
+    ("cafe", "amenity", ["cafe"]),
+    ("library", "amenity", ["library"]),
+    ("hospital", "amenity", ["hospital", "clinic"]),
+    ("pharmacy", "amenity", ["pharmacy"]),
+    ("cinema", "amenity", ["cinema"]),
+    ("school", "amenity", ["school", "university", "college"]),
+    ("hotel", "tourism", ["hotel", "hostel", "guest_house"]),
+    ("museum", "tourism", ["museum"]),
+    ("park", "leisure", ["park", "garden"]),
+    ("supermarket", "shop", ["supermarket"]),
+    ("shop", "shop", ["convenience", "mall", "department_store"]),
+    ("shop", "amenity", ["marketplace"]),
+]
+
+# Temples and churches are both amenity=place_of_worship, told apart by religion
+WORSHIP_RELIGIONS: Dict[str, List[str]] = {
+    "temple": ["buddhist", "hindu", "taoist", "confucian"],
+    "church": ["christian"],
+}
+
+# Category names we can search for
+AMENITY_TYPES = [
+    "bank", "restaurant", "cafe", "hotel", "museum", "park",
+    "library", "hospital", "pharmacy", "supermarket", "shop",
+    "cinema", "temple", "church", "school"
+]
+
+# Search terms (English and Vietnamese) that mean a whole category rather than a name
+CATEGORY_ALIASES: Dict[str, str] = {
+    "bank": "bank", "ngân hàng": "bank", "atm": "bank",
+    "restaurant": "restaurant", "nhà hàng": "restaurant", "quán ăn": "restaurant",
+    "cafe": "cafe", "coffee": "cafe", "cà phê": "cafe", "cafe shop": "cafe",
+    "hotel": "hotel", "khách sạn": "hotel", "nhà nghỉ": "hotel",
+    "museum": "museum", "bảo tàng": "museum",
+    "park": "park", "công viên": "park",
+    "library": "library", "thư viện": "library",
+    "hospital": "hospital", "bệnh viện": "hospital", "phòng khám": "hospital",
+    "pharmacy": "pharmacy", "nhà thuốc": "pharmacy", "hiệu thuốc": "pharmacy",
+    "supermarket": "supermarket", "siêu thị": "supermarket",
+    "shop": "shop", "cửa hàng": "shop", "chợ": "shop",
+    "cinema": "cinema", "rạp phim": "cinema", "rạp chiếu phim": "cinema",
+    "temple": "temple", "chùa": "temple", "đền": "temple",
+    "church": "church", "nhà thờ": "church",
+    "school": "school", "trường học": "school", "trường": "school",
+}
+
+# Aliases without diacritics, so "ca phe" finds cafes as well as "cà phê"
+_FOLDED_CATEGORY_ALIASES: Dict[str, str] = {
+    normalize_place_name(alias): category for alias, category in CATEGORY_ALIASES.items()
+}
+
+# POIs closer than this in both latitude and longitude are treated as duplicates
+DUPLICATE_DISTANCE_DEG = 0.001
+
+# Characters with a special meaning in Overpass (POSIX extended) regular expressions
+_OVERPASS_REGEX_SPECIAL = re.compile(r'([\\.^$|?*+()\[\]{}])')
+
+
+def _escape_overpass_string(text: str) -> str:
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _overpass_name_pattern(query: str) -> str:
+    """
+    Overpass regex matching the search term with or without Vietnamese diacritics,
+    so "pho" also finds "Phở"
+    """
+    parts = []
+    for ch in query:
+        variants = diacritic_variants(ch)
+        if len(variants) > 1:
+            parts.append(f"[{variants}]")
+        else:
+            parts.append(_OVERPASS_REGEX_SPECIAL.sub(r"\\\1", ch))
+    return _escape_overpass_string("".join(parts))
+
+
+def resolve_category(query: Optional[str]) -> Optional[str]:
+    """
+    Map a search term to one of AMENITY_TYPES if it names a whole category
+    """
+    if not query:
+        return None
+    return _FOLDED_CATEGORY_ALIASES.get(normalize_place_name(query))
+
+
+def _union_statements(spatial_filter: str, category: Optional[str], name_filter: str) -> List[str]:
+    # Group values by OSM key so each key costs one statement in the union
+    values_by_key: Dict[str, List[str]] = {}
+    for cat, key, values in POI_CATEGORY_TAGS:
+        if category is None or cat == category:
+            values_by_key.setdefault(key, []).extend(values)
+
+    statements = []
+    for key, values in values_by_key.items():
+        pattern = "|".join(values)
+        statements.append(f'nwr{spatial_filter}["{key}"~"^({pattern})$"]{name_filter};')
+
+    religions = [
+        religion
+        for cat, cat_religions in WORSHIP_RELIGIONS.items()
+        if category is None or cat == category
+        for religion in cat_religions
+    ]
+    if religions:
+        pattern = "|".join(religions)
+        statements.append(
+            f'nwr{spatial_filter}["amenity"="place_of_worship"]["religion"~"^({pattern})$"]{name_filter};'
+        )
+
+    return statements
+
+
+def _build_union_query(spatial_filter: str, category: Optional[str], name_filter: str, timeout: int) -> str:
+    body = "\n    ".join(_union_statements(spatial_filter, category, name_filter))
+    return f"[out:json][timeout:{timeout}];\n(\n    {body}\n);\nout center;"
+
+
+def _name_filter(query: Optional[str], category: Optional[str]) -> str:
+    if query and category is None:
+        return f'["name"~"{_overpass_name_pattern(query.strip())}",i]'
+    return ""
+
+
+def build_overpass_query(
+    lat: float,
+    lng: float,
+    radius_m: int,
+    query: Optional[str] = None,
+    timeout: int = 30,
+) -> str:
+    """
+    Build a single Overpass union query covering every POI category.
+
+    If the search term names a category, only that category is requested.
+    Otherwise the term is applied as a case-insensitive name filter on the server.
+    """
+    category = resolve_category(query)
+    return _build_union_query(f"(around:{radius_m},{lat},{lng})", category, _name_filter(query, category), timeout)
+
+
+def build_overpass_ring_query(
+    lat: float,
+    lng: float,
+    inner_m: int,
+    outer_m: int,
+    query: Optional[str] = None,
+    timeout: int = 30,
+) -> str:
+    """
+    Same as build_overpass_query for the ring between inner_m and outer_m: the
+    POIs within outer_m minus those within inner_m, so only the ring is sent
+    """
+    if inner_m <= 0:
+        return build_overpass_query(lat, lng, outer_m, query, timeout)
+    category = resolve_category(query)
+    name_filter = _name_filter(query, category)
+    outer = "\n    ".join(_union_statements(f"(around:{outer_m},{lat},{lng})", category, name_filter))
+    inner = "\n    ".join(_union_statements(f"(around:{inner_m},{lat},{lng})", category, name_filter))
+    return (
+        f"[out:json][timeout:{timeout}];\n"
+        f"(\n    {outer}\n)->.outer;\n"
+        f"(\n    {inner}\n)->.inner;\n"
+        "(.outer; - .inner;);\nout center;"
+    )
+
+
+def build_overpass_bbox_query(
+    south: float,
+    west: float,
+    north: float,
+    east: float,
+    timeout: int = 60,
+) -> str:
+    """
+    Build an Overpass union query for every POI category inside a bounding box
+    """
+    return _build_union_query(f"({south},{west},{north},{east})", None, "", timeout)
+
+
+def classify_element(tags: dict) -> Optional[str]:
+    """
+    Return the POI category of an OSM element based on its own tags
+    """
+    for category, key, values in POI_CATEGORY_TAGS:
+        if tags.get(key) in values:
+            return category
+
+    if tags.get("amenity") == "place_of_worship":
+        religion = tags.get("religion")
+        for category, religions in WORSHIP_RELIGIONS.items():
+            if religion in religions:
+                return category
+
+    return None
+
+
+@dataclass(slots=True)
+class POIRecord:
+    """
+    POI as it flows through dedup, matching, ranking and the caches: a slotted
+    record with the fields of the PointOfInterest schema, in the same order.
+    orjson writes it directly, so no Pydantic model is built per POI.
+    """
+    name: str
+    lat: float
+    lng: float
+    description: str
+    type: str
+    distance_m: Optional[float] = None  # distance from the search center, in metres
+
+
+def element_to_poi(element: dict) -> Optional[POIRecord]:
+    """
+    Convert an Overpass element to a POIRecord, or None if it is not usable
+    """
+    tags = element.get("tags", {})
+    category = classify_element(tags)
+    if category is None:
+        return None
+
+    name = tags.get("name") or tags.get("operator") or tags.get("brand")
+    if not name:
+        return None
+
+    # Ways and relations only have a center, nodes have lat/lon directly
+    if "center" in element:
+        lat = element["center"]["lat"]
+        lng = element["center"]["lon"]
+    else:
+        lat = element.get("lat")
+        lng = element.get("lon")
+
+    if lat is None or lng is None:
+        return None
+
+    description = (
+        tags.get("addr:full") or
+        tags.get("addr:street") or
+        tags.get("addr:housename") or
+        tags.get("description") or
+        tags.get("website") or
+        tags.get("phone") or
+        f"A {category} in the area"
+    )
+
+    return POIRecord(name, float(lat), float(lng), description, category.capitalize())
+
+
+class POIDeduper:
+    """
+    Incremental duplicate filter: a POI is a duplicate if it lies within 0.001
+    degrees (~100 m) in both latitude and longitude of a POI already accepted.
+
+    Accepted POIs are bucketed in a grid of the same size, so each POI is only
+    compared with the POIs in its own and the 8 neighbouring cells.
+    """
+
+    def __init__(self):
+        self._grid: Dict[Tuple[int, int], List[POIRecord]] = {}
+
+    def add(self, poi: POIRecord) -> bool:
+        """
+        Accept the POI and return True, or return False if it is a duplicate
+        """
+        row = math.floor(poi.lat / DUPLICATE_DISTANCE_DEG)
+        col = math.floor(poi.lng / DUPLICATE_DISTANCE_DEG)
+        is_duplicate = any(
+            abs(p.lat - poi.lat) < DUPLICATE_DISTANCE_DEG and abs(p.lng - poi.lng) < DUPLICATE_DISTANCE_DEG
+            for d_row in (-1, 0, 1)
+            for d_col in (-1, 0, 1)
+            for p in self._grid.get((row + d_row, col + d_col), ())
+        )
+        if is_duplicate:
+            return False
+        self._grid.setdefault((row, col), []).append(poi)
+        return True
+
+
+def dedupe_pois(pois: List[POIRecord]) -> List[POIRecord]:
+    """
+    Drop POIs lying within ~100 m of a POI already kept
+    """
+    deduper = POIDeduper()
+    return [poi for poi in pois if deduper.add(poi)]
+
+
+def parse_overpass_elements(elements: List[dict]) -> List[POIRecord]:
+    """
+    Convert Overpass elements to POIs, skipping unusable elements and duplicates
+    """
+    pois = [element_to_poi(element) for element in elements]
+    return dedupe_pois([poi for poi in pois if poi is not None])
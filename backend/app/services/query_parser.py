@@ -0,0 +1,146 @@
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+import re
+
+
+def _phrases(phrases: Iterable[str]) -> "re.Pattern":
+    """
+    One case-insensitive alternation matching any of the literal phrases
+    """
+    return re.compile("|".join(re.escape(p) for p in phrases), re.IGNORECASE)
+
+
+# Radius patterns in priority order: a meter value anywhere wins over a km value,
+# which wins over a spelled out "kilomet". The "trong / bán kính / khoảng" prefixed
+# forms always end in one of these, so they never change the result.
+_RADIUS_PATTERNS = (
+    (re.compile(r"(\d+)\s*m(?:et)?(?:er)?(?!\s*k)", re.IGNORECASE), 0.001),  # 500m -> 0.5km
+    (re.compile(r"(\d+)\s*km", re.IGNORECASE), 1),
+    (re.compile(r"(\d+)\s*ki[lô]?[oô]?met", re.IGNORECASE), 1),  # kilomet / kilômet
+)
+_KM_RE = re.compile(r"\d+\s*km", re.IGNORECASE)
+
+# "ở / tại / gần <place>" up to a comma, "tìm" or "có". This also covers
+# "đang ở / hiện ở <place>", which always contains "ở <place>".
+_LOCATION_RE = re.compile(r"(?:ở|tại|gần)\s+([^,]+?)(?:\s*,|\s+tìm|\s+có)", re.IGNORECASE)
+_LOCATION_PREFIX_RE = re.compile(r"^(quanh|gần|xung quanh|ở)\s+", re.IGNORECASE)
+_NOT_LOCATIONS = frozenset([
+    "gần đó", "gần đây", "xung quanh", "quanh đây", "ở gần", "đây", "đó", "quanh", "gần", "ở",
+])
+
+# Search term patterns, tried in order
+_SEARCH_PATTERNS = (
+    re.compile(r"tìm\s+(?:quán|chỗ|nơi|địa điểm|tiệm)?\s*([^,\.\?]+)", re.IGNORECASE),
+    re.compile(r"(?:muốn|cần|có)\s+([^,\.\?]+)", re.IGNORECASE),
+    re.compile(r"([^,\.\?]+?)\s+(?:gần|trong|quanh)", re.IGNORECASE),
+)
+_QUERY_PREFIX_RE = re.compile(r"^(quán|chỗ|nơi|tiệm|địa điểm|ở|tại|gần|ăn|uống|dịch vụ)\s+", re.IGNORECASE)
+_QUERY_PROXIMITY_SUFFIX_RE = re.compile(r"\s*(gần đây|gần đó|ở đây|ở gần|quanh đây|xung quanh)\s*$", re.IGNORECASE)
+_QUERY_WORD_SUFFIX_RE = re.compile(r"\s+(gần|ở|trong|quanh|tại)\s*$", re.IGNORECASE)
+_NOT_QUERIES = frozenset([
+    "gần đây", "gần đó", "gần", "ở đây", "ở gần", "ở", "trong", "quanh", "xung quanh", "tại", "quanh đây",
+])
+# A search term containing one of these refers to the user's own position
+_QUERY_LOCATION_PHRASE_RE = _phrases([
+    "hiện tại", "địa chỉ hiện", "vị trí hiện", "đang ở đây",
+    "chỗ này", "chỗ mình", "của mình", "địa chỉ của mình",
+    "nơi này", "nơi mình", "chỗ tôi", "ở đây",
+])
+
+# Messages asking to search around the user's current position
+CURRENT_LOCATION_RE = _phrases([
+    "hiện tại", "đang ở đây", "vị trí hiện tại", "chỗ này", "chỗ mình", "địa chỉ hiện tại",
+    "của mình", "địa chỉ của mình", "nơi này", "nơi mình đang", "chỗ tôi", "ở đây",
+])
+
+# Messages saying any kind of place is fine
+ACCEPT_ANY_RE = _phrases([
+    "cái nào cũng được", "gì cũng được", "tất cả", "bất kỳ", "không có yêu cầu", "không yêu cầu gì",
+])
+
+LOCATION_LABELS = ("location", "place")
+QUERY_LABELS = ("food", "service", "amenity")
+
+
+def extract_radius_km(text: str) -> Optional[float]:
+    for pattern, multiplier in _RADIUS_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return float(match.group(1)) * multiplier
+    return None
+
+
+def extract_location(text: str) -> Optional[str]:
+    match = _LOCATION_RE.search(text)
+    if not match:
+        return None
+    location = _LOCATION_PREFIX_RE.sub("", match.group(1).strip()).strip()
+    # Proximity phrases are not actual locations
+    if location and location.lower() not in _NOT_LOCATIONS:
+        return location
+    return None
+
+
+def extract_search_term(search_text: str) -> Optional[str]:
+    for pattern in _SEARCH_PATTERNS:
+        match = pattern.search(search_text)
+        if not match:
+            continue
+        # Only the first matching pattern is used, even if its term is rejected
+        query = _QUERY_PREFIX_RE.sub("", match.group(1).strip())
+        query = _QUERY_PROXIMITY_SUFFIX_RE.sub("", query)
+        query = _QUERY_WORD_SUFFIX_RE.sub("", query).strip()
+        lowered = query.lower()
+        if query and lowered not in _NOT_QUERIES and not _QUERY_LOCATION_PHRASE_RE.search(lowered):
+            return query
+        return None
+    return None
+
+
+def _search_text(text: str, location: Optional[str], radius_km: Optional[float]) -> str:
+    # Remove location and radius parts to get the search term
+    if location:
+        text = text.replace(location, "")
+    if radius_km:
+        text = _KM_RE.sub("", text)
+    return text
+
+
+@lru_cache(maxsize=4096)
+def _parse_text(text: str) -> Tuple[Optional[str], Optional[float], Optional[str]]:
+    # Text-only parses are memoized: the chat re-parses the same history messages every turn
+    location = extract_location(text)
+    radius_km = extract_radius_km(text)
+    query = extract_search_term(_search_text(text, location, radius_km))
+    return location, radius_km, query
+
+
+def parse_vietnamese_query(text: str, gliner_entities: list) -> dict:
+    """
+    Parse Vietnamese query to extract location, radius, and search terms
+    """
+    if not gliner_entities:
+        location, radius_km, query = _parse_text(text)
+        return {"location_name": location, "radius_km": radius_km, "query": query}
+
+    radius_km = extract_radius_km(text)
+    location = extract_location(text)
+    query = None
+
+    # Gliner entities fill in whatever the text patterns did not find
+    for entity in gliner_entities:
+        if isinstance(entity, dict):
+            label = entity.get("entity_group") or entity.get("label", "")
+            word = entity.get("word", "")
+
+            if label in LOCATION_LABELS and not location:
+                location = word
+            elif label in QUERY_LABELS and not query:
+                query = word
+
+    if not query:
+        term = extract_search_term(_search_text(text, location, radius_km))
+        if term is not None:
+            query = term
+
+    return {"location_name": location, "radius_km": radius_km, "query": query}
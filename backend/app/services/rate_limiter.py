@@ -0,0 +1,102 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Async token bucket shared by every request in the process.
+
+    Callers only wait when the bucket is empty, so an idle server pays no delay,
+    while bursts are released one by one at `rate` requests per second.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        # asyncio.Lock wakes waiters in FIFO order, so the queue is fair
+        self._lock = asyncio.Lock()
+
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """
+        Wait for a token and return how many seconds the caller waited
+        """
+        start = time.monotonic()
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            async with self._lock:
+                self._refill()
+                if self._tokens < 1:
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+                    self._refill()
+                self._tokens -= 1
+        finally:
+            self.queue_depth -= 1
+
+        waited = time.monotonic() - start
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_second": self.rate,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "acquired": self.acquired,
+            "average_wait_seconds": self.total_wait / self.acquired if self.acquired else 0.0,
+            "max_wait_seconds": self.max_wait,
+        }
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution.
+
+    The first caller runs the coroutine; callers arriving while it is in flight
+    await the same result (or exception) instead of starting their own.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+
+        # Shield so a cancelled caller does not cancel the call other callers share
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
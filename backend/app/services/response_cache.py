@@ -0,0 +1,241 @@
+from app.util.load_env import load_env_setting
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+import gzip
+import hashlib
+import json
+import time
+
+# Bodies smaller than this are not worth compressing
+MIN_GZIP_BYTES = 1024
+
+# Response headers kept with a cached body
+STORED_HEADERS = {b"content-type", b"x-next-cursor", b"x-search-radius"}
+
+
+class CachedResponse:
+    __slots__ = ("body", "gzip_body", "etag", "headers", "expires_at")
+
+    def __init__(self, body: bytes, headers: List[Tuple[bytes, bytes]], expires_at: float):
+        self.body = body
+        self.gzip_body = gzip.compress(body, compresslevel=6) if len(body) >= MIN_GZIP_BYTES else None
+        # Strong validator of the exact bytes; the gzip variant is a different representation
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.headers = headers
+        self.expires_at = expires_at
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + len(self.gzip_body or b"")
+
+    @property
+    def gzip_etag(self) -> str:
+        return self.etag[:-1] + '-gzip"'
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of serialized responses, with their gzip variant and ETag.
+
+    Bounded by both the number of entries and their total size in bytes; every
+    entry expires after the max age of its route.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 64 * 1024 * 1024, grid_deg: float = 0.0005):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        # Search centers are snapped to this grid, about 55 m, so nearby searches share entries
+        self.grid_deg = grid_deg
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        return cls(
+            max_entries=load_env_setting("RESPONSE_CACHE_ENTRIES", 4096, int),
+            max_bytes=load_env_setting("RESPONSE_CACHE_MAX_MB", 64, int) * 1024 * 1024,
+            grid_deg=load_env_setting("RESPONSE_CACHE_GRID_DEG", 0.0005, float),
+        )
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.time():
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: str, body: bytes, headers: List[Tuple[bytes, bytes]], max_age: float) -> CachedResponse:
+        entry = CachedResponse(body, headers, time.time() + max_age)
+        if self.max_entries <= 0 or entry.size > self.max_bytes:
+            return entry
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+        return entry
+
+    def _drop(self, key: str):
+        self._bytes -= self._entries.pop(key).size
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+        }
+
+
+@dataclass
+class CachedRoute:
+    """
+    A cacheable endpoint: `key` maps the request parameters (JSON body or query
+    string) to a cache key, or None when the request should not be cached
+    """
+    path: str
+    key: Callable[[dict], Optional[str]]
+    max_age: int
+
+
+def _etag_matches(if_none_match: str, entry: CachedResponse) -> bool:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or entry.etag in tags or entry.gzip_etag in tags
+
+
+class ResponseCacheMiddleware:
+    """
+    ASGI middleware answering repeated requests to the given routes from a
+    ResponseCache, for GET and POST alike.
+
+    Successful responses are stored serialized and gzipped and sent with a
+    strong ETag and Cache-Control, so browsers and a reverse proxy can keep them
+    too; a matching If-None-Match gets a 304 without a body.
+    """
+
+    def __init__(self, app, cache: ResponseCache, routes: List[CachedRoute]):
+        self.app = app
+        self.cache = cache
+        self.routes: Dict[str, CachedRoute] = {route.path: route for route in routes}
+
+    async def __call__(self, scope, receive, send):
+        route = self.routes.get(scope.get("path", "")) if scope["type"] == "http" else None
+        if route is None or scope["method"] not in ("GET", "POST"):
+            await self.app(scope, receive, send)
+            return
+
+        body = b""
+        if scope["method"] == "POST":
+            more_body = True
+            while more_body:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                body += message.get("body", b"")
+                more_body = message.get("more_body", False)
+
+        replayed = False
+
+        async def replay():
+            # The body was read for the key; hand it on once, then the real stream
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        key = self._key(route, scope, body)
+        if key is None:
+            await self.app(scope, replay, send)
+            return
+
+        request_headers = {name.lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        entry = self.cache.get(key)
+        if entry is not None:
+            # Labels the request in the HTTP metrics like the route that was skipped
+            scope["route"] = route
+            await self._send(entry, request_headers, send)
+            return
+
+        start: Optional[dict] = None
+        chunks: List[bytes] = []
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, replay, capture)
+        if start is None:
+            return
+        if start["status"] != 200:
+            await send(start)
+            await send({"type": "http.response.body", "body": b"".join(chunks)})
+            return
+
+        headers = [(name, value) for name, value in start["headers"] if name.lower() in STORED_HEADERS]
+        entry = self.cache.set(key, b"".join(chunks), headers, route.max_age)
+        await self._send(entry, request_headers, send)
+
+    def _key(self, route: CachedRoute, scope, body: bytes) -> Optional[str]:
+        try:
+            params = json.loads(body) if scope["method"] == "POST" else dict(parse_qsl(scope["query_string"].decode("latin-1")))
+        except ValueError:
+            return None
+        if not isinstance(params, dict):
+            return None
+        key = route.key(params)
+        return f"{route.path}|{key}" if key is not None else None
+
+    async def _send(self, entry: CachedResponse, request_headers: Dict[bytes, str], send):
+        use_gzip = entry.gzip_body is not None and "gzip" in request_headers.get(b"accept-encoding", "")
+        etag = entry.gzip_etag if use_gzip else entry.etag
+        max_age = max(int(entry.expires_at - time.time()), 0)
+        headers = [
+            (b"etag", etag.encode("latin-1")),
+            (b"cache-control", f"public, max-age={max_age}".encode("latin-1")),
+            (b"vary", b"Accept-Encoding"),
+        ]
+
+        if_none_match = request_headers.get(b"if-none-match")
+        if if_none_match is not None and _etag_matches(if_none_match, entry):
+            self.cache.not_modified += 1
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        body = entry.gzip_body if use_gzip else entry.body
+        headers.extend(entry.headers)
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        if use_gzip:
+            headers.append((b"content-encoding", b"gzip"))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+# Process-wide cache of /place/poi and /place/geocode responses
+response_cache = ResponseCache.from_env()
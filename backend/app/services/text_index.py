@@ -0,0 +1,189 @@
+from app.services.poi_service import POIRecord
+from app.util.text import fold_diacritics
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Sequence, Set, Tuple
+import re
+import unicodedata
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+# Match quality per field; higher is better. Fuzzy matches are scaled by similarity.
+SCORE_EXACT_NAME = 1.0
+SCORE_NAME_WORDS = 0.9
+SCORE_NAME_PREFIX = 0.85
+SCORE_NAME_SUBSTRING = 0.8
+SCORE_CATEGORY = 0.75
+SCORE_DESCRIPTION = 0.6
+SCORE_FUZZY = 0.5
+
+# Name or category matches score at least this; description and fuzzy matches less
+SCORE_STRONG_MATCH = SCORE_CATEGORY
+
+# Taken off name matches that only hold without diacritics, when the query has
+# them: "phở" matches "Phở Hòa" better than "Phố Huế"
+SCORE_FOLDED_ONLY_PENALTY = 0.1
+
+# Minimum trigram similarity for a fuzzy (typo tolerant) match
+FUZZY_THRESHOLD = 0.45
+
+
+def fold_text(text: str) -> str:
+    """
+    Lowercase, drop diacritics and reduce punctuation to single spaces
+    """
+    return _NON_WORD.sub(" ", fold_diacritics(text).lower()).strip()
+
+
+def plain_text(text: str) -> str:
+    """
+    Like fold_text, keeping the diacritics
+    """
+    return _NON_WORD.sub(" ", unicodedata.normalize("NFC", text).lower()).strip()
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+@lru_cache(maxsize=100_000)
+def _name_features(name: str) -> Tuple[str, Tuple[str, ...], FrozenSet[str], str, Tuple[str, ...]]:
+    # POI names repeat across searches of the same area, so their folding is memoized
+    folded = fold_text(name)
+    plain = plain_text(name)
+    return folded, tuple(folded.split()), trigrams(folded), plain, tuple(plain.split())
+
+
+def _name_score(query: str, words: Sequence[str], name: str, name_words: Sequence[str]) -> float:
+    """
+    Score of a name match, or 0. Every query word must be a whole word of the
+    name, except the last one, which may also just start a word.
+    """
+    if name == query:
+        return SCORE_EXACT_NAME
+    *head, last = words
+    if all(word in name_words for word in head):
+        if last in name_words:
+            return SCORE_NAME_WORDS
+        if any(word.startswith(last) for word in name_words):
+            return SCORE_NAME_PREFIX
+    if query in name:
+        return SCORE_NAME_SUBSTRING
+    return 0.0
+
+
+@lru_cache(maxsize=1024)
+def _query_features(query: str) -> Tuple[str, Optional[str], FrozenSet[str]]:
+    # A search matches the same query against every tile it covers
+    folded = fold_text(query)
+    plain = plain_text(query)
+    return folded, plain if plain != folded else None, trigrams(folded)
+
+
+@lru_cache(maxsize=100_000)
+def _folded_description(description: str) -> str:
+    return fold_text(description)
+
+
+class POITextIndex:
+    """
+    Diacritic-insensitive text index over one set of POIs.
+
+    Names and descriptions are folded ("Cà Phê" -> "ca phe") and every name gets a
+    trigram signature; both are memoized per distinct string, so indexing a set of
+    cached POIs again is cheap. Name trigrams are indexed in posting lists and
+    descriptions grouped by distinct text, so a search only scores the POIs that
+    share enough trigrams with the query or whose description contains it.
+
+    Exact, word and substring name matches rank above description matches, which
+    rank above fuzzy (typo tolerant) trigram matches. A query typed with
+    diacritics prefers names that match with them.
+    """
+
+    def __init__(self, pois: List[POIRecord]):
+        self.pois = pois
+        self._names = [_name_features(poi.name) for poi in pois]
+        self._descriptions = [_folded_description(poi.description or "") for poi in pois]
+        self._types = [poi.type.lower() for poi in pois]
+
+        # Name trigram -> POIs whose name has it
+        self._postings: Dict[str, List[int]] = {}
+        for i, features in enumerate(self._names):
+            for gram in features[2]:
+                self._postings.setdefault(gram, []).append(i)
+        # Folded description -> POIs with it; many share a street or the generic text
+        self._description_groups: Dict[str, List[int]] = {}
+        for i, description in enumerate(self._descriptions):
+            self._description_groups.setdefault(description, []).append(i)
+
+    def _candidates(self, query: str, query_grams: FrozenSet[str]) -> Set[int]:
+        """
+        POIs sharing a fair share of the query's trigrams, or whose description contains it
+        """
+        shared: Dict[int, int] = {}
+        for gram in query_grams:
+            for i in self._postings.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        min_shared = max(1, int(len(query_grams) * FUZZY_THRESHOLD / 2))
+        candidates = {i for i, count in shared.items() if count >= min_shared}
+        for description, members in self._description_groups.items():
+            if query in description:
+                candidates.update(members)
+        return candidates
+
+    def _score(self, i: int, query: str, plain_query: Optional[str], query_grams: FrozenSet[str]) -> float:
+        """
+        `plain_query` is the query with its diacritics, or None if it has none
+        """
+        name, name_words, name_grams, plain_name, plain_words = self._names[i]
+        if plain_query is not None:
+            score = _name_score(plain_query, plain_query.split(), plain_name, plain_words)
+            if score:
+                return score
+        score = _name_score(query, query.split(), name, name_words)
+        if score:
+            return score - SCORE_FOLDED_ONLY_PENALTY if plain_query is not None else score
+        if query in self._descriptions[i]:
+            return SCORE_DESCRIPTION
+
+        # Dice coefficient between the query and name trigrams
+        similarity = 2 * len(query_grams & name_grams) / (len(query_grams) + len(name_grams))
+        if similarity >= FUZZY_THRESHOLD:
+            return round(SCORE_FUZZY * similarity, 2)
+        return 0.0
+
+    def search(self, query: str, category: Optional[str] = None) -> List[Tuple[int, float]]:
+        """
+        (POI index, score) for every POI matching the query.
+
+        If the query names a category, every POI of that type matches as well.
+        """
+        folded, plain_query, query_grams = _query_features(query)
+        matches: Dict[int, float] = {}
+
+        if category is not None:
+            for i, poi_type in enumerate(self._types):
+                if poi_type == category:
+                    matches[i] = SCORE_CATEGORY
+
+        if folded:
+            for i in self._candidates(folded, query_grams):
+                score = self._score(i, folded, plain_query, query_grams)
+                if score > matches.get(i, 0.0):
+                    matches[i] = score
+
+        return list(matches.items())
+
+
+def match_pois(
+    pois: List[POIRecord],
+    query: Optional[str],
+    category: Optional[str] = None,
+) -> List[Tuple[POIRecord, float]]:
+    """
+    POIs matching the query with their match score; everything scores 1.0 without a query
+    """
+    if not query:
+        return [(poi, 1.0) for poi in pois]
+    index = POITextIndex(pois)
+    return [(pois[i], score) for i, score in index.search(query, category)]
@@ -0,0 +1,500 @@
+from app.services.poi_service import POIRecord
+from app.util.geo import circle_bbox, haversine_m, METERS_PER_DEGREE
+from app.util.load_env import load_env_setting
+from app.services.rate_limiter import SingleFlight
+from app.services.text_index import POITextIndex
+from collections import OrderedDict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+import math
+import time
+
+Tile = Tuple[int, int]
+BBox = Tuple[float, float, float, float]
+
+# Fetches the POIs inside a (south, west, north, east) box, or None if the fetch
+# failed, or TRUNCATED if the response was cut short
+BBoxFetcher = Callable[[BBox], Awaitable[Optional[List[POIRecord]]]]
+
+# Returned by a fetch whose response held only part of the box, which must not be cached as is
+TRUNCATED = object()
+
+logger = logging.getLogger(__name__)
+
+
+class POITileCache:
+    """
+    Spatial cache of POIs stored in fixed lat/lng grid tiles.
+
+    A radius search is answered by covering the circle with tiles. Cached tiles are
+    served directly; the missing ones are fetched together in one bounding-box query,
+    or a few around large cached holes with at most `max_concurrent_fetches` at once,
+    and stored, and the circle filter is applied locally. Tiles expire after a TTL
+    and the least recently used tiles are evicted once the cache holds too many POIs.
+
+    Text searches match each tile through a text index kept with the tile, so a
+    tile is indexed once however often it is searched.
+    """
+
+    def __init__(
+        self,
+        tile_size_deg: float = 0.01,
+        ttl_seconds: float = 24 * 3600,
+        max_pois: int = 200_000,
+        min_fill: float = 0.6,
+        max_concurrent_fetches: int = 2,
+        max_search_tiles: int = 20_000,
+    ):
+        self.tile_size_deg = tile_size_deg
+        self.ttl_seconds = ttl_seconds
+        self.max_pois = max_pois
+        # Share of a fetched box that must be missing tiles; the cached rest is fetched again
+        self.min_fill = min_fill
+        self.max_concurrent_fetches = max_concurrent_fetches
+        self.max_search_tiles = max_search_tiles
+
+        # tile -> (expires_at, POIs whose coordinates fall in the tile)
+        self._tiles: "OrderedDict[Tile, Tuple[float, List[POIRecord]]]" = OrderedDict()
+        # tile -> text index of its POIs, built on the first text search of the tile
+        self._indexes: Dict[Tile, POITextIndex] = {}
+        self._poi_count = 0
+        self._flight = SingleFlight()
+
+        self.tile_hits = 0
+        self.tile_misses = 0
+        self.fetches = 0
+        self.splits = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> "POITileCache":
+        return cls(
+            tile_size_deg=load_env_setting("POI_TILE_SIZE_DEG", 0.01, float),
+            ttl_seconds=load_env_setting("POI_TILE_TTL", 24 * 3600.0, float),
+            max_pois=load_env_setting("POI_TILE_MAX_POIS", 200_000, int),
+            min_fill=load_env_setting("POI_TILE_MIN_FILL", 0.6, float),
+            max_concurrent_fetches=load_env_setting("POI_TILE_FETCH_CONCURRENCY", 2, int),
+            max_search_tiles=load_env_setting("POI_TILE_MAX_SEARCH_TILES", 20_000, int),
+        )
+
+    def tile_of(self, lat: float, lng: float) -> Tile:
+        return math.floor(lat / self.tile_size_deg), math.floor(lng / self.tile_size_deg)
+
+    def tile_bbox(self, first: Tile, last: Tile) -> BBox:
+        """
+        Bounding box covering every tile from `first` to `last` (inclusive)
+        """
+        size = self.tile_size_deg
+        return (
+            round(first[0] * size, 7),
+            round(first[1] * size, 7),
+            round((last[0] + 1) * size, 7),
+            round((last[1] + 1) * size, 7),
+        )
+
+    def _bbox_tiles(self, bbox: BBox) -> Tuple[Tile, Tile]:
+        """
+        First and last tile of a tile-aligned bbox
+        """
+        south, west, north, east = bbox
+        first = self.tile_of(south + self.tile_size_deg / 2, west + self.tile_size_deg / 2)
+        last = self.tile_of(north - self.tile_size_deg / 2, east - self.tile_size_deg / 2)
+        return first, last
+
+    def _split(self, bbox: BBox) -> Optional[Tuple[BBox, BBox]]:
+        """
+        The two halves of a tile-aligned bbox, split on a tile edge across its
+        longer side, or None for a single tile
+        """
+        first, last = self._bbox_tiles(bbox)
+        rows = last[0] - first[0] + 1
+        cols = last[1] - first[1] + 1
+        if rows == 1 and cols == 1:
+            return None
+        if rows >= cols:
+            middle = first[0] + rows // 2
+            return self.tile_bbox(first, (middle - 1, last[1])), self.tile_bbox((middle, first[1]), last)
+        middle = first[1] + cols // 2
+        return self.tile_bbox(first, (last[0], middle - 1)), self.tile_bbox((first[0], middle), last)
+
+    def missing_boxes(self, missing: List[Tile], until: Optional[float] = None) -> List[BBox]:
+        """
+        Few boxes covering the given tiles. Their bounding box is fetched whole
+        when at most `1 - min_fill` of it is tiles cached and valid until `until`
+        (now by default) and the given tiles fill at least `min_fill` of the rest,
+        as on a cold cache. Otherwise the strips around the cached tiles and the
+        area between them are covered the same way, so only large cached holes
+        are cut out, or the box is halved between areas far apart.
+        """
+        until = time.time() if until is None else until
+        boxes: List[BBox] = []
+        self._cover(set(missing), until, boxes)
+        return boxes
+
+    def _cover(self, tiles: Set[Tile], until: float, boxes: List[BBox]):
+        if not tiles:
+            return
+        first = (min(i for i, _ in tiles), min(j for _, j in tiles))
+        last = (max(i for i, _ in tiles), max(j for _, j in tiles))
+        area = (last[0] - first[0] + 1) * (last[1] - first[1] + 1)
+        # Pooled areas far apart: too sparse to fetch whole whatever is cached, skip the count
+        far_apart = area > self.max_search_tiles and len(tiles) < self.min_fill ** 2 * area
+        cached = [] if far_apart else [
+            (i, j)
+            for i in range(first[0], last[0] + 1)
+            for j in range(first[1], last[1] + 1)
+            if self._is_fresh((i, j), until)
+        ]
+        if len(cached) <= (1 - self.min_fill) * area and len(tiles) >= self.min_fill * (area - len(cached)):
+            boxes.append(self.tile_bbox(first, last))
+            return
+
+        if cached:
+            south, north = min(i for i, _ in cached), max(i for i, _ in cached)
+            west, east = min(j for _, j in cached), max(j for _, j in cached)
+        if not cached or ((south, west) == first and (north, east) == last):
+            # Nothing cached to cut around, or cached tiles reach every edge
+            for half in self._split(self.tile_bbox(first, last)):
+                (half_south, half_west), (half_north, half_east) = self._bbox_tiles(half)
+                self._cover(
+                    {(i, j) for i, j in tiles if half_south <= i <= half_north and half_west <= j <= half_east},
+                    until,
+                    boxes,
+                )
+            return
+
+        # Above, below, left and right of the cached tiles, then between them
+        parts: List[Set[Tile]] = [set() for _ in range(5)]
+        for i, j in tiles:
+            if i < south:
+                parts[0].add((i, j))
+            elif i > north:
+                parts[1].add((i, j))
+            elif j < west:
+                parts[2].add((i, j))
+            elif j > east:
+                parts[3].add((i, j))
+            else:
+                parts[4].add((i, j))
+        for part in parts:
+            self._cover(part, until, boxes)
+
+    async def _fill_all(
+        self,
+        boxes: List[BBox],
+        fetch: BBoxFetcher,
+        concurrency: int,
+    ) -> AsyncIterator[Tuple[BBox, Optional[List[POIRecord]]]]:
+        """
+        Fill the boxes, at most `concurrency` at a time, yielding each box and its POIs as they land
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fill(bbox: BBox) -> Tuple[BBox, Optional[List[POIRecord]]]:
+            async with semaphore:
+                return bbox, await self._flight.do(bbox, lambda: self._fill(bbox, fetch))
+
+        for filled in asyncio.as_completed([fill(bbox) for bbox in boxes]):
+            yield await filled
+
+    def tileable(self, lat: float, lng: float, radius_m: float) -> bool:
+        """
+        Whether the circle spans few enough tiles to be searched through the cache.
+        Near the poles even a small circle spans every longitude.
+        """
+        south, west, north, east = circle_bbox(lat, lng, radius_m)
+        first = self.tile_of(south, west)
+        last = self.tile_of(north, east)
+        return (last[0] - first[0] + 1) * (last[1] - first[1] + 1) <= self.max_search_tiles
+
+    def covering_tiles(self, lat: float, lng: float, radius_m: float) -> List[Tile]:
+        """
+        Tiles that intersect the circle around (lat, lng)
+        """
+        south, west, north, east = circle_bbox(lat, lng, radius_m)
+        first = self.tile_of(south, west)
+        last = self.tile_of(north, east)
+        size = self.tile_size_deg
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+
+        tiles = []
+        for i in range(first[0], last[0] + 1):
+            for j in range(first[1], last[1] + 1):
+                # Distance from the center to the closest point of the tile
+                near_lat = min(max(lat, i * size), (i + 1) * size)
+                near_lng = min(max(lng, j * size), (j + 1) * size)
+                dy = (near_lat - lat) * METERS_PER_DEGREE
+                dx = (near_lng - lng) * METERS_PER_DEGREE * cos_lat
+                if dx * dx + dy * dy <= radius_m * radius_m:
+                    tiles.append((i, j))
+        return tiles
+
+    def _get_tile(self, tile: Tile, now: float) -> Optional[List[POIRecord]]:
+        entry = self._tiles.get(tile)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            self._drop(tile)
+            return None
+        self._tiles.move_to_end(tile)
+        return entry[1]
+
+    def _is_fresh(self, tile: Tile, until: float) -> bool:
+        """
+        Whether the tile is cached and stays valid until `until`
+        """
+        entry = self._tiles.get(tile)
+        return entry is not None and entry[0] > until
+
+    def _drop(self, tile: Tile):
+        _, pois = self._tiles.pop(tile)
+        self._indexes.pop(tile, None)
+        self._poi_count -= len(pois)
+
+    def _text_index(self, tile: Tile, pois: List[POIRecord]) -> POITextIndex:
+        index = self._indexes.get(tile)
+        if index is not None and index.pois is pois:
+            return index
+        index = POITextIndex(pois)
+        entry = self._tiles.get(tile)
+        # Only kept while the tile holds these POIs
+        if entry is not None and entry[1] is pois:
+            self._indexes[tile] = index
+        return index
+
+    def _store(self, bbox: BBox, pois: List[POIRecord]):
+        """
+        Store a fetched bbox: every tile inside it is filled, empty ones included
+        """
+        first, last = self._bbox_tiles(bbox)
+        buckets: Dict[Tile, List[POIRecord]] = {
+            (i, j): []
+            for i in range(first[0], last[0] + 1)
+            for j in range(first[1], last[1] + 1)
+        }
+        for poi in pois:
+            bucket = buckets.get(self.tile_of(poi.lat, poi.lng))
+            if bucket is not None:
+                bucket.append(poi)
+
+        expires_at = time.time() + self.ttl_seconds
+        for tile, tile_pois in buckets.items():
+            if tile in self._tiles:
+                self._drop(tile)
+            self._tiles[tile] = (expires_at, tile_pois)
+            self._poi_count += len(tile_pois)
+
+        # Evict least recently used tiles until we are back under the memory bound
+        while self._poi_count > self.max_pois and self._tiles:
+            self._drop(next(iter(self._tiles)))
+            self.evictions += 1
+
+    async def _fill(self, bbox: BBox, fetch: BBoxFetcher) -> Optional[List[POIRecord]]:
+        pois = await self._fetch_whole(bbox, fetch)
+        # Failed fetches are not cached, so the tiles are retried on the next search
+        if pois is not None:
+            self._store(bbox, pois)
+        return pois
+
+    async def _fetch_whole(self, bbox: BBox, fetch: BBoxFetcher) -> Optional[List[POIRecord]]:
+        """
+        Every POI in the box. A response cut short is fetched again as two halves,
+        down to single tiles; None if even a single tile cannot be fetched whole.
+        """
+        self.fetches += 1
+        pois = await fetch(bbox)
+        if pois is not TRUNCATED:
+            return pois
+        halves = self._split(bbox)
+        if halves is None:
+            logger.warning("Tile too dense to fetch whole", extra={"bbox": bbox})
+            return None
+        self.splits += 1
+        pois = []
+        # One half after the other, so a dense area does not hit Overpass all at once
+        for half in halves:
+            part = await self._fetch_whole(half, fetch)
+            if part is None:
+                return None
+            pois.extend(part)
+        return pois
+
+    async def _iter_tile_batches(
+        self,
+        lat: float,
+        lng: float,
+        radius_m: float,
+        fetch: BBoxFetcher,
+    ) -> AsyncIterator[Tuple[List[Tuple[Tile, List[POIRecord]]], Optional[List[POIRecord]]]]:
+        """
+        Yield (tiles, fetched) in batches: first the cached tiles with fetched None,
+        then the missing tiles of each fetched box with the POIs fetched for it
+        """
+        now = time.time()
+        tiles = self.covering_tiles(lat, lng, radius_m)
+        found: List[Tuple[Tile, List[POIRecord]]] = []
+        missing: List[Tile] = []
+        for tile in tiles:
+            pois = self._get_tile(tile, now)
+            if pois is None:
+                missing.append(tile)
+            else:
+                found.append((tile, pois))
+
+        self.tile_hits += len(tiles) - len(missing)
+        self.tile_misses += len(missing)
+
+        yield found, None
+
+        if missing:
+            # Cached tiles inside the fetched boxes were already yielded
+            boxes = self.missing_boxes(missing, now)
+            async for bbox, fetched in self._fill_all(boxes, fetch, self.max_concurrent_fetches):
+                if fetched is None:
+                    continue
+                (south, west), (north, east) = self._bbox_tiles(bbox)
+                batch: List[Tuple[Tile, List[POIRecord]]] = []
+                evicted: Dict[Tile, List[POIRecord]] = {}
+                for tile in missing:
+                    if south <= tile[0] <= north and west <= tile[1] <= east:
+                        # The stored lists, so their text indexes are kept with the tiles
+                        entry = self._tiles.get(tile)
+                        if entry is not None:
+                            batch.append((tile, entry[1]))
+                        else:
+                            evicted[tile] = []
+                            batch.append((tile, evicted[tile]))
+                if evicted:
+                    # Dropped again at once by a full cache
+                    for poi in fetched:
+                        bucket = evicted.get(self.tile_of(poi.lat, poi.lng))
+                        if bucket is not None:
+                            bucket.append(poi)
+                yield batch, fetched
+
+    async def iter_tiles(
+        self,
+        lat: float,
+        lng: float,
+        radius_m: float,
+        fetch: BBoxFetcher,
+    ) -> AsyncIterator[List[Tuple[Tile, List[POIRecord]]]]:
+        """
+        Yield (tile, POIs) for the tiles intersecting the circle in batches: first
+        the cached tiles, then the missing tiles of each fetched box
+        """
+        async for batch, _ in self._iter_tile_batches(lat, lng, radius_m, fetch):
+            yield batch
+
+    async def iter_search(
+        self,
+        lat: float,
+        lng: float,
+        radius_m: float,
+        fetch: BBoxFetcher,
+    ) -> AsyncIterator[List[POIRecord]]:
+        """
+        Yield the POIs within radius_m of (lat, lng) in batches: first everything
+        already cached, then the POIs of the tiles that had to be fetched
+        """
+        async for batch, fetched in self._iter_tile_batches(lat, lng, radius_m, fetch):
+            if fetched is None:
+                pois = [poi for _, tile_pois in batch for poi in tile_pois]
+            else:
+                # In the order fetched, as a direct query would return them
+                inside = {tile for tile, _ in batch}
+                pois = [poi for poi in fetched if self.tile_of(poi.lat, poi.lng) in inside]
+            yield [poi for poi in pois if haversine_m(lat, lng, poi.lat, poi.lng) <= radius_m]
+
+    def match_tiles(
+        self,
+        tiles: List[Tuple[Tile, List[POIRecord]]],
+        lat: float,
+        lng: float,
+        radius_m: float,
+        query: str,
+        category: Optional[str] = None,
+    ) -> List[Tuple[POIRecord, float]]:
+        """
+        (POI, match score) of the POIs of a batch from iter_tiles that match the
+        query and lie within radius_m of (lat, lng)
+        """
+        matches = []
+        for tile, pois in tiles:
+            for i, score in self._text_index(tile, pois).search(query, category):
+                poi = pois[i]
+                if haversine_m(lat, lng, poi.lat, poi.lng) <= radius_m:
+                    matches.append((poi, score))
+        return matches
+
+    async def prefetch(
+        self,
+        circles: List[Tuple[float, float, float]],
+        fetch: BBoxFetcher,
+        refresh_within: float = 0.0,
+        concurrency: Optional[int] = None,
+    ) -> int:
+        """
+        Fill the missing tiles of many (lat, lng, radius_m) searches at once.
+        Tiles expiring within `refresh_within` seconds count as missing, so they
+        are refreshed while still being served.
+
+        The missing tiles of every search are pooled and covered with as few
+        boxes as possible, so the set costs few fetches, run at most `concurrency`
+        at a time (default `max_concurrent_fetches`). Returns the number of fetches.
+        """
+        until = time.time() + refresh_within
+        missing = {
+            tile
+            for lat, lng, radius_m in circles
+            for tile in self.covering_tiles(lat, lng, radius_m)
+            if not self._is_fresh(tile, until)
+        }
+        boxes = self.missing_boxes(list(missing), until)
+        async for _ in self._fill_all(boxes, fetch, concurrency or self.max_concurrent_fetches):
+            pass
+        return len(boxes)
+
+    async def search(
+        self,
+        lat: float,
+        lng: float,
+        radius_m: float,
+        fetch: BBoxFetcher,
+    ) -> List[POIRecord]:
+        """
+        Return every cached or freshly fetched POI within radius_m of (lat, lng)
+        """
+        found: List[POIRecord] = []
+        async for batch in self.iter_search(lat, lng, radius_m, fetch):
+            found.extend(batch)
+        return found
+
+    def coverage(self, circles: List[Tuple[float, float, float]], refresh_within: float = 0.0) -> float:
+        """
+        Share of the tiles covering the (lat, lng, radius_m) circles that are
+        cached and stay valid for at least `refresh_within` seconds
+        """
+        until = time.time() + refresh_within
+        tiles = {tile for lat, lng, radius_m in circles for tile in self.covering_tiles(lat, lng, radius_m)}
+        if not tiles:
+            return 1.0
+        return sum(self._is_fresh(tile, until) for tile in tiles) / len(tiles)
+
+    def stats(self) -> dict:
+        lookups = self.tile_hits + self.tile_misses
+        return {
+            "tiles": len(self._tiles),
+            "pois": self._poi_count,
+            "tile_hits": self.tile_hits,
+            "tile_misses": self.tile_misses,
+            "hit_rate": self.tile_hits / lookups if lookups else 0.0,
+            "fetches": self.fetches,
+            "splits": self.splits,
+            "evictions": self.evictions,
+        }
+
+
+# Process-wide tile cache used by find_points_of_interest
+poi_tile_cache = POITileCache.from_env()
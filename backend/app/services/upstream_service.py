@@ -0,0 +1,115 @@
+from fastapi import Request
+from app.util.load_env import load_env_setting
+from app.util.metrics import UPSTREAM_ERRORS, UPSTREAM_RESPONSES, UPSTREAM_SECONDS
+import asyncio
+import httpx
+import importlib.util
+import logging
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Default pool and timeout settings per upstream. Every value can be overridden with
+# an environment variable named <UPSTREAM>_<SETTING>, e.g. OVERPASS_TIMEOUT=45.
+UPSTREAM_DEFAULTS: Dict[str, Dict[str, float]] = {
+    # Nominatim allows 1 request/s, so a couple of keep-alive connections is plenty
+    "nominatim": {"timeout": 60.0, "connect_timeout": 10.0, "max_connections": 4, "max_keepalive": 2},
+    "overpass": {"timeout": 30.0, "connect_timeout": 10.0, "max_connections": 10, "max_keepalive": 5},
+    "huggingface": {"timeout": 30.0, "connect_timeout": 10.0, "max_connections": 20, "max_keepalive": 10},
+}
+
+# Idle keep-alive connections are closed after this many seconds
+KEEPALIVE_EXPIRY = load_env_setting("UPSTREAM_KEEPALIVE_EXPIRY", 30.0, float)
+
+
+def _http2_enabled() -> bool:
+    if not load_env_setting("UPSTREAM_HTTP2", False, bool):
+        return False
+    # HTTP/2 support in httpx needs the optional h2 package (pip install "httpx[http2]")
+    if importlib.util.find_spec("h2") is None:
+        logger.warning("UPSTREAM_HTTP2 is set but the 'h2' package is not installed, using HTTP/1.1")
+        return False
+    return True
+
+
+class MeteredTransport(httpx.AsyncHTTPTransport):
+    """
+    Connection pool that records the latency (until the response headers) and the
+    status code of every upstream request, and the errors of requests that got no response
+    """
+
+    def __init__(self, upstream: str, **kwargs):
+        super().__init__(**kwargs)
+        self.upstream = upstream
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await super().handle_async_request(request)
+        except httpx.TransportError as e:
+            UPSTREAM_ERRORS.inc(upstream=self.upstream, error=type(e).__name__)
+            raise
+        host = request.url.host
+        UPSTREAM_SECONDS.observe(time.perf_counter() - started, upstream=self.upstream, host=host)
+        UPSTREAM_RESPONSES.inc(upstream=self.upstream, host=host, status=str(response.status_code))
+        return response
+
+
+def _build_client(name: str, http2: bool) -> httpx.AsyncClient:
+    defaults = UPSTREAM_DEFAULTS[name]
+    prefix = name.upper()
+    timeout = load_env_setting(f"{prefix}_TIMEOUT", defaults["timeout"], float)
+    connect_timeout = load_env_setting(f"{prefix}_CONNECT_TIMEOUT", defaults["connect_timeout"], float)
+    max_connections = load_env_setting(f"{prefix}_MAX_CONNECTIONS", int(defaults["max_connections"]), int)
+    max_keepalive = load_env_setting(f"{prefix}_MAX_KEEPALIVE", int(defaults["max_keepalive"]), int)
+
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        transport=MeteredTransport(
+            name,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            http2=http2,
+        ),
+        follow_redirects=True,
+    )
+
+
+class UpstreamClients:
+    """
+    Pooled HTTP clients for every upstream service, shared by all requests.
+
+    Each upstream gets its own client so timeouts and connection limits can be tuned
+    separately, and connections are kept alive between requests.
+    """
+
+    def __init__(self):
+        http2 = _http2_enabled()
+        self.nominatim = _build_client("nominatim", http2)
+        self.overpass = _build_client("overpass", http2)
+        self.huggingface = _build_client("huggingface", http2)
+
+    async def aclose(self):
+        """
+        Close every pool, letting in-flight requests on other pools finish
+        """
+        results = await asyncio.gather(
+            self.nominatim.aclose(),
+            self.overpass.aclose(),
+            self.huggingface.aclose(),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("Error closing upstream client", extra={"error": repr(result)})
+
+
+def get_upstream_clients(request: Request) -> UpstreamClients:
+    """
+    FastAPI dependency returning the clients created in the app lifespan
+    """
+    return request.app.state.upstream_clients
@@ -0,0 +1,234 @@
+from app.services.rate_limiter import SingleFlight
+from app.services.tile_cache import BBoxFetcher, POITileCache, poi_tile_cache
+from app.util.load_env import load_env_setting
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+# Hot places warmed on every run, edited by hand
+DEFAULT_HOT_PLACES_PATH = Path(__file__).resolve().parents[2] / "data" / "hot_places.json"
+
+logger = logging.getLogger(__name__)
+
+Circle = Tuple[float, float, float]
+
+# Coordinates of a place name; cached answers expiring within the given seconds are looked up again
+PlaceResolver = Callable[[str, float], Awaitable[Tuple[float, float]]]
+
+
+@dataclass
+class HotPlace:
+    name: str
+    radius_m: int = 2000
+
+
+def load_hot_places(path: Path) -> List[HotPlace]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        logger.warning("Hot places not found, warming recent areas only", extra={"path": str(path)})
+        return []
+    return [HotPlace(place["name"], int(place.get("radius_m", 2000))) for place in data["places"]]
+
+
+class HotAreaWarmer:
+    """
+    Keeps the POI tiles of hot areas cached, so the first search there after a
+    deploy or a tile expiry does not wait for Nominatim and Overpass.
+
+    Hot areas are the configured places (city centers, universities, landmarks)
+    and the areas searched most in recent traffic. A run resolves the places,
+    then fetches the tiles of each area that are missing or would expire before
+    the next run. Areas are fetched one at a time with a pause in between, and
+    the boxes of an area at most `fetch_concurrency` at a time (one by default),
+    so user searches keep most of the upstream capacity; geocoding goes through
+    the shared Nominatim rate limit, and a failed fetch ends the run.
+    """
+
+    def __init__(
+        self,
+        places: List[HotPlace],
+        tile_cache: POITileCache,
+        enabled: bool = False,
+        interval_seconds: float = 1800,
+        pause_seconds: float = 2.0,
+        fetch_concurrency: int = 1,
+        recent_areas: int = 20,
+        min_requests: int = 3,
+        cell_deg: float = 0.01,
+        max_radius_m: int = 3000,
+        max_tracked: int = 10_000,
+    ):
+        self.places = places
+        self.tile_cache = tile_cache
+        self.enabled = enabled
+        self.interval_seconds = interval_seconds
+        # Tiles expiring before the run after next are refreshed, so a late run still
+        # finds them valid; at most half their lifetime, or every run would refetch them
+        self.refresh_within = min(2 * interval_seconds, tile_cache.ttl_seconds / 2)
+        self.pause_seconds = pause_seconds
+        self.fetch_concurrency = fetch_concurrency
+        self.recent_areas = recent_areas
+        self.min_requests = min_requests
+        self.cell_deg = cell_deg
+        self.max_radius_m = max_radius_m
+        self.max_tracked = max_tracked
+
+        # Searched cell -> [request count, largest radius searched], halved every run
+        self._recent: Dict[Tuple[int, int], List[float]] = {}
+        self._targets: List[Circle] = []
+        self._flight = SingleFlight()
+
+        self.runs = 0
+        self.last_run: Optional[dict] = None
+
+    @classmethod
+    def from_env(cls) -> "HotAreaWarmer":
+        path = Path(load_env_setting("WARMER_PLACES_PATH", str(DEFAULT_HOT_PLACES_PATH)))
+        return cls(
+            places=load_hot_places(path),
+            tile_cache=poi_tile_cache,
+            enabled=load_env_setting("WARMER", False, bool),
+            interval_seconds=load_env_setting("WARMER_INTERVAL", 1800.0, float),
+            pause_seconds=load_env_setting("WARMER_PAUSE", 2.0, float),
+            fetch_concurrency=load_env_setting("WARMER_FETCH_CONCURRENCY", 1, int),
+            recent_areas=load_env_setting("WARMER_RECENT_AREAS", 20, int),
+            min_requests=load_env_setting("WARMER_MIN_REQUESTS", 3, int),
+            max_radius_m=load_env_setting("WARMER_MAX_RADIUS_M", 3000, int),
+        )
+
+    def record(self, lat: float, lng: float, radius_m: float):
+        """
+        Count a POI search towards the recent hot areas
+        """
+        if not self.tile_cache.tileable(lat, lng, radius_m):
+            return
+        cell = (round(lat / self.cell_deg), round(lng / self.cell_deg))
+        entry = self._recent.setdefault(cell, [0.0, 0.0])
+        entry[0] += 1
+        entry[1] = max(entry[1], min(radius_m, self.max_radius_m))
+        if len(self._recent) > self.max_tracked:
+            # Forget the least searched half
+            keep = sorted(self._recent.items(), key=lambda item: -item[1][0])[:self.max_tracked // 2]
+            self._recent = dict(keep)
+
+    def hot_areas(self) -> List[Circle]:
+        """
+        The most searched recent areas, as (lat, lng, radius_m)
+        """
+        busiest = sorted(self._recent.items(), key=lambda item: -item[1][0])[:self.recent_areas]
+        return [
+            (cell[0] * self.cell_deg, cell[1] * self.cell_deg, radius_m)
+            for cell, (count, radius_m) in busiest
+            if count >= self.min_requests
+        ]
+
+    def _decay(self):
+        # Older traffic counts half as much after every run
+        for entry in self._recent.values():
+            entry[0] /= 2
+        self._recent = {cell: entry for cell, entry in self._recent.items() if entry[0] >= 0.5}
+
+    async def run_once(self, resolve: PlaceResolver, fetch: BBoxFetcher) -> dict:
+        """
+        Warm every hot area once and report the coverage.
+        A run started while another is in progress waits for that one instead.
+        """
+        return await self._flight.do("run", lambda: self._run(resolve, fetch))
+
+    async def _run(self, resolve: PlaceResolver, fetch: BBoxFetcher) -> dict:
+        started = time.monotonic()
+        targets: List[Circle] = []
+        unresolved: List[str] = []
+        for place in self.places:
+            try:
+                lat, lng = await resolve(place.name, self.refresh_within)
+            except Exception as e:
+                logger.warning("Could not resolve hot place", extra={"place_name": place.name, "error": repr(e)})
+                unresolved.append(place.name)
+                continue
+            targets.append((lat, lng, place.radius_m))
+        recent = self.hot_areas()
+        targets.extend(recent)
+        self._decay()
+
+        fetches = 0
+        complete = True
+        for circle in targets:
+            if self.tile_cache.coverage([circle], self.refresh_within) == 1.0:
+                continue
+            fetches += await self.tile_cache.prefetch([circle], fetch, self.refresh_within, self.fetch_concurrency)
+            if self.tile_cache.coverage([circle], self.refresh_within) < 1.0:
+                logger.warning("Warm-up fetch failed, stopping this run", extra={"lat": circle[0], "lng": circle[1]})
+                complete = False
+                break
+            await asyncio.sleep(self.pause_seconds)
+
+        self._targets = targets
+        self.runs += 1
+        self.last_run = {
+            "finished_at": time.time(),
+            "duration_s": round(time.monotonic() - started, 3),
+            "places": len(self.places),
+            "unresolved": unresolved,
+            "recent_areas": len(recent),
+            "fetches": fetches,
+            "complete": complete,
+            "coverage": self.tile_cache.coverage(targets),
+        }
+        logger.info("Warmed hot areas", extra={k: v for k, v in self.last_run.items() if k != "unresolved"})
+        return self.last_run
+
+    async def run_forever(self, warm: Callable[[], Awaitable[dict]]):
+        """
+        Run `warm` now and then every interval, until cancelled
+        """
+        while True:
+            try:
+                await warm()
+            except Exception:
+                logger.exception("Warm-up run failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "interval_s": self.interval_seconds,
+            "runs": self.runs,
+            "tracked_areas": len(self._recent),
+            # Share of the tiles of the last run's areas that are cached and valid now
+            "coverage": self.tile_cache.coverage(self._targets) if self._targets else 0.0,
+            "last_run": self.last_run,
+        }
+
+
+# Process-wide warmer of the tile cache read by /place/poi
+hot_area_warmer = HotAreaWarmer.from_env()
+
+
+if __name__ == "__main__":
+    import httpx
+
+    # The tile cache lives in the server process, so the CLI asks the server to warm it
+    parser = argparse.ArgumentParser(description="Hot area warm-up")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run = subparsers.add_parser("run", help="Warm the hot areas of a running server now")
+    run.add_argument("--url", default="http://127.0.0.1:8000", help="Backend base URL")
+    run.add_argument("--token", default=os.getenv("WARMER_TOKEN"), help="The server's WARMER_TOKEN, if set")
+    status = subparsers.add_parser("status", help="Show the warm coverage of a running server")
+    status.add_argument("--url", default="http://127.0.0.1:8000", help="Backend base URL")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        headers = {"X-Warm-Token": args.token} if args.token else {}
+        response = httpx.post(f"{args.url}/place/warm", headers=headers, timeout=None)
+    else:
+        response = httpx.get(f"{args.url}/place/warm/stats")
+    response.raise_for_status()
+    print(json.dumps(response.json(), ensure_ascii=False, indent=2))
@@ -1 +1,6 @@
-from .load_env import load_env_variable
\ No newline at end of file
+from .load_env import load_env_variable, load_env_setting
+from .text import fold_diacritics, normalize_place_name, normalize_message, diacritic_variants
+from .geo import haversine_m, circle_bbox, merge_bboxes, snap_to_grid
+from .timing import StageTimer
+from .metrics import Counter, Histogram, render_metrics, stage
+from .json_response import FastJSONResponse, dumps
\ No newline at end of file
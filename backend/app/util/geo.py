@@ -0,0 +1,72 @@
+import math
+from typing import List, Tuple
+
+BBox = Tuple[float, float, float, float]
+
+EARTH_RADIUS_M = 6371008.8
+
+# Metres per degree of latitude (and of longitude at the equator)
+METERS_PER_DEGREE = 111320.0
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """
+    Great-circle distance between two points in metres
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def circle_bbox(lat: float, lng: float, radius_m: float) -> BBox:
+    """
+    Bounding box (south, west, north, east) of a circle in degrees
+    """
+    dlat = radius_m / METERS_PER_DEGREE
+    dlng = radius_m / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return lat - dlat, lng - dlng, lat + dlat, lng + dlng
+
+
+def snap_to_grid(value: float, step: float) -> float:
+    """
+    Round a coordinate to the nearest multiple of `step` degrees
+    """
+    return round(round(value / step) * step, 7)
+
+
+def _bbox_area(bbox: BBox) -> float:
+    south, west, north, east = bbox
+    return max(north - south, 0.0) * max(east - west, 0.0)
+
+
+def _bbox_union(a: BBox, b: BBox) -> BBox:
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def merge_bboxes(bboxes: List[BBox]) -> List[Tuple[BBox, List[int]]]:
+    """
+    Merge boxes whenever one box covering both is no bigger than the two apart.
+
+    Overlapping or adjacent areas become a single fetch, while far apart (or
+    diagonal) areas stay separate instead of becoming one mostly empty box.
+    Returns each merged box with the indices of the input boxes it covers.
+    """
+    groups = [(bbox, [i]) for i, bbox in enumerate(bboxes)]
+    merged = True
+    while merged:
+        merged = False
+        result: List[Tuple[BBox, List[int]]] = []
+        for bbox, members in groups:
+            for j, (other, other_members) in enumerate(result):
+                union = _bbox_union(bbox, other)
+                if _bbox_area(union) <= _bbox_area(bbox) + _bbox_area(other):
+                    result[j] = (union, other_members + members)
+                    merged = True
+                    break
+            else:
+                result.append((bbox, members))
+        groups = result
+    return groups
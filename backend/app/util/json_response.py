@@ -0,0 +1,28 @@
+from fastapi import Response
+from pydantic import BaseModel
+from typing import Any
+import orjson
+
+
+def _default(obj: Any) -> Any:
+    # Pydantic models around the POI records, e.g. the chat response envelope
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Serialize to JSON bytes with orjson; dataclasses such as POIRecord are written directly
+    """
+    return orjson.dumps(content, default=_default)
+
+
+class FastJSONResponse(Response):
+    """
+    JSON response rendered by orjson, for bodies made of POI records rather than models
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
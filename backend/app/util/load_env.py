@@ -1,6 +1,12 @@
+import logging
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
 
 for env_file in Path.cwd().rglob(".env"):
     load_dotenv(env_file, override=True)
@@ -8,5 +14,20 @@ for env_file in Path.cwd().rglob(".env"):
 def load_env_variable(var_name: str) -> str | None:
     value = os.getenv(var_name)
     if value is None:
-        print(f"Warning: Environment variable '{var_name}' is not set.")
+        logger.warning("Environment variable is not set", extra={"variable": var_name})
     return value
+
+def load_env_setting(var_name: str, default: T, cast: Callable[[str], T] = str) -> T:
+    """
+    Load an optional tuning setting, falling back to the default when it is unset or invalid
+    """
+    value = os.getenv(var_name)
+    if value is None or value == "":
+        return default
+    if cast is bool:
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    try:
+        return cast(value)
+    except ValueError:
+        logger.warning("Invalid setting, using the default", extra={"variable": var_name, "value": value, "default": default})
+        return default
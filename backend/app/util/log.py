@@ -0,0 +1,84 @@
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+import json
+import logging
+import os
+import queue
+import sys
+
+# Attributes every LogRecord has; anything else was passed with `extra=` and is logged as a field
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line, with the `extra=` fields of the call next to the message
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    Human readable lines for development, fields appended as key=value
+    """
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = " ".join(f"{key}={value}" for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        return f"{line} {fields}" if fields else line
+
+
+def setup_logging():
+    """
+    Route every log record through a queue to a background thread that formats and
+    writes it, so logging never blocks the event loop on stdout.
+
+    LOG_LEVEL sets the level (INFO by default; DEBUG shows the per-request debug
+    output) and LOG_FORMAT selects "json" (default) or "text" lines.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(TextFormatter() if os.getenv("LOG_FORMAT", "json").lower() == "text" else JSONFormatter())
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.handlers = [QueueHandler(records)]
+    root.setLevel(level if level in logging.getLevelNamesMapping() else logging.INFO)
+    # httpx logs every upstream request at INFO; /metrics already counts them
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+
+def shutdown_logging():
+    """
+    Write out the records still queued and stop the writer thread
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
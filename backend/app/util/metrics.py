@@ -0,0 +1,219 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+import math
+import time
+
+# Latency buckets in seconds, from cache hits to slow Overpass queries
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+# Every metric, in registration order, rendered by /metrics
+_registry: List["_Metric"] = []
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count, e.g. requests by status code
+    """
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values (latencies in seconds) in cumulative buckets
+    """
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> (count per bucket with +Inf last, sum of values)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                labels = _format_labels((*self.labelnames, "le"), (*key, _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total[0])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class CallbackMetric(_Metric):
+    """
+    Metric read at scrape time from a function returning (labels, value) pairs,
+    for numbers a component already keeps, like cache hit rates
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        fn: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+        type: str = "gauge",
+        labelnames: Tuple[str, ...] = (),
+    ):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.fn = fn
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self.fn():
+            if value is None:
+                continue
+            yield f"{self.name}{_format_labels(self.labelnames, self._key(labels))} {_format_value(value)}"
+
+
+def render_metrics() -> str:
+    """
+    Every registered metric in the Prometheus text exposition format
+    """
+    blocks = []
+    for metric in _registry:
+        try:
+            blocks.append(metric.render())
+        except Exception as e:
+            # One broken callback must not take down the whole scrape
+            blocks.append(f"# {metric.name} unavailable: {_escape(str(e))}")
+    return "\n".join(blocks) + "\n"
+
+
+# Shared instruments of the request pipeline
+STAGE_SECONDS = Histogram(
+    "app_stage_duration_seconds", "Duration of one stage of a request pipeline", ("route", "stage")
+)
+UPSTREAM_SECONDS = Histogram(
+    "app_upstream_request_duration_seconds", "Latency of upstream HTTP requests", ("upstream", "host")
+)
+UPSTREAM_RESPONSES = Counter(
+    "app_upstream_responses_total", "Upstream HTTP responses by status code", ("upstream", "host", "status")
+)
+UPSTREAM_ERRORS = Counter(
+    "app_upstream_errors_total", "Upstream requests that failed without a response", ("upstream", "error")
+)
+HTTP_SECONDS = Histogram(
+    "app_http_request_duration_seconds", "Latency of HTTP requests served", ("method", "route", "status")
+)
+
+
+@contextmanager
+def stage(route: str, name: str) -> Iterator[None]:
+    """
+    Time one stage of a request into app_stage_duration_seconds
+    """
+    with STAGE_SECONDS.time(route=route, stage=name):
+        yield
+
+
+def observe_stage(route: str, name: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, route=route, stage=name)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request by its route template, so
+    /place/poi requests share one series whatever their query
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_SECONDS.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            )
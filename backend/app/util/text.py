@@ -0,0 +1,66 @@
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Every Vietnamese spelling of the letters that carry diacritics, keyed by base letter
+_VIETNAMESE_LETTERS = {
+    "a": "aàáảãạăằắẳẵặâầấẩẫậ",
+    "d": "dđ",
+    "e": "eèéẻẽẹêềếểễệ",
+    "i": "iìíỉĩị",
+    "o": "oòóỏõọôồốổỗộơờớởỡợ",
+    "u": "uùúủũụưừứửữự",
+    "y": "yỳýỷỹỵ",
+}
+_COUNTRY_SUFFIX = re.compile(r"(?:\s*,\s*|\s+)(?:viet\s*nam|vn)$")
+
+
+# Precomposed Vietnamese letter -> base letter, so the common case is one str.translate
+_FOLD_TABLE = {}
+for _base, _letters in _VIETNAMESE_LETTERS.items():
+    for _variant in _letters[1:]:
+        _FOLD_TABLE[ord(_variant)] = _base
+        _FOLD_TABLE[ord(_variant.upper())] = _base.upper()
+
+
+def fold_diacritics(text: str) -> str:
+    """
+    Remove Vietnamese diacritics, e.g. "Quận 5" -> "Quan 5"
+    """
+    text = text.translate(_FOLD_TABLE)
+    if text.isascii():
+        return text
+    # Other accents, or text typed with combining marks instead of precomposed letters
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def normalize_place_name(name: str) -> str:
+    """
+    Normalize a place name for cache lookups: lowercase, folded diacritics,
+    collapsed whitespace and no trailing ", Vietnam"
+    """
+    text = fold_diacritics(name).lower()
+    text = _WHITESPACE.sub(" ", text).strip(" ,.")
+    text = _COUNTRY_SUFFIX.sub("", text)
+    return text.strip(" ,.")
+
+
+def normalize_message(text: str) -> str:
+    """
+    Normalize a chat message for cache lookups: composed Unicode and collapsed
+    whitespace. Case and diacritics are kept, since the parsed slots are cut from
+    the message: "HCMUS" and "hcmus" are different keys, so are "phở" and "phố".
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def diacritic_variants(ch: str) -> str:
+    """
+    All upper and lower case Vietnamese spellings of a letter, e.g. "o" -> "oòó...OÒÓ..."
+    """
+    letters = _VIETNAMESE_LETTERS.get(fold_diacritics(ch).lower())
+    if letters is None:
+        return ch
+    return letters + letters.upper()
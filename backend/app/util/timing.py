@@ -0,0 +1,53 @@
+from app.util.metrics import observe_stage
+from contextlib import contextmanager
+from typing import Awaitable, Dict, Iterator, Optional, TypeVar
+import asyncio
+import time
+
+T = TypeVar("T")
+
+
+class StageTimer:
+    """
+    Wall-clock durations of the named stages of one request, in milliseconds.
+
+    Stages may overlap: `timed` measures a coroutine running in its own task, and
+    a stage that was cancelled or failed is recorded as "<name>_cancelled" or
+    "<name>_failed". With a `route`, every stage is also recorded in the
+    app_stage_duration_seconds histogram served at /metrics.
+    """
+
+    def __init__(self, route: Optional[str] = None):
+        self.route = route
+        self._start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def _record(self, name: str, started: float):
+        elapsed = time.perf_counter() - started
+        self.stages[name] = round(elapsed * 1000, 1)
+        if self.route is not None:
+            observe_stage(self.route, name, elapsed)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, started)
+
+    async def timed(self, name: str, awaitable: Awaitable[T]) -> T:
+        started = time.perf_counter()
+        try:
+            result = await awaitable
+        except asyncio.CancelledError:
+            self._record(f"{name}_cancelled", started)
+            raise
+        except Exception:
+            self._record(f"{name}_failed", started)
+            raise
+        self._record(name, started)
+        return result
+
+    def summary(self) -> Dict[str, float]:
+        return {**self.stages, "total": round((time.perf_counter() - self._start) * 1000, 1)}
@@ -0,0 +1,205 @@
+"""
+Local stand-ins for Nominatim, Overpass and the HuggingFace inference API.
+
+Answers come from the fixtures in benchmarks/fixtures, with configurable latency
+and injected errors per upstream. Run it on its own with
+
+    uv run python -m benchmarks.fake_upstreams --port 8100 --overpass-latency 800
+
+and point the backend at it with NOMINATIM_URL, OVERPASS_ENDPOINTS and HF_API_URL
+(see `upstream_env`), or let benchmarks.load_test start it.
+"""
+from app.util.geo import haversine_m
+from app.util.text import normalize_place_name
+from dataclasses import dataclass, field
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+import argparse
+import asyncio
+import json
+import random
+import re
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+UPSTREAMS = ("nominatim", "overpass", "huggingface")
+
+# Path of the fake inference endpoint, mirroring the real router URL
+HF_PATH = "/models/urchade/gliner_small-v2.1"
+
+_BBOX_RE = re.compile(r"\((-?[\d.]+),(-?[\d.]+),(-?[\d.]+),(-?[\d.]+)\)")
+_AROUND_RE = re.compile(r"\(around:([\d.]+),(-?[\d.]+),(-?[\d.]+)\)")
+_RING_RE = re.compile(r"\(around:([\d.]+),[^)]*\)[^;]*;\s*\)->\.inner")
+
+
+@dataclass
+class UpstreamProfile:
+    """
+    Behaviour of one fake upstream: latency in milliseconds, uniformly jittered by
+    +/- jitter_ms, and the share of requests answered with error_status instead
+    """
+    latency_ms: float = 0.0
+    jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 503
+
+    async def delay(self, rng: random.Random):
+        latency = self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+
+    def fails(self, rng: random.Random) -> bool:
+        return rng.random() < self.error_rate
+
+
+@dataclass
+class FakeUpstreamConfig:
+    profiles: Dict[str, UpstreamProfile] = field(default_factory=lambda: {name: UpstreamProfile() for name in UPSTREAMS})
+    seed: int = 252
+
+
+def load_fixtures(path: Path = FIXTURES_DIR) -> dict:
+    return {
+        "places": json.loads((path / "nominatim.json").read_text(encoding="utf-8")),
+        "elements": json.loads((path / "overpass_elements.json").read_text(encoding="utf-8")),
+        "chat": json.loads((path / "chat_messages.json").read_text(encoding="utf-8")),
+    }
+
+
+def _element_position(element: dict) -> Tuple[float, float]:
+    center = element if "lat" in element else element["center"]
+    return center["lat"], center["lon"]
+
+
+def _matching_elements(elements: List[dict], query: str) -> Optional[List[dict]]:
+    """
+    Fixture elements inside the bbox or radius of an Overpass query, or None if
+    the query has neither. Ring queries leave out the elements of the inner circle.
+    """
+    bbox = _BBOX_RE.search(query)
+    if bbox:
+        south, west, north, east = map(float, bbox.groups())
+    else:
+        around = _AROUND_RE.search(query)
+        if not around:
+            return None
+        radius_m, lat, lng = map(float, around.groups())
+        # Deliberately generous: the backend applies the exact circle filter itself
+        dlat = radius_m / 111_320
+        dlng = dlat * 1.02
+        south, west, north, east = lat - dlat, lng - dlng, lat + dlat, lng + dlng
+    found = [
+        element for element in elements
+        if south <= _element_position(element)[0] <= north and west <= _element_position(element)[1] <= east
+    ]
+    ring = _RING_RE.search(query)
+    if ring:
+        inner_m = float(ring.group(1))
+        found = [element for element in found if haversine_m(lat, lng, *_element_position(element)) > inner_m]
+    return found
+
+
+def build_fake_upstreams(config: FakeUpstreamConfig, fixtures: Optional[dict] = None) -> FastAPI:
+    """
+    One app serving all three upstreams on their real paths
+    """
+    fixtures = fixtures or load_fixtures()
+    places = {normalize_place_name(place["query"]): place for place in fixtures["places"]}
+    entities = {item["message"]: item["entities"] for item in fixtures["chat"]}
+    elements = fixtures["elements"]
+    rng = random.Random(config.seed)
+    counts: Dict[str, Dict[str, int]] = {name: {"requests": 0, "errors": 0} for name in UPSTREAMS}
+
+    app = FastAPI()
+
+    async def behave(name: str) -> Optional[Response]:
+        profile = config.profiles[name]
+        counts[name]["requests"] += 1
+        await profile.delay(rng)
+        if profile.fails(rng):
+            counts[name]["errors"] += 1
+            return JSONResponse({"error": "injected failure"}, status_code=profile.error_status)
+        return None
+
+    @app.get("/search")
+    async def nominatim_search(q: str = ""):
+        error = await behave("nominatim")
+        if error is not None:
+            return error
+        place = places.get(normalize_place_name(q))
+        if place is None:
+            return []
+        return [{"lat": str(place["lat"]), "lon": str(place["lon"]), "display_name": f"{place['query']}, Việt Nam"}]
+
+    @app.post("/api/interpreter")
+    async def overpass_interpreter(request: Request):
+        error = await behave("overpass")
+        if error is not None:
+            return error
+        # Overpass queries are posted as an urlencoded "data" field
+        form = parse_qs((await request.body()).decode("utf-8"))
+        found = _matching_elements(elements, form.get("data", [""])[0])
+        if found is None:
+            return Response("Error: could not parse the query", status_code=400)
+        return {"version": 0.6, "generator": "fake-overpass", "elements": found}
+
+    @app.post(HF_PATH)
+    async def gliner_inference(request: Request):
+        error = await behave("huggingface")
+        if error is not None:
+            return error
+        payload = await request.json()
+        return entities.get(payload.get("inputs", ""), [])
+
+    @app.get("/stats")
+    async def stats():
+        return counts
+
+    return app
+
+
+def upstream_env(base_url: str) -> Dict[str, str]:
+    """
+    Environment variables that point the backend at fake upstreams served from base_url
+    """
+    return {
+        "NOMINATIM_URL": base_url,
+        "OVERPASS_ENDPOINTS": f"{base_url}/api/interpreter",
+        "HF_API_URL": f"{base_url}{HF_PATH}",
+        "GLINER_BACKEND": "remote",
+    }
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    for name in UPSTREAMS:
+        parser.add_argument(f"--{name}-latency", type=float, default=0.0, help=f"{name} latency in ms")
+        parser.add_argument(f"--{name}-jitter", type=float, default=0.0, help=f"{name} latency jitter in ms")
+        parser.add_argument(f"--{name}-errors", type=float, default=0.0, help=f"share of {name} requests that fail")
+        parser.add_argument(f"--{name}-error-status", type=int, default=503, help=f"status of failed {name} requests")
+
+
+def config_from_arguments(args: argparse.Namespace) -> FakeUpstreamConfig:
+    return FakeUpstreamConfig(profiles={
+        name: UpstreamProfile(
+            latency_ms=getattr(args, f"{name}_latency"),
+            jitter_ms=getattr(args, f"{name}_jitter"),
+            error_rate=getattr(args, f"{name}_errors"),
+            error_status=getattr(args, f"{name}_error_status"),
+        )
+        for name in UPSTREAMS
+    })
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake Nominatim, Overpass and HuggingFace servers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    uvicorn.run(build_fake_upstreams(config_from_arguments(args)), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,335 @@
+"""
+Load test of the backend against local fake upstreams.
+
+Starts benchmarks.fake_upstreams and the app (uvicorn) as subprocesses, drives
+/ai/chat, /place/poi and /place/geocode with a concurrent load generator and
+saves latency percentiles, throughput and the app's memory use as JSON. Run from
+the backend directory:
+
+    uv run python -m benchmarks.load_test run --scenario poi --concurrency 32 --requests 1000
+    uv run python -m benchmarks.load_test run --scenario chat --huggingface-latency 400 --output before.json
+    uv run python -m benchmarks.load_test compare before.json after.json
+"""
+from benchmarks.fake_upstreams import add_profile_arguments, load_fixtures, upstream_env, UPSTREAMS
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import argparse
+import asyncio
+import contextlib
+import httpx
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# One request: (method, path, JSON body)
+RequestSpec = Tuple[str, str, Optional[dict]]
+
+# Metrics compared by `compare`, and whether a higher value is better
+COMPARED_METRICS = [
+    ("latency_ms.p50", False),
+    ("latency_ms.p95", False),
+    ("latency_ms.p99", False),
+    ("requests_per_second", True),
+    ("error_rate", False),
+    ("memory_mb.peak", False),
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--", "app"], cwd=BACKEND_DIR, capture_output=True, text=True)
+        return f"{commit}-dirty" if dirty.stdout.strip() else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _rss_mb(pid: int) -> Optional[float]:
+    # Linux only; other platforms report no memory figures
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list
+    """
+    if not ordered:
+        return 0.0
+    rank = max(1, min(len(ordered), round(q / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def chat_requests(fixtures: dict, rng: random.Random) -> Iterator[RequestSpec]:
+    messages = [item["message"] for item in fixtures["chat"]]
+    while True:
+        yield "POST", "/ai/chat", {"message": rng.choice(messages)}
+
+
+def poi_requests(fixtures: dict, rng: random.Random) -> Iterator[RequestSpec]:
+    queries = [None, "cafe", "phở", "ngân hàng", "circle k", "nhà thuốc", "Highlands"]
+    while True:
+        yield "POST", "/place/poi", {
+            "lat": round(rng.uniform(10.72, 10.83), 5),
+            "lng": round(rng.uniform(106.62, 106.76), 5),
+            "radius_m": rng.choice([300, 500, 1000, 2000]),
+            "query": rng.choice(queries),
+        }
+
+
+def geocode_requests(fixtures: dict, rng: random.Random) -> Iterator[RequestSpec]:
+    names = [place["query"] for place in fixtures["places"]] + ["HCMUS", "Quận 5", "Bến Thành", "Đường Không Tồn Tại"]
+    while True:
+        yield "POST", "/place/geocode", {"place_name": rng.choice(names)}
+
+
+def mixed_requests(fixtures: dict, rng: random.Random) -> Iterator[RequestSpec]:
+    sources = [chat_requests(fixtures, rng), poi_requests(fixtures, rng), geocode_requests(fixtures, rng)]
+    while True:
+        yield next(rng.choices(sources, weights=[2, 5, 3])[0])
+
+
+SCENARIOS: Dict[str, Callable[[dict, random.Random], Iterator[RequestSpec]]] = {
+    "chat": chat_requests,
+    "poi": poi_requests,
+    "geocode": geocode_requests,
+    "mixed": mixed_requests,
+}
+
+
+async def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{url} exited with code {process.returncode} before it was ready")
+            try:
+                await client.get(url, timeout=1.0)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} was not ready after {timeout:.0f}s")
+
+
+@contextlib.contextmanager
+def _process(args: List[str], env: Dict[str, str]) -> Iterator[subprocess.Popen]:
+    process = subprocess.Popen(args, cwd=BACKEND_DIR, env=env)
+    try:
+        yield process
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def _drive(
+    base_url: str,
+    requests: Iterator[RequestSpec],
+    total: int,
+    concurrency: int,
+    app_pid: int,
+) -> dict:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    memory: List[float] = []
+    remaining = total
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            method, path, body = next(requests)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    async def sample_memory():
+        while True:
+            rss = _rss_mb(app_pid)
+            if rss is not None:
+                memory.append(rss)
+            await asyncio.sleep(0.1)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120.0) as client:
+        sampler = asyncio.create_task(sample_memory())
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+
+    ordered = sorted(latencies)
+    # 4xx answers (no POIs, unknown place) are normal outcomes, not errors
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 500)
+    return {
+        "requests": len(latencies),
+        "duration_s": round(elapsed, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 2),
+        "statuses": dict(sorted(statuses.items())),
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+        "latency_ms": {
+            "mean": round(sum(ordered) / len(ordered), 2) if ordered else 0.0,
+            "p50": round(percentile(ordered, 50), 2),
+            "p95": round(percentile(ordered, 95), 2),
+            "p99": round(percentile(ordered, 99), 2),
+            "max": round(ordered[-1], 2) if ordered else 0.0,
+        },
+        "memory_mb": {
+            "start": round(memory[0], 1) if memory else None,
+            "peak": round(max(memory), 1) if memory else None,
+            "end": round(memory[-1], 1) if memory else None,
+        },
+    }
+
+
+async def run_load_test(args: argparse.Namespace) -> dict:
+    fixtures = load_fixtures()
+    fake_port, app_port = _free_port(), _free_port()
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+
+    profile_args = []
+    for name in UPSTREAMS:
+        for setting in ("latency", "jitter", "errors", "error_status"):
+            profile_args += [f"--{name}-{setting.replace('_', '-')}", str(getattr(args, f"{name}_{setting}"))]
+
+    with tempfile.TemporaryDirectory(prefix="backend-load-test-") as workdir:
+        env = {
+            **os.environ,
+            **upstream_env(fake_url),
+            # The fake upstreams have no usage policy to respect
+            "NOMINATIM_RATE": "10000",
+            "GEOCODE_CACHE_PATH": str(Path(workdir) / "geocode.sqlite3"),
+            "CONVERSATION_STORE": "memory",
+            "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+        }
+        with _process([sys.executable, "-m", "benchmarks.fake_upstreams", "--port", str(fake_port), *profile_args], env) as fakes, \
+                _process([sys.executable, "-m", "uvicorn", "app.app:app", "--port", str(app_port),
+                          "--log-level", "warning", "--no-access-log"], env) as app:
+            await _wait_ready(f"{fake_url}/stats", fakes)
+            await _wait_ready(app_url, app)
+
+            rng = random.Random(args.seed)
+            requests = SCENARIOS[args.scenario](fixtures, rng)
+            if args.warmup:
+                await _drive(app_url, requests, args.warmup, min(args.concurrency, args.warmup), app.pid)
+            result = await _drive(app_url, requests, args.requests, args.concurrency, app.pid)
+
+            async with httpx.AsyncClient() as client:
+                upstream_requests = (await client.get(f"{fake_url}/stats")).json()
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "scenario": args.scenario,
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "upstreams": {
+                name: {
+                    setting: getattr(args, f"{name}_{setting}")
+                    for setting in ("latency", "jitter", "errors", "error_status")
+                }
+                for name in UPSTREAMS
+            },
+        },
+        **result,
+        "upstream_requests": upstream_requests,
+    }
+
+
+def _metric(result: dict, path: str) -> Optional[float]:
+    value = result
+    for key in path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def compare_results(baseline: dict, candidate: dict, threshold: float) -> List[str]:
+    """
+    Print both runs side by side; returns the metrics that got worse by more than threshold percent
+    """
+    print(f"{'metric':<22}{baseline.get('commit') or 'baseline':>16}{candidate.get('commit') or 'candidate':>16}{'change':>10}")
+    regressions = []
+    for path, higher_is_better in COMPARED_METRICS:
+        before, after = _metric(baseline, path), _metric(candidate, path)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{path:<22}{before:>16.2f}{after:>16.2f}{change:>+9.1f}%")
+        worse = -change if higher_is_better else change
+        if worse > threshold:
+            regressions.append(path)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backend load test with fake upstreams")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="Run a load test and save the results")
+    run.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    run.add_argument("--requests", type=int, default=500, help="Measured requests")
+    run.add_argument("--concurrency", type=int, default=16, help="Requests in flight at once")
+    run.add_argument("--warmup", type=int, default=20, help="Unmeasured requests sent first")
+    run.add_argument("--seed", type=int, default=1, help="Seed of the request mix")
+    run.add_argument("--output", type=Path, help="Result file (default: benchmarks/results/<commit>-<scenario>.json)")
+    add_profile_arguments(run)
+
+    compare = subparsers.add_parser("compare", help="Compare two result files")
+    compare.add_argument("baseline", type=Path)
+    compare.add_argument("candidate", type=Path)
+    compare.add_argument("--threshold", type=float, default=10.0, help="Allowed regression in percent")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        result = asyncio.run(run_load_test(args))
+        output = args.output or RESULTS_DIR / f"{result['commit'] or 'unknown'}-{args.scenario}.json"
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding="utf-8")
+        latency = result["latency_ms"]
+        print(
+            f"{args.scenario}: {result['requests_per_second']:.1f} req/s, p50 {latency['p50']:.1f} ms, "
+            f"p95 {latency['p95']:.1f} ms, p99 {latency['p99']:.1f} ms, errors {result['error_rate']:.1%}, "
+            f"peak RSS {result['memory_mb']['peak']} MB"
+        )
+        print(f"Saved {output}")
+    elif args.command == "compare":
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        candidate = json.loads(args.candidate.read_text(encoding="utf-8"))
+        regressions = compare_results(baseline, candidate, args.threshold)
+        if regressions:
+            print(f"Regressed by more than {args.threshold:.0f}%: {', '.join(regressions)}")
+        sys.exit(1 if regressions else 0)
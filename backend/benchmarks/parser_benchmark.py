@@ -0,0 +1,58 @@
+"""
+Golden-output check and microbenchmark for the Vietnamese query parser.
+
+Run from the backend directory:
+
+    uv run python -m benchmarks.parser_benchmark
+"""
+from app.services.query_parser import parse_vietnamese_query, _parse_text
+from pathlib import Path
+import argparse
+import json
+import sys
+import time
+
+CORPUS_PATH = Path(__file__).resolve().parent / "parser_corpus.json"
+
+
+def load_corpus(path: Path = CORPUS_PATH) -> list:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def check_golden(corpus: list) -> list:
+    """
+    Return the corpus entries whose parse differs from the recorded output
+    """
+    failures = []
+    for case in corpus:
+        _parse_text.cache_clear()
+        got = parse_vietnamese_query(case["text"], case["gliner_entities"])
+        if got != case["expected"]:
+            failures.append({**case, "got": got})
+    return failures
+
+
+def parses_per_second(corpus: list, iterations: int, cached: bool) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if not cached:
+            _parse_text.cache_clear()
+        for case in corpus:
+            parse_vietnamese_query(case["text"], case["gliner_entities"])
+    return iterations * len(corpus) / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query parser golden check and benchmark")
+    parser.add_argument("--iterations", type=int, default=200, help="Passes over the corpus")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    failures = check_golden(corpus)
+    for failure in failures:
+        print(f"MISMATCH {failure['text']!r}: expected {failure['expected']}, got {failure['got']}")
+    print(f"Golden corpus: {len(corpus) - len(failures)}/{len(corpus)} cases match")
+
+    print(f"Uncached: {parses_per_second(corpus, args.iterations, cached=False):,.0f} parses/s")
+    print(f"Cached:   {parses_per_second(corpus, args.iterations, cached=True):,.0f} parses/s")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,124 @@
+"""
+Benchmark of the POI path from Overpass elements to response bytes.
+
+Compares Pydantic models per POI, re-validated for the response and serialized
+with the models' encoder (the previous path), with POIRecord objects serialized
+once by orjson. The fixture is benchmarks/fixtures/overpass_elements.json,
+repeated in copies shifted north up to --elements elements. Run from the backend
+directory:
+
+    uv run python -m benchmarks.poi_serialization_benchmark --elements 5000
+"""
+from app.schemas import ChatResponse, PointOfInterest
+from app.services.poi_ranking import distances_m, rank_matches, top_k_order
+from app.services.poi_service import dedupe_pois, element_to_poi, parse_overpass_elements
+from app.services.text_index import match_pois
+from app.util.json_response import dumps
+from benchmarks.fake_upstreams import FIXTURES_DIR
+from dataclasses import asdict
+from pathlib import Path
+from pydantic import TypeAdapter
+from typing import Callable, List
+import argparse
+import copy
+import json
+import statistics
+import time
+import tracemalloc
+
+# Search center in the middle of the fixture area
+CENTER = (10.775, 106.69)
+
+# Latitude span of the fixture; each copy of it is shifted north by this much
+FIXTURE_SPAN_DEG = 0.15
+
+_POI_LIST = TypeAdapter(List[PointOfInterest])
+
+
+def load_elements(count: int, path: Path = FIXTURES_DIR / "overpass_elements.json") -> List[dict]:
+    """
+    `count` Overpass elements: the fixture, repeated in shifted copies if it is too small
+    """
+    base = json.loads(path.read_text(encoding="utf-8"))
+    elements = []
+    for i in range(count):
+        element = copy.deepcopy(base[i % len(base)])
+        shift = FIXTURE_SPAN_DEG * (i // len(base))
+        element["id"] = element.get("id", 0) + 1_000_000 * (i // len(base))
+        position = element if "lat" in element else element["center"]
+        position["lat"] = round(position["lat"] + shift, 6)
+        elements.append(element)
+    return elements
+
+
+def model_path(elements: List[dict], k: int, chat: bool) -> bytes:
+    """
+    A validated PointOfInterest per element, copied when ranked, validated again
+    as the response model and dumped; the chat response rebuilt dicts from them.
+    The tags are still read by element_to_poi, so this also pays for a record per POI.
+    """
+    pois = dedupe_pois([
+        PointOfInterest(**asdict(record)) for record in map(element_to_poi, elements) if record is not None
+    ])
+    matches = match_pois(pois, None)
+    distance = distances_m(pois, *CENTER)
+    ranked = [
+        matches[i][0].model_copy(update={"distance_m": round(float(distance[i]), 1)})
+        for i in top_k_order(distance, k).tolist()
+    ]
+    if chat:
+        results = [
+            {"name": poi.name, "type": poi.type, "lat": poi.lat, "lng": poi.lng,
+             "description": poi.description, "distance_m": poi.distance_m}
+            for poi in ranked
+        ]
+        return ChatResponse(message="", search_results=results).model_dump_json().encode("utf-8")
+    return _POI_LIST.dump_json(_POI_LIST.validate_python(ranked))
+
+
+def record_path(elements: List[dict], k: int, chat: bool) -> bytes:
+    """
+    POIRecord objects from parsing to ranking, serialized once with orjson
+    """
+    pois = parse_overpass_elements(elements)
+    ranked = rank_matches(match_pois(pois, None), *CENTER, k=k)
+    if chat:
+        content = ChatResponse(message="").model_dump(mode="json")
+        content["search_results"] = ranked
+        return dumps(content)
+    return dumps(ranked)
+
+
+def measure(fn: Callable[[], bytes], repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"median_ms": statistics.median(times), "peak_kb": peak / 1024}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="POI serialization benchmark")
+    parser.add_argument("--elements", type=int, default=5000, help="Overpass elements in the fixture")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per case")
+    args = parser.parse_args()
+
+    elements = load_elements(args.elements)
+    print(f"{len(elements)} elements, {len(parse_overpass_elements(elements))} POIs after dedup")
+    for name, k, chat in [("/place/poi, 5 POIs", 5, False), ("/place/poi, every POI", len(elements), False),
+                          ("/ai/chat, 5 POIs", 5, True)]:
+        # Both paths must produce the same response
+        if json.loads(model_path(elements, k, chat)) != json.loads(record_path(elements, k, chat)):
+            raise SystemExit(f"{name}: the two paths produce different JSON")
+        before = measure(lambda: model_path(elements, k, chat), args.repeat)
+        after = measure(lambda: record_path(elements, k, chat), args.repeat)
+        print(
+            f"{name:24} models {before['median_ms']:7.1f} ms {before['peak_kb']:8.0f} KB peak | "
+            f"records {after['median_ms']:7.1f} ms {after['peak_kb']:8.0f} KB peak | "
+            f"{before['median_ms'] / after['median_ms']:.1f}x faster"
+        )
@@ -20,6 +20,9 @@ interface ChatBotProps {
 
 const BACKEND_API_BASE = import.meta.env.VITE_BACKEND_API_BASE || "http://127.0.0.1:8000";
 
+// Recent messages sent along for when the backend no longer has the conversation
+const HISTORY_FALLBACK_MESSAGES = 20;
+
 export default function ChatBot({ onSearchResults, currentCenter }: ChatBotProps) {
   const [messages, setMessages] = useState<ChatMessage[]>([
     {
@@ -31,6 +34,8 @@ export default function ChatBot({ onSearchResults, currentCenter }: ChatBotProps
   const [isLoading, setIsLoading] = useState(false);
   const [isOpen, setIsOpen] = useState(false);
   const [userLocation, setUserLocation] = useState<[number, number] | null>(null);
+  // The backend keeps the conversation's location, radius and query under this id
+  const [conversationId, setConversationId] = useState<string | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
   // Get user's actual device location
@@ -89,7 +94,8 @@ export default function ChatBot({ onSearchResults, currentCenter }: ChatBotProps
         },
         body: JSON.stringify({
           message: userMessage,
-          conversation_history: messages,
+          conversation_id: conversationId,
+          conversation_history: messages.slice(-HISTORY_FALLBACK_MESSAGES),
           current_lat: locationToUse ? locationToUse[0] : null,
           current_lng: locationToUse ? locationToUse[1] : null,
         }),
@@ -100,6 +106,9 @@ export default function ChatBot({ onSearchResults, currentCenter }: ChatBotProps
       }
 
       const data = await response.json();
+      if (data.conversation_id) {
+        setConversationId(data.conversation_id);
+      }
 
       // Add assistant response
       setMessages((prev) => [
@@ -18,15 +18,9 @@ export interface PointOfInterest extends Location {
 // Geocode a place name to coordinates using backend API
 export async function geocodePlaceName(placeName: string): Promise<Location | null> {
   try {
-    const response = await fetch(`${BACKEND_API_BASE}/place/geocode`, {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({
-        place_name: placeName,
-      }),
-    });
+    // GET so the browser can reuse the cached response (the backend sends ETag and Cache-Control)
+    const params = new URLSearchParams({ place_name: placeName });
+    const response = await fetch(`${BACKEND_API_BASE}/place/geocode?${params}`);
 
     if (!response.ok) {
       if (response.status === 404) {
@@ -65,17 +59,12 @@ export async function findPointsOfInterest(
   radiusM: number = 10000
 ): Promise<PointOfInterest[]> {
   try {
-    const response = await fetch(`${BACKEND_API_BASE}/place/poi`, {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify({
-        lat: lat,
-        lng: lng,
-        radius_m: radiusM,
-      }),
+    const params = new URLSearchParams({
+      lat: String(lat),
+      lng: String(lng),
+      radius_m: String(radiusM),
     });
+    const response = await fetch(`${BACKEND_API_BASE}/place/poi?${params}`);
 
     if (!response.ok) {
       if (response.status === 404) {